@@ -58,6 +58,7 @@ func main() {
 		Dry             bool   `short:"d" long:"dry-run" description:"check configuration"`
 		PProfHost       string `long:"pprof-host" description:"specify the host that gobgpd listens on for pprof" default:"localhost:6060"`
 		PProfDisable    bool   `long:"pprof-disable" description:"disable pprof profiling"`
+		PProfMutexRate  int    `long:"pprof-mutex-rate" description:"report 1/n of mutex contention events in the pprof mutex profile (0 disables it)"`
 		UseSdNotify     bool   `long:"sdnotify" description:"use sd_notify protocol"`
 		TLS             bool   `long:"tls" description:"enable TLS authentication for gRPC API"`
 		TLSCertFile     string `long:"tls-cert-file" description:"The TLS cert file"`
@@ -85,6 +86,7 @@ func main() {
 	}
 
 	if !opts.PProfDisable {
+		runtime.SetMutexProfileFraction(opts.PProfMutexRate)
 		go func() {
 			log.Println(http.ListenAndServe(opts.PProfHost, nil))
 		}()
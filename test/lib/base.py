@@ -17,8 +17,11 @@
 import os
 import time
 import itertools
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from invoke import run
+from invoke import run, Result, UnexpectedExit
 
 import textwrap
 from colored import fg, attr
@@ -29,11 +32,15 @@ except ImportError:
     from docker import APIClient as Client
 import netaddr
 
+from lib import netns
+from lib import trace
 
 DEFAULT_TEST_PREFIX = ''
 DEFAULT_TEST_BASE_DIR = '/tmp/gobgp'
 TEST_PREFIX = DEFAULT_TEST_PREFIX
 TEST_BASE_DIR = DEFAULT_TEST_BASE_DIR
+# 'docker' or 'netns' (see lib/netns.py), set by the --backend option
+BACKEND = 'docker'
 
 BGP_FSM_IDLE = 'idle'
 BGP_FSM_ACTIVE = 'active'
@@ -50,6 +57,10 @@ BGP_ATTR_TYPE_CLUSTER_LIST = 10
 BGP_ATTR_TYPE_MP_REACH_NLRI = 14
 BGP_ATTR_TYPE_EXTENDED_COMMUNITIES = 16
 
+# lookup options of lookup_global_rib(): the destinations equal to, more
+# specific than (or equal to) and less specific than (or equal to) a prefix
+LOOKUP_OPTIONS = ('exact', 'longer', 'shorter')
+
 GRACEFUL_RESTART_TIME = 30
 LONG_LIVED_GRACEFUL_RESTART_TIME = 30
 
@@ -85,10 +96,19 @@ TEST_CONTAINER_LABEL = 'gobgp-test'
 TEST_NETWORK_LABEL = TEST_CONTAINER_LABEL
 
 
+def _span_name(cmd):
+    # "docker run ..." -> "docker run", "gobgp -j ..." -> "gobgp"
+    words = cmd.split()
+    if len(words) > 1 and words[0] == 'docker':
+        return ' '.join(words[:2])
+    return words[0] if words else ''
+
+
 def local(s, capture=False):
     print('[localhost] local:', s)
     _env = {'NOSE_NOLOGCAPTURE': '1' if capture else '0'}
-    return run(s, hide=True, env=_env).stdout.strip()
+    with trace.span(_span_name(s), 'local', cmd=s):
+        return run(s, hide=True, env=_env).stdout.strip()
 
 
 def yellow(s):
@@ -114,17 +134,99 @@ def community_str(i):
     return ':'.join(reversed(values))
 
 
-def wait_for_completion(f, timeout=120):
-    interval = 1
-    count = 0
-    while True:
-        if f():
-            return
+def prefix_matches(dest, prefix, lookup='exact'):
+    if lookup not in LOOKUP_OPTIONS:
+        raise Exception('invalid lookup option {0}'.format(lookup))
+    dest = netaddr.IPNetwork(dest)
+    prefix = netaddr.IPNetwork(prefix)
+    if dest.version != prefix.version:
+        return False
+    if lookup == 'exact':
+        return dest.cidr == prefix.cidr
+    elif lookup == 'longer':
+        return dest in prefix
+    return prefix in dest
+
+
+class WaitEvent(object):
+    """
+    Wakes up wait_for_completion() as soon as something happened which may
+    have changed the awaited condition, e.g. an update on a monitor stream
+    or a new line in a log file, instead of letting it sleep until its
+    next probe.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.seq = 0
+
+    def notify(self):
+        with self._cond:
+            self.seq += 1
+            self._cond.notify_all()
+
+    def wait(self, seq, timeout):
+        # Returns at once if notify() was called since seq was read
+        with self._cond:
+            if self.seq == seq:
+                self._cond.wait(timeout)
+
 
-        time.sleep(interval)
-        count += interval
-        if count >= timeout:
-            raise Exception('timeout')
+class LogTail(WaitEvent):
+    """
+    WaitEvent notified for every line appended to a file in a container,
+    until close() is called.
+    """
+
+    def __init__(self, ctn, path):
+        super(LogTail, self).__init__()
+        self._process = subprocess.Popen(
+            ctn.exec_argv(['tail', '-n', '0', '-F', path]),
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        t = threading.Thread(target=self._follow)
+        t.daemon = True
+        t.start()
+
+    def _follow(self):
+        for _ in iter(self._process.stdout.readline, b''):
+            self.notify()
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+
+
+def wait_for_completion(f, timeout=120, expected=None, event=None,
+                        interval=0.1, max_interval=2):
+    """
+    Waits until f() returns True, or f() == expected when expected is given
+    (f is then a counter like GoBGPContainer.count_local_rib), and raises
+    after timeout seconds.
+
+    f is probed at once, then after interval seconds, doubling the
+    interval up to max_interval. If event (a WaitEvent) is given, a
+    notification triggers the next probe immediately.
+    """
+    name = 'wait: {0}'.format(getattr(f, '__qualname__', f))
+    with trace.span(name, 'wait', timeout=timeout) as args:
+        args['probes'] = 0
+        deadline = time.time() + timeout
+        while True:
+            seq = event.seq if event is not None else None
+            ret = f()
+            args['probes'] += 1
+            if (expected is None and ret) or (expected is not None and ret == expected):
+                return
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError('timeout')
+            if event is not None:
+                event.wait(seq, min(interval, remaining))
+            else:
+                time.sleep(min(interval, remaining))
+            interval = min(interval * 2, max_interval)
 
 
 def try_several_times(f, t=3, s=1):
@@ -140,23 +242,174 @@ def try_several_times(f, t=3, s=1):
 
 
 def assert_several_times(f, t=30, s=1):
-    e = AssertionError
-    for _ in range(t):
+    # f is given t * s seconds to stop raising AssertionError; its last
+    # AssertionError is raised then, and any other exception at once
+    errors = []
+
+    def _f():
         try:
             f()
         except AssertionError as e:
-            time.sleep(s)
-        else:
+            errors[:] = [e]
+            return False
+        except Exception:
+            errors[:] = []
+            raise
+        return True
+
+    try:
+        wait_for_completion(_f, timeout=t * s)
+    except TimeoutError:
+        if not errors:
+            raise
+        raise errors[-1]
+
+
+def run_containers(ctns, max_workers=8):
+    """
+    Boots the given containers concurrently and returns the longest wait
+    time reported by their run() methods.
+
+    Each container still blocks in its own boot check, but on a worker
+    thread, so a topology boots in the time of its slowest container.
+    Errors are collected per container and raised together once all
+    containers have finished booting.
+    """
+    ctns = list(ctns)
+    if not ctns:
+        return 0
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ctns))) as executor:
+        futures = [(ctn, executor.submit(ctn.run)) for ctn in ctns]
+    wait_times = []
+    errors = []
+    for ctn, future in futures:
+        try:
+            wait_times.append(future.result())
+        except Exception as e:
+            errors.append('{0}: {1}'.format(ctn.name, e))
+    if errors:
+        raise Exception('failed to boot containers: {0}'.format(', '.join(errors)))
+    return max(wait_times)
+
+
+_docker_client = None
+_docker_client_lock = threading.Lock()
+
+
+def docker_client():
+    """
+    Returns the Docker API client shared by the whole process.
+    """
+    global _docker_client
+    with _docker_client_lock:
+        if _docker_client is None:
+            _docker_client = Client(timeout=120, version='auto')
+        return _docker_client
+
+
+class DockerInventory(object):
+    """
+    Names of the existing containers and networks, listed once and then
+    kept current from the Docker events stream.
+
+    The harness also records its own creations and removals directly,
+    because the events arrive asynchronously.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._containers = None
+        self._networks = None
+
+    def _load(self):
+        if self._containers is not None:
             return
-    raise e
+        client = docker_client()
+        # Subscribes first, so that no event between the listing below and
+        # the start of the watcher thread is missed.
+        events = client.events(decode=True)
+        self._containers = set(n.lstrip('/') for c in client.containers(all=True)
+                               for n in c['Names'] or [])
+        self._networks = set(n['Name'] for n in client.networks())
+        t = threading.Thread(target=self._watch, args=(events,))
+        t.daemon = True
+        t.start()
+
+    def _watch(self, events):
+        try:
+            for event in events:
+                self._apply(event)
+        except Exception:
+            pass
+        # The stream is gone, list everything again on the next lookup
+        with self._lock:
+            self._containers = None
+            self._networks = None
+
+    def _apply(self, event):
+        name = event.get('Actor', {}).get('Attributes', {}).get('name')
+        if not name:
+            return
+        with self._lock:
+            names = {'container': self._containers,
+                     'network': self._networks}.get(event.get('Type'))
+            if names is None:
+                return
+            if event.get('Action') == 'create':
+                names.add(name)
+            elif event.get('Action') == 'destroy':
+                names.discard(name)
+
+    def containers(self):
+        with self._lock:
+            self._load()
+            return list(self._containers)
+
+    def networks(self):
+        with self._lock:
+            self._load()
+            return list(self._networks)
+
+    def _update(self, attr, name, exists):
+        with self._lock:
+            names = getattr(self, attr)
+            if names is None:
+                return
+            if exists:
+                names.add(name)
+            else:
+                names.discard(name)
+
+    def container_created(self, name):
+        self._update('_containers', name, True)
+
+    def container_removed(self, name):
+        self._update('_containers', name, False)
+
+    def network_created(self, name):
+        self._update('_networks', name, True)
+
+    def network_removed(self, name):
+        self._update('_networks', name, False)
+
+
+inventory = DockerInventory()
+
+
+def netns_dir():
+    return os.path.join(TEST_BASE_DIR, '.netns')
 
 
 def get_bridges():
-    return try_several_times(lambda: local("docker network ls | awk 'NR > 1{print $2}'", capture=True)).split('\n')
+    if BACKEND == 'netns':
+        return netns.bridges()
+    return try_several_times(inventory.networks)
 
 
 def get_containers():
-    return try_several_times(lambda: local("docker ps -a | awk 'NR > 1 {print $NF}'", capture=True)).split('\n')
+    if BACKEND == 'netns':
+        return netns.containers(netns_dir())
+    return try_several_times(inventory.containers)
 
 
 class CmdBuffer(list):
@@ -177,6 +430,9 @@ class Bridge(object):
         if TEST_PREFIX != '':
             self.name = '{0}_{1}'.format(TEST_PREFIX, name)
         self.with_ip = with_ip
+        # guards the address generators, as topology attaches containers
+        # to a bridge from several threads
+        self._lock = threading.Lock()
         if with_ip:
             self.subnet = netaddr.IPNetwork(subnet)
 
@@ -190,21 +446,29 @@ class Bridge(object):
         def f():
             if self.name in get_bridges():
                 self.delete()
+            if BACKEND == 'netns':
+                netns.create_bridge(self.name)
+                return
             v6 = ''
             if self.subnet.version == 6:
                 v6 = '--ipv6'
             self.id = local('docker network create --driver bridge {0} --subnet {1} --label {2} {3}'.format(v6, subnet, TEST_NETWORK_LABEL, self.name), capture=True)
+            inventory.network_created(self.name)
         try_several_times(f)
 
         self.self_ip = self_ip
         if self_ip:
             self.ip_addr = self.next_ip_address()
-            try_several_times(lambda: local("ip addr add {0} dev {1}".format(self.ip_addr, self.name)))
+            dev = netns.bridge_device(self.name) if BACKEND == 'netns' else self.name
+            try_several_times(lambda: local("ip addr add {0} dev {1}".format(self.ip_addr, dev)))
+        elif BACKEND == 'netns' and with_ip:
+            # Docker keeps the first address for the gateway
+            self.next_ip_address()
         self.ctns = []
 
         # Note: Here removes routes from the container host to prevent traffic
         # from going through the container host's routing table.
-        if with_ip:
+        if with_ip and BACKEND == 'docker':
             local('ip route del {0}; echo $?'.format(subnet),
                   capture=True)
             # When IPv6, 2 routes will be installed to the container host's
@@ -214,19 +478,41 @@ class Bridge(object):
                       capture=True)
 
     def next_ip_address(self):
-        return "{0}/{1}".format(next(self._ip_generator),
-                                self.subnet.prefixlen)
+        with self._lock:
+            return "{0}/{1}".format(next(self._ip_generator),
+                                    self.subnet.prefixlen)
+
+    def host_device(self):
+        if BACKEND == 'netns':
+            return netns.bridge_device(self.name)
+        return 'br-{0}'.format(self.id[:12])
+
+    def host_ip_address(self):
+        """
+        Returns an address for the host side of the bridge (e.g. for
+        lib.speaker), taken from the end of the subnet so that it does not
+        collide with the addresses assigned to the containers.
+        """
+        with self._lock:
+            if not hasattr(self, '_host_ip_generator'):
+                # skips the broadcast address
+                self._host_ip_generator = (self.subnet[-i] for i in range(2, self.subnet.size))
+            return "{0}/{1}".format(next(self._host_ip_generator),
+                                    self.subnet.prefixlen)
 
     def addif(self, ctn, ip_addr=''):
         _name = ctn.next_if_name()
         self.ctns.append(ctn)
+        if BACKEND == 'netns':
+            self._addif_netns(ctn, _name, ip_addr)
+            return
         ip = ''
         if not ip_addr == '':
             ip = '--ip {0}'.format(ip_addr)
             if self.subnet.version == 6:
                 ip = '--ip6 {0}'.format(ip_addr)
         local("docker network connect {0} {1} {2}".format(ip, self.name, ctn.docker_name()))
-        i = [x for x in list(Client(timeout=60, version='auto').inspect_network(self.id)['Containers'].values()) if x['Name'] == ctn.docker_name()][0]
+        i = [x for x in list(docker_client().inspect_network(self.id)['Containers'].values()) if x['Name'] == ctn.docker_name()][0]
         if self.subnet.version == 4:
             eth = 'eth{0}'.format(len(ctn.ip_addrs))
             addr = i['IPv4Address']
@@ -236,11 +522,120 @@ class Bridge(object):
             addr = i['IPv6Address']
             ctn.ip6_addrs.append((eth, addr, self.name))
 
+    def _addif_netns(self, ctn, name, ip_addr):
+        addr = ''
+        if self.with_ip:
+            addr = ip_addr or self.next_ip_address()
+            if '/' not in addr:
+                addr = '{0}/{1}'.format(addr, self.subnet.prefixlen)
+        ctn.netns().add_interface(self.name, name, addr)
+        if not self.with_ip:
+            return
+        if self.subnet.version == 4:
+            ctn.ip_addrs.append((name, addr, self.name))
+        else:
+            ctn.ip6_addrs.append((name, addr, self.name))
+
     def delete(self):
+        if BACKEND == 'netns':
+            netns.delete_bridge(self.name)
+            return
         try_several_times(lambda: local("docker network rm {0}".format(self.name)))
+        inventory.network_removed(self.name)
+
+
+class ExecSession(object):
+    """
+    Persistent "docker exec -i <container> sh" channel, or the argv given
+    for other backends.
+
+    Every command is evaluated in a subshell of the same shell with stdin
+    detached, and its stdout is terminated by a sentinel line carrying the
+    exit status, so that running a command does not cost a docker exec.
+    Its stderr goes to a file in the container, sent after the sentinel,
+    so that it never mixes with the returned stdout. A non-zero status
+    raises UnexpectedExit with both, as invoke.run() does.
+    """
+
+    def __init__(self, docker_name, argv=None):
+        self.docker_name = docker_name
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._process = subprocess.Popen(
+            argv or ['docker', 'exec', '-i', docker_name, 'sh'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT)
+
+    def alive(self):
+        return self._process.poll() is None
+
+    def _read_until(self, sentinel):
+        # Returns the lines before the one starting with sentinel, and it
+        lines = []
+        while True:
+            line = self._process.stdout.readline()
+            if not line:
+                raise RuntimeError('exec session to {0} is closed: {1}'.format(
+                    self.docker_name, ''.join(lines).strip()))
+            line = line.decode('utf-8', 'replace')
+            if line.startswith(sentinel):
+                return lines, line
+            lines.append(line)
+
+    def run(self, cmd):
+        with self._lock:
+            n = next(self._seq)
+            sentinel = '__gobgp_test_exec_{0}__'.format(n)
+            stderr_sentinel = '__gobgp_test_exec_{0}_stderr__'.format(n)
+            # eval in a subshell, so that neither a syntax error nor an
+            # "exit" in cmd can terminate the session
+            script = ("( eval '{0}' ) < /dev/null 2> /tmp/.gobgp_test_exec_stderr_$$\n"
+                      "printf '\\n{1} %d\\n' $?\n"
+                      "cat /tmp/.gobgp_test_exec_stderr_$$; rm -f /tmp/.gobgp_test_exec_stderr_$$\n"
+                      "printf '\\n{2}\\n'\n").format(cmd.replace("'", "'\\''"), sentinel, stderr_sentinel)
+            try:
+                self._process.stdin.write(script.encode('utf-8'))
+                self._process.stdin.flush()
+            except (BrokenPipeError, ValueError):
+                raise RuntimeError('exec session to {0} is closed'.format(self.docker_name))
+
+            lines, line = self._read_until(sentinel)
+            code = int(line.split()[1])
+            err_lines, _ = self._read_until(stderr_sentinel)
+
+        out = ''.join(lines).strip()
+        if code != 0:
+            raise UnexpectedExit(Result(stdout=out, stderr=''.join(err_lines).strip(),
+                                        command=cmd, exited=code, hide=('stdout', 'stderr')))
+        return out
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+        self._process.stdout.close()
 
 
 class Container(object):
+
+    # Methods recorded by lib.trace, also when a subclass overrides them
+    TRACED_METHODS = ('run', 'boot', 'create_config', 'reload_config',
+                      '_wait_for_boot', 'wait_for')
+    # Process name of the daemon under test, whose resource usage
+    # lib.sampler records; the container init when None
+    DAEMON = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls.TRACED_METHODS:
+            f = cls.__dict__.get(name)
+            if callable(f) and not getattr(f, 'traced', False):
+                setattr(cls, name, trace.traced(f))
+
     def __init__(self, name, image):
         self.name = name
         self.image = image
@@ -250,6 +645,9 @@ class Container(object):
         self.is_running = False
         self.eths = []
         self.tcpdump_running = False
+        self._exec_session = None
+        self._exec_session_lock = threading.Lock()
+        self._netns = None
 
         if self.docker_name() in get_containers():
             self.remove()
@@ -264,13 +662,37 @@ class Container(object):
         self.eths.append(name)
         return name
 
+    def netns(self):
+        if self._netns is None:
+            self._netns = netns.NetnsContainer(self.docker_name(), netns_dir())
+        return self._netns
+
+    def exec_argv(self, cmd):
+        """
+        Returns the command line running cmd (an argv) in this container.
+        """
+        if BACKEND == 'netns':
+            return self.netns().argv(cmd)
+        return ['docker', 'exec', '-i', self.docker_name()] + cmd
+
+    @trace.traced
     def run(self):
+        self._close_exec_session()
+        if BACKEND == 'netns':
+            addr = self.netns().start(self.image, self.shared_volumes)
+            self.id = self.docker_name()
+            self.is_running = True
+            self.local("ip li set up dev lo")
+            # the management address, where Docker has the docker0 one
+            self.ip_addrs.append(('eth0', addr, 'docker0'))
+            return 0
         c = CmdBuffer(' ')
         c << "docker run --privileged=true"
         for sv in self.shared_volumes:
             c << "-v {0}:{1}".format(sv[0], sv[1])
         c << "--name {0} -l {1} -id {2}".format(self.docker_name(), TEST_CONTAINER_LABEL, self.image)
         self.id = try_several_times(lambda: local(str(c), capture=True))
+        inventory.container_created(self.docker_name())
         self.is_running = True
         self.local("ip li set up dev lo")
         for line in self.local("ip a show dev eth0", capture=True).split('\n'):
@@ -283,25 +705,56 @@ class Container(object):
         return 0
 
     def stop(self):
+        self._close_exec_session()
+        if BACKEND == 'netns':
+            self.netns().stop()
+            self.is_running = False
+            return ''
         ret = try_several_times(lambda: local("docker stop -t 0 " + self.docker_name(), capture=True))
         self.is_running = False
         return ret
 
     def remove(self):
+        self._close_exec_session()
+        if BACKEND == 'netns':
+            self.netns().remove()
+            self.is_running = False
+            return ''
         ret = try_several_times(lambda: local("docker rm -f " + self.docker_name(), capture=True))
+        inventory.container_removed(self.docker_name())
         self.is_running = False
         return ret
 
+    def _close_exec_session(self):
+        with self._exec_session_lock:
+            if self._exec_session is not None:
+                self._exec_session.close()
+                self._exec_session = None
+
     def local(self, cmd, capture=False, stream=False, detach=False, tty=True):
+        if BACKEND == 'netns' and (stream or detach):
+            print('[{0}] local:'.format(self.docker_name()), cmd)
+            if stream:
+                return self.netns().stream(cmd)
+            return self.netns().spawn(cmd)
         if stream:
-            dckr = Client(timeout=120, version='auto')
+            dckr = docker_client()
             i = dckr.exec_create(container=self.docker_name(), cmd=cmd)
             return dckr.exec_start(i['Id'], tty=tty, stream=stream, detach=detach)
+        elif detach:
+            return local('docker exec -d {0} {1}'.format(self.docker_name(), cmd), capture)
         else:
-            flag = '-d' if detach else ''
-            return local('docker exec {0} {1} {2}'.format(flag, self.docker_name(), cmd), capture)
+            print('[{0}] local:'.format(self.docker_name()), cmd)
+            with trace.span(_span_name(cmd), 'exec', container=self.name, cmd=cmd):
+                with self._exec_session_lock:
+                    if self._exec_session is None or not self._exec_session.alive():
+                        self._exec_session = ExecSession(self.docker_name(), self.exec_argv(['sh']))
+                    session = self._exec_session
+                return session.run(cmd)
 
     def get_pid(self):
+        if self.is_running and BACKEND == 'netns':
+            return self.netns().pid()
         if self.is_running:
             cmd = "docker inspect -f '{{.State.Pid}}' " + self.docker_name()
             return int(local(cmd, capture=True))
@@ -343,8 +796,14 @@ class BGPContainer(Container):
     def __repr__(self):
         return str({'name': self.name, 'asn': self.asn, 'router_id': self.router_id})
 
-    def run(self):
-        self.create_config()
+    def run(self, boot=True):
+        """
+        Renders the config and starts the container. The containers which
+        implement boot() can be started with boot=False instead, without
+        config nor daemon, and booted once their peers are known.
+        """
+        if boot:
+            self.create_config()
         super(BGPContainer, self).run()
         return self.WAIT_FOR_BOOT
 
@@ -510,6 +969,13 @@ class BGPContainer(Container):
     def get_global_rib(self, rf):
         raise Exception('implement get_global_rib() method')
 
+    def lookup_global_rib(self, prefixes, rf='ipv4', lookup='exact'):
+        """
+        Returns the paths of the destinations matching any of prefixes in
+        one query. lookup is one of LOOKUP_OPTIONS.
+        """
+        raise Exception('implement lookup_global_rib() method')
+
     def get_neighbor_state(self, peer_id):
         raise Exception('implement get_neighbor() method')
 
@@ -523,34 +989,24 @@ class BGPContainer(Container):
         else:
             raise Exception('unsupported route family: {0}'.format(version))
         cmd = '/bin/bash -c "/bin/{0} -c 1 -w 1 {1} | xargs echo"'.format(ping_cmd, addr)
-        interval = 1
-        count = 0
-        while True:
+
+        def _f():
             res = self.local(cmd, capture=True)
             print(yellow(res))
-            if ('1 packets received' in res or '1 received' in res) and '0% packet loss' in res:
-                break
-            time.sleep(interval)
-            count += interval
-            if count >= timeout:
-                raise Exception('timeout')
+            return ('1 packets received' in res or '1 received' in res) and '0% packet loss' in res
+
+        wait_for_completion(_f, timeout=timeout)
         return True
 
-    def wait_for(self, expected_state, peer, timeout=120):
-        interval = 1
-        count = 0
-        while True:
+    def wait_for(self, expected_state, peer, timeout=120, event=None):
+        def _f():
             state = self.get_neighbor_state(peer)
             print(yellow("{0}'s peer {1} state: {2}".format(self.router_id,
                                                             peer.router_id,
                                                             state)))
-            if state == expected_state:
-                return
+            return state
 
-            time.sleep(interval)
-            count += interval
-            if count >= timeout:
-                raise Exception('timeout')
+        wait_for_completion(_f, timeout=timeout, expected=expected_state, event=event)
 
     def add_static_route(self, network, next_hop):
         cmd = '/sbin/ip route add {0} via {1}'.format(network, next_hop)
@@ -0,0 +1,662 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+BGP message codec for test traffic.
+
+Encodes and decodes OPEN (with the multiprotocol, route refresh, 4-octet
+AS, add-path and extended message capabilities), KEEPALIVE, NOTIFICATION
+and UPDATE messages with the unicast path attributes, MP_REACH_NLRI and
+MP_UNREACH_NLRI, byte-exact, so that speakers and malformed message tests
+can build what they send and check what they receive.
+
+NLRI are handled in bulk as parallel sequences of integers, prefix
+(network address) and length, so that a feed of a million routes is
+encoded in seconds:
+
+    prefixes, lengths = prefix_range('10.0.0.0/24', 65536)
+    attrs = path_attributes(as_path=[65001], next_hop='192.168.10.2')
+    msgs = updates(nlri_records(prefixes, lengths), attributes=attrs)
+"""
+
+import array
+import ipaddress
+import socket
+import struct
+
+
+MARKER = b'\xff' * 16
+HEADER_LEN = 19
+MAX_LEN = 4096
+# RFC 8654
+EXTENDED_MAX_LEN = 65535
+AS_TRANS = 23456
+
+OPEN = 1
+UPDATE = 2
+NOTIFICATION = 3
+KEEPALIVE = 4
+ROUTE_REFRESH = 5
+
+CAP_MULTIPROTOCOL = 1
+CAP_ROUTE_REFRESH = 2
+CAP_EXTENDED_MESSAGE = 6
+CAP_FOUR_OCTET_AS = 65
+CAP_ADD_PATH = 69
+
+ADD_PATH_RECEIVE = 1
+ADD_PATH_SEND = 2
+ADD_PATH_BOTH = 3
+
+ATTR_ORIGIN = 1
+ATTR_AS_PATH = 2
+ATTR_NEXT_HOP = 3
+ATTR_MULTI_EXIT_DISC = 4
+ATTR_LOCAL_PREF = 5
+ATTR_ATOMIC_AGGREGATE = 6
+ATTR_AGGREGATOR = 7
+ATTR_COMMUNITIES = 8
+ATTR_MP_REACH_NLRI = 14
+ATTR_MP_UNREACH_NLRI = 15
+ATTR_AS4_PATH = 17
+
+FLAG_OPTIONAL = 0x80
+FLAG_TRANSITIVE = 0x40
+FLAG_PARTIAL = 0x20
+FLAG_EXTENDED_LENGTH = 0x10
+
+AS_SET = 1
+AS_SEQUENCE = 2
+
+AFI_IP = 1
+AFI_IP6 = 2
+SAFI_UNICAST = 1
+
+# rf -> (AFI, SAFI)
+FAMILIES = {
+    'ipv4': (AFI_IP, SAFI_UNICAST),
+    'ipv6': (AFI_IP6, SAFI_UNICAST),
+}
+RF = {v: k for k, v in FAMILIES.items()}
+
+_BITS = {AFI_IP: 32, AFI_IP6: 128}
+
+
+# Messages
+
+def message(typ, body):
+    return MARKER + struct.pack('!HB', HEADER_LEN + len(body), typ) + body
+
+
+def keepalive():
+    return message(KEEPALIVE, b'')
+
+
+def notification(code, subcode, data=b''):
+    return message(NOTIFICATION, struct.pack('!BB', code, subcode) + data)
+
+
+def iter_messages(data):
+    """
+    Yields (type, body) of the messages in data, the bodies as zero-copy
+    memoryview slices. Raises ValueError on a truncated or broken stream.
+    """
+    view = memoryview(data)
+    i = 0
+    while i < len(view):
+        if len(view) - i < HEADER_LEN:
+            raise ValueError('truncated message header at {0}'.format(i))
+        if view[i:i + 16] != MARKER:
+            raise ValueError('bad marker at {0}'.format(i))
+        length, typ = struct.unpack_from('!HB', view, i + 16)
+        if length < HEADER_LEN or i + length > len(view):
+            raise ValueError('bad message length {0} at {1}'.format(length, i))
+        yield typ, view[i + HEADER_LEN:i + length]
+        i += length
+
+
+# OPEN
+
+def cap_multiprotocol(afi, safi):
+    return struct.pack('!BBHBB', CAP_MULTIPROTOCOL, 4, afi, 0, safi)
+
+
+def cap_route_refresh():
+    return struct.pack('!BB', CAP_ROUTE_REFRESH, 0)
+
+
+def cap_extended_message():
+    return struct.pack('!BB', CAP_EXTENDED_MESSAGE, 0)
+
+
+def cap_four_octet_as(asn):
+    return struct.pack('!BBI', CAP_FOUR_OCTET_AS, 4, asn)
+
+
+def cap_add_path(families):
+    """
+    families is a sequence of (AFI, SAFI, ADD_PATH_* mode).
+    """
+    value = b''.join(struct.pack('!HBB', afi, safi, mode) for afi, safi, mode in families)
+    return struct.pack('!BB', CAP_ADD_PATH, len(value)) + value
+
+
+def open_message(asn, hold_time, router_id, capabilities=()):
+    """
+    Returns an OPEN message with the given encoded capabilities, all in
+    one optional parameter. asn is sent as AS_TRANS when it does not fit
+    in two octets.
+    """
+    caps = b''.join(capabilities)
+    params = struct.pack('!BB', 2, len(caps)) + caps if caps else b''
+    my_as = asn if asn <= 0xffff else AS_TRANS
+    body = struct.pack('!BHH4sB', 4, my_as, hold_time,
+                       socket.inet_aton(router_id), len(params)) + params
+    return message(OPEN, body)
+
+
+def decode_open(body):
+    """
+    Returns the fields of an OPEN message body as a dict; 'capabilities'
+    lists the (code, value) of all of them, and the ones known are also
+    decoded into 'families', 'four_octet_as', 'add_path' ({(AFI, SAFI):
+    mode}), 'route_refresh' and 'extended_message'.
+    """
+    version, asn, hold_time, router_id, length = struct.unpack_from('!BHH4sB', body)
+    ret = {
+        'version': version,
+        'asn': asn,
+        'hold_time': hold_time,
+        'router_id': socket.inet_ntoa(router_id),
+        'capabilities': [],
+        'families': [],
+        'four_octet_as': None,
+        'add_path': {},
+        'route_refresh': False,
+        'extended_message': False,
+    }
+    params = bytes(body[10:10 + length])
+    i = 0
+    while i < len(params):
+        typ, plen = params[i], params[i + 1]
+        if typ == 2:
+            caps = params[i + 2:i + 2 + plen]
+            j = 0
+            while j < len(caps):
+                code, clen = caps[j], caps[j + 1]
+                value = caps[j + 2:j + 2 + clen]
+                ret['capabilities'].append((code, value))
+                if code == CAP_MULTIPROTOCOL:
+                    afi, _, safi = struct.unpack('!HBB', value)
+                    ret['families'].append((afi, safi))
+                elif code == CAP_ROUTE_REFRESH:
+                    ret['route_refresh'] = True
+                elif code == CAP_EXTENDED_MESSAGE:
+                    ret['extended_message'] = True
+                elif code == CAP_FOUR_OCTET_AS:
+                    ret['four_octet_as'] = struct.unpack('!I', value)[0]
+                elif code == CAP_ADD_PATH:
+                    for k in range(0, clen, 4):
+                        afi, safi, mode = struct.unpack_from('!HBB', value, k)
+                        ret['add_path'][(afi, safi)] = mode
+                j += 2 + clen
+        i += 2 + plen
+    if ret['four_octet_as'] is not None:
+        ret['asn'] = ret['four_octet_as']
+    return ret
+
+
+# NLRI
+
+def parse_prefix(prefix):
+    """
+    Returns (AFI, network address as an integer, length) of a prefix
+    string, its host bits cleared.
+    """
+    if ':' not in prefix:
+        addr, _, length = prefix.partition('/')
+        a, b, c, d = addr.split('.')
+        value = (int(a) << 24) | (int(b) << 16) | (int(c) << 8) | int(d)
+        length = int(length) if length else 32
+        if not 0 <= length <= 32:
+            raise ValueError('bad prefix length {0}'.format(length))
+        return AFI_IP, value & (0xffffffff << (32 - length)) & 0xffffffff, length
+    net = ipaddress.IPv6Network(prefix, strict=False)
+    return AFI_IP6, int(net.network_address), net.prefixlen
+
+
+def parse_prefixes(prefixes):
+    """
+    Returns the network addresses and lengths of prefix strings of one
+    family, as an array of unsigned 32 bit integers (IPv4) or a list
+    (IPv6), and an array of bytes.
+    """
+    values = None
+    lengths = array.array('B')
+    for p in prefixes:
+        afi, value, length = parse_prefix(p)
+        if values is None:
+            values = array.array('I') if afi == AFI_IP else []
+        values.append(value)
+        lengths.append(length)
+    return values if values is not None else array.array('I'), lengths
+
+
+def prefix_range(prefix, count):
+    """
+    Returns the network addresses and lengths of count consecutive
+    prefixes of the length of prefix, starting at prefix, without going
+    through strings: prefix_range('10.0.0.0/24', 3) stands for 10.0.0.0/24,
+    10.0.1.0/24 and 10.0.2.0/24.
+    """
+    afi, value, length = parse_prefix(prefix)
+    step = 1 << (_BITS[afi] - length)
+    if (value >> (_BITS[afi] - length)) + count > 1 << length:
+        raise ValueError('{0} prefixes from {1} overflow'.format(count, prefix))
+    if afi == AFI_IP:
+        prefixes = array.array('I', range(value, value + step * count, step))
+    else:
+        prefixes = list(range(value, value + step * count, step))
+    return prefixes, array.array('B', [length]) * count
+
+
+def format_prefix(value, length, afi=AFI_IP):
+    if afi == AFI_IP:
+        return '{0}.{1}.{2}.{3}/{4}'.format(value >> 24, (value >> 16) & 0xff,
+                                            (value >> 8) & 0xff, value & 0xff, length)
+    return '{0}/{1}'.format(ipaddress.IPv6Address(value), length)
+
+
+def nlri_records(prefixes, lengths, afi=AFI_IP, path_ids=None):
+    """
+    Returns the NLRI encoding of each prefix, a list of bytes, from the
+    network addresses and lengths (and path identifiers, for add-path).
+    """
+    bits = _BITS[afi]
+    # length -> (shift, record size), so the loop below is one shift and
+    # one to_bytes() per prefix
+    layout = [(bits - 8 * ((length + 7) // 8), (length + 7) // 8 + 1)
+              for length in range(bits + 1)]
+    records = [((length << (8 * (layout[length][1] - 1))) | (p >> layout[length][0]))
+               .to_bytes(layout[length][1], 'big')
+               for p, length in zip(prefixes, lengths)]
+    if path_ids is not None:
+        records = [struct.pack('!I', i) + r for i, r in zip(path_ids, records)]
+    return records
+
+
+def unpack_nlri(data, afi=AFI_IP, addpath=False):
+    """
+    Decodes the NLRI of data into network addresses, lengths and path
+    identifiers (None without add-path), as parallel sequences: arrays,
+    except for the IPv6 addresses which are a list.
+    """
+    bits = _BITS[afi]
+    view = bytes(data)
+    prefixes = array.array('I') if afi == AFI_IP else []
+    lengths = array.array('B')
+    path_ids = array.array('I') if addpath else None
+    i = 0
+    end = len(view)
+    while i < end:
+        if addpath:
+            path_ids.append(int.from_bytes(view[i:i + 4], 'big'))
+            i += 4
+        length = view[i]
+        if length > bits:
+            raise ValueError('bad prefix length {0}'.format(length))
+        n = (length + 7) // 8
+        if i + 1 + n > end:
+            raise ValueError('truncated NLRI at {0}'.format(i))
+        prefixes.append(int.from_bytes(view[i + 1:i + 1 + n], 'big') << (bits - 8 * n))
+        lengths.append(length)
+        i += 1 + n
+    return prefixes, lengths, path_ids
+
+
+def decode_nlri(data, afi=AFI_IP, addpath=False):
+    """
+    Returns the NLRI of data as a list of (prefix string, path identifier).
+    """
+    prefixes, lengths, path_ids = unpack_nlri(data, afi, addpath)
+    if path_ids is None:
+        path_ids = [None] * len(lengths)
+    return [(format_prefix(p, l, afi), i) for p, l, i in zip(prefixes, lengths, path_ids)]
+
+
+# Path attributes
+
+def attribute(flags, typ, value):
+    """
+    Returns an encoded path attribute, with the extended length flag set
+    when value needs it.
+    """
+    if len(value) > 255:
+        return struct.pack('!BBH', flags | FLAG_EXTENDED_LENGTH, typ, len(value)) + value
+    return struct.pack('!BBB', flags & ~FLAG_EXTENDED_LENGTH, typ, len(value)) + value
+
+
+def _as_path_value(segments, four_octet_as):
+    fmt = 'I' if four_octet_as else 'H'
+    value = b''
+    for typ, asns in segments:
+        # a segment holds up to 255 ASes
+        for i in range(0, max(len(asns), 1), 255):
+            chunk = asns[i:i + 255]
+            value += struct.pack('!BB{0}{1}'.format(len(chunk), fmt), typ, len(chunk), *chunk)
+    return value
+
+
+def _as_path_attributes(segments, four_octet_as):
+    # Returns the AS_PATH attribute and the AS4_PATH one, if needed
+    if four_octet_as or all(a <= 0xffff for _, asns in segments for a in asns):
+        return attribute(FLAG_TRANSITIVE, ATTR_AS_PATH, _as_path_value(segments, four_octet_as)), b''
+    trans = [(t, [a if a <= 0xffff else AS_TRANS for a in asns]) for t, asns in segments]
+    return (attribute(FLAG_TRANSITIVE, ATTR_AS_PATH, _as_path_value(trans, False)),
+            attribute(FLAG_OPTIONAL | FLAG_TRANSITIVE, ATTR_AS4_PATH, _as_path_value(segments, True)))
+
+
+def path_attributes(origin=0, as_path=(), next_hop=None, med=None,
+                    local_pref=None, communities=None, four_octet_as=True,
+                    as_set=None):
+    """
+    Returns the encoded ORIGIN, AS_PATH, NEXT_HOP (IPv4), MULTI_EXIT_DISC,
+    LOCAL_PREF and COMMUNITIES ("<high>:<low>" strings or integers)
+    attributes, in type code order.
+
+    Towards a 2-octet AS speaker, the ASes which do not fit are sent as
+    AS_TRANS and the actual path in AS4_PATH.
+    """
+    segments = [(AS_SEQUENCE, list(as_path))] if as_path else []
+    if as_set:
+        segments.append((AS_SET, list(as_set)))
+    as_path, as4_path = _as_path_attributes(segments, four_octet_as)
+    b = attribute(FLAG_TRANSITIVE, ATTR_ORIGIN, bytes([origin])) + as_path
+    if next_hop is not None:
+        b += attribute(FLAG_TRANSITIVE, ATTR_NEXT_HOP, socket.inet_aton(next_hop))
+    if med is not None:
+        b += attribute(FLAG_OPTIONAL, ATTR_MULTI_EXIT_DISC, struct.pack('!I', med))
+    if local_pref is not None:
+        b += attribute(FLAG_TRANSITIVE, ATTR_LOCAL_PREF, struct.pack('!I', local_pref))
+    if communities:
+        values = [c if isinstance(c, int) else (int(c.split(':')[0]) << 16) | int(c.split(':')[1])
+                  for c in communities]
+        b += attribute(FLAG_OPTIONAL | FLAG_TRANSITIVE, ATTR_COMMUNITIES,
+                       struct.pack('!{0}I'.format(len(values)), *values))
+    return b + as4_path
+
+
+def exabgp_attribute(attr):
+    """
+    Returns an encoded path attribute in the form of the attribute
+    argument of ExaBGPContainer.add_route(), e.g. '0x0e 0x60 0x11223344'.
+    ExaBGP computes the length itself, so a malformed value can be given
+    with attribute(flags, typ, value).
+    """
+    attr = bytes(attr)
+    hlen = 4 if attr[0] & FLAG_EXTENDED_LENGTH else 3
+    return '0x{0:02x} 0x{1:02x} 0x{2}'.format(
+        attr[1], attr[0] & ~FLAG_EXTENDED_LENGTH, attr[hlen:].hex())
+
+
+def mp_reach_nlri(afi, safi, next_hop, nlri=b''):
+    """
+    Returns an MP_REACH_NLRI attribute; next_hop is an address string or
+    a (global, link-local) tuple.
+    """
+    hops = next_hop if isinstance(next_hop, tuple) else (next_hop,)
+    nh = b''.join(ipaddress.ip_address(h).packed for h in hops)
+    return attribute(FLAG_OPTIONAL, ATTR_MP_REACH_NLRI,
+                     struct.pack('!HBB', afi, safi, len(nh)) + nh + b'\0' + nlri)
+
+
+def mp_unreach_nlri(afi, safi, nlri=b''):
+    return attribute(FLAG_OPTIONAL, ATTR_MP_UNREACH_NLRI, struct.pack('!HB', afi, safi) + nlri)
+
+
+def _decode_as_path(value, four_octet_as):
+    size = 4 if four_octet_as else 2
+    fmt = 'I' if four_octet_as else 'H'
+    segments = []
+    j = 0
+    while j < len(value):
+        typ, n = value[j], value[j + 1]
+        if j + 2 + n * size > len(value):
+            raise ValueError('truncated AS_PATH segment')
+        segments.append((typ, list(struct.unpack_from('!{0}{1}'.format(n, fmt), value, j + 2))))
+        j += 2 + n * size
+    return segments
+
+
+def _merge_as4_path(segments, as4_segments):
+    # RFC 6793 4.2.3: the leading ASes of AS_PATH followed by AS4_PATH
+    count = sum(len(asns) if t == AS_SEQUENCE else 1 for t, asns in segments)
+    count4 = sum(len(asns) if t == AS_SEQUENCE else 1 for t, asns in as4_segments)
+    if count4 > count:
+        return segments
+    keep = count - count4
+    merged = []
+    for t, asns in segments:
+        if keep <= 0:
+            break
+        if t == AS_SEQUENCE:
+            merged.append((t, asns[:keep]))
+            keep -= len(asns[:keep])
+        else:
+            merged.append((t, asns))
+            keep -= 1
+    return merged + as4_segments
+
+
+def decode_path_attributes(data, four_octet_as=True):
+    """
+    Decodes the path attributes of an UPDATE into a dict holding 'origin',
+    'as_path' ([(segment type, [AS, ...])]), 'aspath' (the ASes
+    flattened), 'nexthop', 'med', 'local-pref', 'community' (integers),
+    'mp_reach' ([(rf, nexthop, NLRI bytes)]), 'mp_unreach' ([(rf, NLRI
+    bytes)]) and 'unknown' ({type: (flags, value)}).
+    """
+    attrs = {'origin': None, 'as_path': [], 'aspath': [], 'nexthop': None,
+             'med': None, 'local-pref': None, 'community': None,
+             'mp_reach': [], 'mp_unreach': [], 'unknown': {}}
+    as4_path = None
+    view = bytes(data)
+    i = 0
+    while i < len(view):
+        if len(view) - i < 3:
+            raise ValueError('truncated attribute header at {0}'.format(i))
+        flags, typ = view[i], view[i + 1]
+        if flags & FLAG_EXTENDED_LENGTH:
+            length = struct.unpack_from('!H', view, i + 2)[0]
+            i += 4
+        else:
+            length = view[i + 2]
+            i += 3
+        if i + length > len(view):
+            raise ValueError('attribute {0} overruns the attributes'.format(typ))
+        value = view[i:i + length]
+        i += length
+        if typ == ATTR_ORIGIN:
+            attrs['origin'] = value[0]
+        elif typ == ATTR_AS_PATH:
+            attrs['as_path'] = _decode_as_path(value, four_octet_as)
+        elif typ == ATTR_AS4_PATH:
+            as4_path = _decode_as_path(value, True)
+        elif typ == ATTR_NEXT_HOP:
+            attrs['nexthop'] = socket.inet_ntoa(value)
+        elif typ == ATTR_MULTI_EXIT_DISC:
+            attrs['med'] = struct.unpack('!I', value)[0]
+        elif typ == ATTR_LOCAL_PREF:
+            attrs['local-pref'] = struct.unpack('!I', value)[0]
+        elif typ == ATTR_COMMUNITIES:
+            attrs['community'] = list(struct.unpack('!{0}I'.format(length // 4), value))
+        elif typ == ATTR_MP_REACH_NLRI:
+            afi, safi, nhlen = struct.unpack_from('!HBB', value)
+            rf = RF.get((afi, safi))
+            if rf is None:
+                attrs['unknown'][typ] = (flags, value)
+                continue
+            # the global address only, when a link-local one follows
+            size = 4 if afi == AFI_IP else 16
+            nexthop = str(ipaddress.ip_address(value[4:4 + min(nhlen, size)]))
+            attrs['mp_reach'].append((rf, nexthop, value[5 + nhlen:]))
+        elif typ == ATTR_MP_UNREACH_NLRI:
+            afi, safi = struct.unpack_from('!HB', value)
+            rf = RF.get((afi, safi))
+            if rf is None:
+                attrs['unknown'][typ] = (flags, value)
+                continue
+            attrs['mp_unreach'].append((rf, value[3:]))
+        else:
+            attrs['unknown'][typ] = (flags, value)
+    if as4_path is not None and not four_octet_as:
+        attrs['as_path'] = _merge_as4_path(attrs['as_path'], as4_path)
+    attrs['aspath'] = [a for _, asns in attrs['as_path'] for a in asns]
+    return attrs
+
+
+# UPDATE
+
+def decode_update(body, four_octet_as=True, addpath=()):
+    """
+    Decodes an UPDATE message body into a dict holding 'withdrawn' and
+    'nlri' (the IPv4 NLRI as lists of (prefix string, path identifier)),
+    'attributes' (see decode_path_attributes()), and 'mp_reach' ([(rf,
+    nexthop, [(prefix, path identifier)])]) and 'mp_unreach' ([(rf,
+    [(prefix, path identifier)])]). addpath lists the families (rf) whose
+    NLRI carry path identifiers.
+    """
+    view = bytes(body)
+    wlen = struct.unpack_from('!H', view)[0] if len(view) >= 2 else len(view)
+    if 4 + wlen > len(view):
+        raise ValueError('bad UPDATE withdrawn routes length')
+    alen = struct.unpack_from('!H', view, 2 + wlen)[0]
+    if 4 + wlen + alen > len(view):
+        raise ValueError('bad UPDATE lengths')
+    attrs = decode_path_attributes(view[4 + wlen:4 + wlen + alen], four_octet_as)
+    return {
+        'withdrawn': decode_nlri(view[2:2 + wlen], AFI_IP, 'ipv4' in addpath),
+        'attributes': attrs,
+        'nlri': decode_nlri(view[4 + wlen + alen:], AFI_IP, 'ipv4' in addpath),
+        'mp_reach': [(rf, nh, decode_nlri(data, FAMILIES[rf][0], rf in addpath))
+                     for rf, nh, data in attrs['mp_reach']],
+        'mp_unreach': [(rf, decode_nlri(data, FAMILIES[rf][0], rf in addpath))
+                       for rf, data in attrs['mp_unreach']],
+    }
+
+
+def convert_as_path(body, four_octet_as, to_four_octet_as):
+    """
+    Returns an UPDATE message body received over a session with (or
+    without) 4-octet AS, with AS_PATH and AS4_PATH re-encoded for a session
+    with (or without) it; the other attributes are copied verbatim.
+    """
+    view = bytes(body)
+    if four_octet_as == to_four_octet_as:
+        return view
+    wlen = struct.unpack_from('!H', view)[0]
+    alen = struct.unpack_from('!H', view, 2 + wlen)[0]
+    data = view[4 + wlen:4 + wlen + alen]
+    kept = []
+    segments = None
+    as4_segments = None
+    i = 0
+    while i < len(data):
+        start = i
+        flags, typ = data[i], data[i + 1]
+        if flags & FLAG_EXTENDED_LENGTH:
+            length = struct.unpack_from('!H', data, i + 2)[0]
+            i += 4
+        else:
+            length = data[i + 2]
+            i += 3
+        value = data[i:i + length]
+        i += length
+        if typ == ATTR_AS_PATH:
+            segments = _decode_as_path(value, four_octet_as)
+            # keeps the position of AS_PATH
+            kept.append(None)
+        elif typ == ATTR_AS4_PATH:
+            as4_segments = _decode_as_path(value, True)
+        else:
+            kept.append(data[start:i])
+    if segments is None:
+        return view
+    if as4_segments is not None and not four_octet_as:
+        segments = _merge_as4_path(segments, as4_segments)
+    as_path, as4_path = _as_path_attributes(segments, to_four_octet_as)
+    attrs = b''.join(as_path if a is None else a for a in kept) + as4_path
+    head = view[:2 + wlen] + struct.pack('!H', len(attrs))
+    return head + attrs + view[4 + wlen + alen:]
+
+
+def updates(records, afi=AFI_IP, safi=SAFI_UNICAST, attributes=b'',
+            next_hop=None, withdraw=False, max_len=MAX_LEN):
+    """
+    Greedily packs NLRI records (see nlri_records()) sharing the given
+    encoded path attributes into as few UPDATE messages of at most max_len
+    bytes as possible, and returns the messages.
+
+    IPv4 unicast goes in the NLRI (or withdrawn routes) field, the other
+    families in MP_REACH_NLRI, with next_hop, or MP_UNREACH_NLRI.
+    """
+    mp = (afi, safi) != (AFI_IP, SAFI_UNICAST)
+    if withdraw:
+        attributes = b''
+    if mp and withdraw:
+        head = mp_unreach_nlri(afi, safi)
+    elif mp:
+        head = mp_reach_nlri(afi, safi, next_hop)
+    # room for the NLRI: header, the two length fields, the attributes and
+    # the MP attribute, whose length field may become extended
+    room = max_len - HEADER_LEN - 4 - len(attributes)
+    if mp:
+        room -= len(head) + 1
+    if room <= 0:
+        raise ValueError('attributes do not fit in {0} bytes'.format(max_len))
+
+    msgs = []
+    batch = []
+    size = 0
+    for r in records:
+        if size + len(r) > room and batch:
+            msgs.append(_update(batch, mp, head if mp else None, attributes, withdraw))
+            batch = []
+            size = 0
+        batch.append(r)
+        size += len(r)
+    if batch:
+        msgs.append(_update(batch, mp, head if mp else None, attributes, withdraw))
+    return msgs
+
+
+def _update(batch, mp, head, attributes, withdraw):
+    nlri = b''.join(batch)
+    if mp:
+        # re-encodes the MP attribute header with the NLRI appended
+        flags, typ = head[0], head[1]
+        hlen = 4 if flags & FLAG_EXTENDED_LENGTH else 3
+        attrs = attributes + attribute(flags, typ, head[hlen:] + nlri)
+        return message(UPDATE, struct.pack('!HH', 0, len(attrs)) + attrs)
+    if withdraw:
+        return message(UPDATE, struct.pack('!H', len(nlri)) + nlri + struct.pack('!H', 0))
+    return message(UPDATE, struct.pack('!HH', 0, len(attributes)) + attributes + nlri)
+
+
+def end_of_rib(afi=AFI_IP, safi=SAFI_UNICAST):
+    if (afi, safi) == (AFI_IP, SAFI_UNICAST):
+        return message(UPDATE, struct.pack('!HH', 0, 0))
+    attrs = mp_unreach_nlri(afi, safi)
+    return message(UPDATE, struct.pack('!HH', 0, len(attrs)) + attrs)
@@ -32,6 +32,7 @@ class BirdContainer(BGPContainer):
 
     WAIT_FOR_BOOT = 1
     SHARED_VOLUME = '/etc/bird'
+    DAEMON = 'bird'
 
     def __init__(self, name, asn, router_id, ctn_image_name='osrg/bird'):
         super(BirdContainer, self).__init__(name, asn, router_id,
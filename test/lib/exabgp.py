@@ -13,24 +13,149 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import queue
+import subprocess
+import threading
+import time
 
 from lib.base import (
     BGPContainer,
     CmdBuffer,
+    LOOKUP_OPTIONS,
+    prefix_matches,
     try_several_times,
     wait_for_completion,
     yellow,
 )
 
 
+class ExaBGPAPISession(object):
+    """
+    Long-lived "docker exec -i" session holding the API named pipes of
+    ExaBGP open. Commands are written to /run/exabgp.in and the replies of
+    ExaBGP ("done" or "error" after each command) are read back from
+    /run/exabgp.out, the same way exabgpcli does for a single command.
+    """
+
+    API_IN = '/run/exabgp.in'
+    API_OUT = '/run/exabgp.out'
+    ACKS = ('done', 'error')
+
+    def __init__(self, ctn, timeout=60):
+        self.ctn = ctn
+        self.timeout = timeout
+        self._replies = queue.Queue()
+        cmd = 'cat {0} & exec cat > {1}'.format(self.API_OUT, self.API_IN)
+        self._process = subprocess.Popen(
+            ctn.exec_argv(['sh', '-c', cmd]),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self._reader = threading.Thread(target=self._read)
+        self._reader.daemon = True
+        self._reader.start()
+
+    def _read(self):
+        for line in iter(self._process.stdout.readline, b''):
+            self._replies.put(line.decode('utf-8').rstrip('\n'))
+        # Wakes up the waiters when the session is gone
+        self._replies.put(None)
+
+    def _reply(self):
+        try:
+            line = self._replies.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError('{0}: no reply from ExaBGP in {1} sec'.format(
+                self.ctn.name, self.timeout))
+        if line is None:
+            raise RuntimeError('{0}: ExaBGP API session closed'.format(self.ctn.name))
+        return line
+
+    def alive(self):
+        return self._process.poll() is None
+
+    def write(self, cmds):
+        data = ''.join('{0}\n'.format(c) for c in cmds)
+        self._process.stdin.write(data.encode('utf-8'))
+        self._process.stdin.flush()
+
+    def command(self, cmd):
+        """
+        Runs a single command and returns its output lines, excluding the
+        trailing acknowledgement.
+        """
+        self.write([cmd])
+        lines = []
+        while True:
+            line = self._reply()
+            if line == 'error':
+                raise RuntimeError('{0}: ExaBGP rejected "{1}"'.format(self.ctn.name, cmd))
+            elif line == 'done':
+                return lines
+            lines.append(line)
+
+    def send(self, cmds, batch_size=1000):
+        """
+        Streams the given commands, batch_size lines per write, and waits
+        for the acknowledgement of every command of a batch before writing
+        the next one. Returns the number of commands ExaBGP rejected.
+        """
+        errors = 0
+        batch = []
+        for cmd in cmds:
+            batch.append(cmd)
+            if len(batch) >= batch_size:
+                errors += self._send_batch(batch)
+                batch = []
+        if batch:
+            errors += self._send_batch(batch)
+        return errors
+
+    def _send_batch(self, batch):
+        self.write(batch)
+        errors = 0
+        acked = 0
+        while acked < len(batch):
+            line = self._reply()
+            if line not in self.ACKS:
+                continue
+            acked += 1
+            if line == 'error':
+                errors += 1
+        return errors
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+        # "cat" of the reply pipe is left behind by "exec", stop it too
+        self.ctn.local("pkill -f 'cat {0}' || true".format(self.API_OUT), capture=True)
+        self._reader.join(5)
+
+
 class ExaBGPContainer(BGPContainer):
 
     SHARED_VOLUME = '/shared_volume'
     PID_FILE = '/var/run/exabgp.pid'
+    DAEMON = 'exabgp'
+    # Seconds a parsed "show adj-rib" output is reused for. The cache only
+    # sees the changes made through this container, not the ones of its
+    # peers, so it is off unless a test sets this (e.g. e1.ADJ_RIB_TTL = 1)
+    ADJ_RIB_TTL = 0
+    ADJ_RIB_FAMILIES = {
+        ('ipv4', 'unicast'): 'ipv4',
+        ('ipv6', 'unicast'): 'ipv6',
+        ('ipv4', 'flow'): 'ipv4-flowspec',
+        ('ipv6', 'flow'): 'ipv6-flowspec',
+    }
 
     def __init__(self, name, asn, router_id, ctn_image_name='osrg/exabgp:4.0.5'):
         super(ExaBGPContainer, self).__init__(name, asn, router_id, ctn_image_name)
         self.shared_volumes.append((self.config_dir, self.SHARED_VOLUME))
+        self._api_session = None
+        self._adj_rib_snapshots = {}
 
     def _pre_start_exabgp(self):
         # Create named pipes for "exabgpcli"
@@ -49,19 +174,62 @@ class ExaBGPContainer(BGPContainer):
 
     def _wait_for_boot(self):
         def _f():
+            if self._api_session is not None:
+                try:
+                    self._api('version')
+                    return True
+                except RuntimeError:
+                    return False
             ret = self.local('exabgpcli version > /dev/null 2>&1; echo $?', capture=True)
             return ret == '0'
 
         return wait_for_completion(_f)
 
-    def run(self):
-        super(ExaBGPContainer, self).run()
+    def local(self, cmd, *args, **kwargs):
+        if self._api_session is not None and 'exabgpcli' in cmd:
+            # the reader of the session would take the reply
+            raise RuntimeError('{0}: exabgpcli cannot be used while the API session '
+                               'is open, use close_api_session() first'.format(self.name))
+        return super(ExaBGPContainer, self).local(cmd, *args, **kwargs)
+
+    def open_api_session(self, timeout=60):
+        """
+        Opens an ExaBGPAPISession and routes add_route()/del_route(), the
+        adj-RIB queries and the other API commands of the container through
+        it until close_api_session(). exabgpcli cannot be run meanwhile.
+        """
+        if self._api_session is None or not self._api_session.alive():
+            self._api_session = ExaBGPAPISession(self, timeout=timeout)
+        return self._api_session
+
+    def close_api_session(self):
+        if self._api_session is not None:
+            self._api_session.close()
+            self._api_session = None
+
+    def _api(self, cmd):
+        if self._api_session is not None:
+            return self._api_session.command(cmd)
+        return self.local("exabgpcli '{0}'".format(cmd), capture=True).split('\n')
+
+    def run(self, boot=True):
+        self.close_api_session()
+        self._invalidate_adj_rib()
+        super(ExaBGPContainer, self).run(boot)
         self._pre_start_exabgp()
         # To start ExaBGP, it is required to configure neighbor settings, so
         # here does not start ExaBGP yet.
         # self._start_exabgp()
         return self.WAIT_FOR_BOOT
 
+    def boot(self):
+        """
+        Starts ExaBGP with the config rendered by create_config(), if it
+        has peers.
+        """
+        self.reload_config()
+        return 0
+
     def create_config(self):
         # Manpage of exabgp.conf(5):
         # https://github.com/Exa-Networks/exabgp/blob/master/doc/man/exabgp.conf.5
@@ -104,6 +272,10 @@ class ExaBGPContainer(BGPContainer):
         if not self.peers:
             return
 
+        # ExaBGP re-opens the named pipes when it restarts
+        self.close_api_session()
+        self._invalidate_adj_rib()
+
         def _reload():
             if self._is_running():
                 self.local('/usr/bin/pkill --pidfile {0} && rm -f {0}'.format(self.PID_FILE), capture=True)
@@ -196,14 +368,98 @@ class ExaBGPContainer(BGPContainer):
             'thens': thens,
         }
 
-        cmd = CmdBuffer(' ')
-        cmd << "exabgpcli 'announce"
-        cmd << self._construct_path(path, rf=rf)
-        cmd << "'"
-        self.local(str(cmd), capture=True)
+        self._invalidate_adj_rib()
+        self._api('announce {0}'.format(self._construct_path(path, rf=rf)))
 
         self.routes[route].append(path)
 
+    def _new_path(self, r, rf):
+        if not isinstance(r, dict):
+            r = {'prefix': r}
+        return {
+            'prefix': r['prefix'],
+            'rf': rf,
+            'attr': r.get('attr'),
+            'next-hop': r.get('next-hop'),
+            'as-path': r.get('as-path'),
+            'community': r.get('community'),
+            'med': r.get('med'),
+            'local-pref': r.get('local-pref'),
+            'extended-community': r.get('extended-community'),
+            'identifier': r.get('identifier'),
+            'matchs': r.get('matchs'),
+            'thens': r.get('thens'),
+        }
+
+    def _stream(self, cmds, batch_size):
+        self._invalidate_adj_rib()
+        session = self._api_session
+        temporary = session is None
+        if temporary:
+            session = ExaBGPAPISession(self)
+        try:
+            start = time.time()
+            errors = session.send(cmds, batch_size=batch_size)
+            return time.time() - start, errors
+        finally:
+            if temporary:
+                session.close()
+
+    def add_routes(self, routes, rf='ipv4', batch_size=1000):
+        """
+        Announces many routes through one ExaBGPAPISession and returns the
+        achieved updates/second.
+
+        Each element of routes is either a prefix or a dict holding
+        'prefix' and any of 'next-hop', 'as-path', 'community', 'med',
+        'local-pref', 'extended-community', 'attr' and 'identifier', like
+        the entries of self.routes.
+        """
+        if not self._is_running():
+            raise RuntimeError('ExaBGP is not yet running')
+
+        paths = [self._new_path(r, rf) for r in routes]
+        cmds = ('announce {0}'.format(self._construct_path(p, rf=rf)) for p in paths)
+        elapsed, errors = self._stream(cmds, batch_size)
+        if errors:
+            raise RuntimeError('ExaBGP rejected {0} of {1} announcements'.format(
+                errors, len(paths)))
+
+        for path in paths:
+            self.routes.setdefault(path['prefix'], []).append(path)
+
+        return len(paths) / elapsed if elapsed > 0 else float(len(paths))
+
+    def del_routes(self, routes, batch_size=1000):
+        """
+        Withdraws many routes previously added, through one
+        ExaBGPAPISession. Each element of routes is either a prefix or a
+        (prefix, identifier) tuple.
+        """
+        if not self._is_running():
+            raise RuntimeError('ExaBGP is not yet running')
+
+        paths = []
+        for r in routes:
+            route, identifier = r if isinstance(r, tuple) else (r, None)
+            kept = []
+            for p in self.routes.get(route, []):
+                if p['identifier'] == identifier:
+                    paths.append(p)
+                else:
+                    kept.append(p)
+            if route in self.routes:
+                self.routes[route] = kept
+        if not paths:
+            return
+
+        cmds = ('withdraw {0}'.format(self._construct_path(p, rf=p['rf'], is_withdraw=True))
+                for p in paths)
+        _, errors = self._stream(cmds, batch_size)
+        if errors:
+            raise RuntimeError('ExaBGP rejected {0} of {1} withdrawals'.format(
+                errors, len(paths)))
+
     def del_route(self, route, identifier=None, reload_config=False):
         if not self._is_running():
             raise RuntimeError('ExaBGP is not yet running')
@@ -219,67 +475,110 @@ class ExaBGPContainer(BGPContainer):
             return
 
         rf = path['rf']
-        cmd = CmdBuffer(' ')
-        cmd << "exabgpcli 'withdraw"
-        cmd << self._construct_path(path, rf=rf, is_withdraw=True)
-        cmd << "'"
-        self.local(str(cmd), capture=True)
+        self._invalidate_adj_rib()
+        self._api('withdraw {0}'.format(self._construct_path(path, rf=rf, is_withdraw=True)))
 
         self.routes[route] = new_paths
 
-    def _get_adj_rib(self, peer, rf, in_out='in'):
+    def _invalidate_adj_rib(self):
+        self._adj_rib_snapshots = {}
+
+    def _parse_adj_rib(self, lines):
         # IPv4 Unicast:
         # neighbor 172.17.0.2 ipv4 unicast 192.168.100.0/24 path-information 0.0.0.20 next-hop self
         # IPv6 FlowSpec:
         # neighbor 172.17.0.2 ipv6 flow flow destination-ipv6 2002:1::/64/0 source-ipv6 2002:2::/64/0 next-header =udp flow-label >100
-        rf_map = {
-            'ipv4': ['ipv4', 'unicast'],
-            'ipv6': ['ipv6', 'unicast'],
-            'ipv4-flowspec': ['ipv4', 'flow'],
-            'ipv6-flowspec': ['ipv6', 'flow'],
-        }
-        assert rf in rf_map
-        assert in_out in ('in', 'out')
-        peer_addr = self.peer_name(peer)
-        lines = self.local('exabgpcli show adj-rib {0}'.format(in_out), capture=True).split('\n')
-        # rib = {
-        #     <nlri>: [
-        #         {
-        #             'nlri': <nlri>,
-        #             'next-hop': <next-hop>,
+        #
+        # index = {
+        #     (<peer address>, <rf>): {
+        #         <nlri>: [
+        #             {
+        #                 'nlri': <nlri>,
+        #                 'next-hop': <next-hop>,
+        #                 ...
+        #             },
         #             ...
-        #         },
-        #         ...
-        #     ],
+        #         ],
+        #     },
         # }
-        rib = {}
+        index = {}
         for line in lines:
-            if not line:
-                continue
             values = line.split()
-            if peer_addr != values[1]:
+            if len(values) < 5:
                 continue
-            elif rf is not None and rf_map[rf] != values[2:4]:
+            rf = self.ADJ_RIB_FAMILIES.get(tuple(values[2:4]))
+            if rf is None:
                 continue
+            rib = index.setdefault((values[1], rf), {})
             if rf in ('ipv4', 'ipv6'):
                 nlri = values[4]
-                rib.setdefault(nlri, [])
                 path = {k: v for k, v in zip(*[iter(values[5:])] * 2)}
-                path['nlri'] = nlri
-                rib[nlri].append(path)
-            elif rf in ('ipv4-flowspec', 'ipv6-flowspec'):
+            else:
                 # XXX: Missing path attributes?
                 nlri = ' '.join(values[5:])
-                rib.setdefault(nlri, [])
-                path = {'nlri': nlri}
-                rib[nlri].append(path)
-        return rib
-
-    def get_adj_rib_in(self, peer, rf='ipv4'):
-        return self._get_adj_rib(peer, rf, 'in')
-
-    def get_adj_rib_out(self, peer, rf='ipv4'):
-        return self._get_adj_rib(peer, rf, 'out')
+                path = {}
+            path['nlri'] = nlri
+            rib.setdefault(nlri, []).append(path)
+        return index
+
+    def _adj_rib_snapshot(self, in_out):
+        """
+        Returns the parsed "show adj-rib in|out" of all the peers and
+        families, reusing the last one for ADJ_RIB_TTL seconds.
+        """
+        cached = self._adj_rib_snapshots.get(in_out)
+        if cached is not None and time.time() - cached[0] < self.ADJ_RIB_TTL:
+            return cached[1]
+        now = time.time()
+        index = self._parse_adj_rib(self._api('show adj-rib {0}'.format(in_out)))
+        self._adj_rib_snapshots[in_out] = (now, index)
+        return index
+
+    def _get_adj_rib(self, peer, rf, in_out='in', prefixes=None, lookup='exact'):
+        assert rf in self.ADJ_RIB_FAMILIES.values()
+        assert in_out in ('in', 'out')
+        if lookup not in LOOKUP_OPTIONS:
+            raise Exception('invalid lookup option {0}'.format(lookup))
+        peer_addr = self.peer_name(peer)
+        if prefixes is not None:
+            if rf not in ('ipv4', 'ipv6'):
+                raise ValueError('prefix lookup is not supported for {0}'.format(rf))
+            if not prefixes:
+                return {}
+            prefixes = set(prefixes)
+
+        cached = self._adj_rib_snapshots.get(in_out)
+        fresh = cached is not None and time.time() - cached[0] < self.ADJ_RIB_TTL
+        if prefixes is not None and lookup == 'exact' and not fresh and self._api_session is None:
+            # Filter the output inside the container, so that only the
+            # lines for the given prefixes are transferred.
+            patterns = ' '.join('-e {0}'.format(p) for p in prefixes)
+            cmd = 'sh -c "exabgpcli show adj-rib {0} | grep -F -w {1} || true"'.format(
+                in_out, patterns)
+            index = self._parse_adj_rib(self.local(cmd, capture=True).split('\n'))
+        else:
+            index = self._adj_rib_snapshot(in_out)
+
+        # the paths are copied, the cached ones may be returned again
+        rib = index.get((peer_addr, rf), {})
+        if prefixes is None:
+            nlris = rib
+        elif lookup == 'exact':
+            nlris = [nlri for nlri in prefixes if nlri in rib]
+        else:
+            nlris = [nlri for nlri in rib if any(prefix_matches(nlri, p, lookup) for p in prefixes)]
+        return {nlri: [dict(path) for path in rib[nlri]] for nlri in nlris}
+
+    def get_adj_rib_in(self, peer, rf='ipv4', prefixes=None, lookup='exact'):
+        """
+        Returns the paths received from peer as a dict of NLRI -> paths,
+        those of the destinations matching any of prefixes only if given,
+        as in lookup_global_rib() of the other containers.
+        """
+        return self._get_adj_rib(peer, rf, 'in', prefixes, lookup)
+
+    def get_adj_rib_out(self, peer, rf='ipv4', prefixes=None, lookup='exact'):
+        return self._get_adj_rib(peer, rf, 'out', prefixes, lookup)
 
 
 class RawExaBGPContainer(ExaBGPContainer):
@@ -16,11 +16,14 @@
 
 
 import collections
+import contextlib
 import json
 from itertools import chain
 from threading import Thread
 import subprocess
 import os
+import time
+import urllib.request
 
 import netaddr
 import toml
@@ -42,28 +45,155 @@ from lib.base import (
     BGP_FSM_IDLE,
     BGP_FSM_ACTIVE,
     BGP_FSM_ESTABLISHED,
+    LOOKUP_OPTIONS,
     yellow,
     indent,
     local,
 )
+from lib import gobgp_api
 
 
 def extract_path_attribute(path, typ):
+    if isinstance(path, RibPath):
+        return path.attr(typ)
     for a in path['attrs']:
         if a['type'] == typ:
             return a
     return None
 
 
+def _get_nexthop(path):
+    a = path.attr(BGP_ATTR_TYPE_NEXT_HOP) or path.attr(BGP_ATTR_TYPE_MP_REACH_NLRI)
+    if a:
+        return a['nexthop']
+    return None
+
+
+def _get_as_path(path):
+    a = path.attr(BGP_ATTR_TYPE_AS_PATH)
+    if not a or not a.get('as_paths'):
+        return []
+    return list(chain.from_iterable(asp['asns'] for asp in a['as_paths']))
+
+
+def _get_local_pref(path):
+    a = path.attr(BGP_ATTR_TYPE_LOCAL_PREF)
+    if a:
+        return a['value']
+    return None
+
+
+def _get_med(path):
+    a = path.attr(BGP_ATTR_TYPE_MULTI_EXIT_DISC)
+    if a:
+        return a['metric']
+    return None
+
+
+def _get_community(path):
+    a = path.attr(BGP_ATTR_TYPE_COMMUNITIES)
+    if a:
+        return [community_str(c) for c in a['communities']]
+    return None
+
+
+class RibPath(dict):
+    """
+    A path in the "gobgp -j" output format.
+
+    The path attributes are indexed by type code on first use, and the
+    "nexthop", "aspath", "local-pref", "community" and "med" entries are
+    decoded from them only when they are accessed. Iterating, comparing or
+    printing the path decodes all of them first, so it looks the same as a
+    dict holding every entry.
+    """
+
+    __slots__ = ('_attrs',)
+
+    _DERIVED = {
+        'nexthop': _get_nexthop,
+        'aspath': _get_as_path,
+        'local-pref': _get_local_pref,
+        'community': _get_community,
+        'med': _get_med,
+    }
+
+    def __init__(self, *args, **kwargs):
+        super(RibPath, self).__init__(*args, **kwargs)
+        self._attrs = None
+
+    def attr(self, typ):
+        if self._attrs is None:
+            self._attrs = {}
+            for a in dict.get(self, 'attrs') or []:
+                self._attrs.setdefault(a['type'], a)
+        return self._attrs.get(typ)
+
+    def __missing__(self, key):
+        if key not in self._DERIVED:
+            raise KeyError(key)
+        value = self._DERIVED[key](self)
+        self[key] = value
+        return value
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self._DERIVED
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def _complete(self):
+        for key in self._DERIVED:
+            if not dict.__contains__(self, key):
+                self.__missing__(key)
+        return self
+
+    def __iter__(self):
+        return dict.__iter__(self._complete())
+
+    def __len__(self):
+        return dict.__len__(self._complete())
+
+    def keys(self):
+        return dict.keys(self._complete())
+
+    def values(self):
+        return dict.values(self._complete())
+
+    def items(self):
+        return dict.items(self._complete())
+
+    def copy(self):
+        return RibPath(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, RibPath):
+            other._complete()
+        return dict.__eq__(self._complete(), other)
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __repr__(self):
+        return dict.__repr__(self._complete())
+
+
 class GoBGPContainer(BGPContainer):
 
     SHARED_VOLUME = '/root/shared_volume'
     QUAGGA_VOLUME = '/etc/quagga'
+    DAEMON = 'gobgpd'
+    PPROF_PORT = 6060
+    PPROF_KINDS = ('cpu', 'heap', 'goroutine', 'mutex')
 
     def __init__(self, name, asn, router_id, ctn_image_name='osrg/gobgp',
                  log_level='debug', zebra=False, config_format='toml',
                  zapi_version=2, bgp_config=None, ospfd_config=None,
-                 zebra_multipath_enabled=False):
+                 zebra_multipath_enabled=False, driver='cli', pprof_mutex_rate=0):
         super(GoBGPContainer, self).__init__(name, asn, router_id,
                                              ctn_image_name)
         self.shared_volumes.append((self.config_dir, self.SHARED_VOLUME))
@@ -80,6 +210,17 @@ class GoBGPContainer(BGPContainer):
         self.zapi_version = zapi_version
         self.zebra_multipath_enabled = zebra_multipath_enabled
         self.config_format = config_format
+        self.mrt_dumps = []
+        # gobgpd reports 1/n of the mutex contention events to pprof, none
+        # with 0: sampling them changes the timings, so it is opt-in
+        self.pprof_mutex_rate = pprof_mutex_rate
+
+        # 'cli' runs "docker exec gobgp ..." for each query, 'grpc' talks to
+        # gobgpd through one persistent gRPC channel instead.
+        if driver not in ('cli', 'grpc'):
+            raise Exception('invalid driver {0}'.format(driver))
+        self.driver = driver
+        self._api = None
 
         # bgp_config is equivalent to config.BgpConfigSet structure
         # Example:
@@ -111,8 +252,11 @@ class GoBGPContainer(BGPContainer):
     def _start_gobgp(self, graceful_restart=False):
         c = CmdBuffer()
         c << '#!/bin/sh'
-        c << '/go/bin/gobgpd -f {0}/gobgpd.conf -l {1} -p {2} -t {3} > ' \
-             '{0}/gobgpd.log 2>&1'.format(self.SHARED_VOLUME, self.log_level, '-r' if graceful_restart else '', self.config_format)
+        c << '/go/bin/gobgpd -f {0}/gobgpd.conf -l {1} -p {2} -t {3} ' \
+             '--pprof-host {4}:{5} {6} > ' \
+             '{0}/gobgpd.log 2>&1'.format(self.SHARED_VOLUME, self.log_level, '-r' if graceful_restart else '', self.config_format,
+                                          self._host(), self.PPROF_PORT,
+                                          '--pprof-mutex-rate {0}'.format(self.pprof_mutex_rate) if self.pprof_mutex_rate else '')
         cmd = 'echo "{0:s}" > {1}/start.sh'.format(str(c), self.config_dir)
         local(cmd, capture=True)
         cmd = "chmod 755 {0}/start.sh".format(self.config_dir)
@@ -152,7 +296,122 @@ class GoBGPContainer(BGPContainer):
                 daemons.append('ospfd')
         return daemons
 
+    def _host(self):
+        # the address on docker0, reachable from the host
+        return self.ip_addrs[0][1].split('/')[0]
+
+    def api(self):
+        if self._api is None:
+            self._api = gobgp_api.GoBGPAPIClient(self._host())
+        return self._api
+
+    def fetch_profile(self, kind, seconds=0):
+        """
+        Returns a pprof profile of gobgpd, in the gzipped protobuf format.
+        The cpu profile is taken over the given seconds, the others are
+        snapshots.
+        """
+        url = 'http://{0}:{1}/debug/pprof/'.format(self._host(), self.PPROF_PORT)
+        if kind == 'cpu':
+            url += 'profile?seconds={0}'.format(seconds)
+        else:
+            url += kind
+        with urllib.request.urlopen(url, timeout=seconds + 30) as r:
+            return r.read()
+
+    def goroutines(self):
+        url = 'http://{0}:{1}/debug/pprof/goroutine?debug=1'.format(self._host(), self.PPROF_PORT)
+        with urllib.request.urlopen(url, timeout=10) as r:
+            # goroutine profile: total <n>
+            return int(r.readline().split()[-1])
+
+    def _save_profile(self, label, kind, data):
+        path = '{0}/pprof_{1}_{2}.pb.gz'.format(self.config_dir, label, kind)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    @contextlib.contextmanager
+    def profiling(self, seconds, label='', kinds=PPROF_KINDS):
+        """
+        Profiles gobgpd while the enclosed block runs, for the given
+        seconds from its start on, and writes the profiles to config_dir
+        as pprof_<label>_<kind>.pb.gz. Exiting the block waits for the
+        end of the window.
+
+        The heap, goroutine and mutex profiles are taken at both ends of
+        the window, the one at the start as <kind>_start, so that
+        "go tool pprof -base <start> <end>" shows what the window added.
+        The mutex profile is skipped unless the container was created with
+        pprof_mutex_rate, as it stays empty otherwise.
+
+            with g1.profiling(30, 'bulk'):
+                e1.add_routes(routes)
+        """
+        label = label or time.strftime('%Y%m%d%H%M%S')
+        kinds = [k for k in kinds if k != 'mutex' or self.pprof_mutex_rate]
+        paths = {}
+        snapshots = [k for k in kinds if k != 'cpu']
+        for kind in snapshots:
+            paths[kind + '_start'] = self._save_profile(label, kind + '_start', self.fetch_profile(kind))
+
+        cpu = {}
+
+        def _cpu():
+            try:
+                cpu['data'] = self.fetch_profile('cpu', seconds)
+            except Exception as e:
+                cpu['error'] = e
+
+        t = None
+        if 'cpu' in kinds:
+            t = Thread(target=_cpu)
+            t.daemon = True
+            t.start()
+        start = time.time()
+        try:
+            yield paths
+        finally:
+            # the profiles are kept also when the block failed
+            if t is not None:
+                t.join()
+                if 'error' in cpu:
+                    print(yellow('[{0}] failed to take cpu profile: {1}'.format(self.name, cpu['error'])))
+                else:
+                    paths['cpu'] = self._save_profile(label, 'cpu', cpu['data'])
+            else:
+                time.sleep(max(0, start + seconds - time.time()))
+            for kind in snapshots:
+                paths[kind] = self._save_profile(label, kind, self.fetch_profile(kind))
+            print(yellow('[{0}] profiles of {1}: {2}'.format(self.name, label, ', '.join(sorted(paths)))))
+
+    def capture_profiles(self, seconds, label='', kinds=PPROF_KINDS):
+        """
+        Profiles gobgpd over the next seconds, see profiling(), and returns
+        the paths of the profiles by kind.
+        """
+        with self.profiling(seconds, label=label, kinds=kinds) as paths:
+            pass
+        return paths
+
+    def add_mrt_dump(self, dump_type, file_name, dump_interval=0, rotation_interval=0):
+        """
+        Makes gobgpd write MRT dumps ('table' or 'updates') to file_name in
+        the shared volume, from its next (re)start, and returns the path of
+        the file on the host, for lib.mrt.MRTReader.
+        """
+        config = {'dump-type': dump_type,
+                  'file-name': '{0}/{1}'.format(self.SHARED_VOLUME, file_name)}
+        if dump_interval:
+            config['dump-interval'] = dump_interval
+        if rotation_interval:
+            config['rotation-interval'] = rotation_interval
+        self.mrt_dumps.append({'config': config})
+        return '{0}/{1}'.format(self.config_dir, file_name)
+
     def _is_running(self):
+        if self.driver == 'grpc':
+            return self.api().is_running()
         return self.local('gobgp global'
                           ' > /dev/null 2>&1; echo $?', capture=True) == '0'
 
@@ -166,8 +425,20 @@ class GoBGPContainer(BGPContainer):
 
         wait_for_completion(self._is_running)
 
-    def run(self):
-        super(GoBGPContainer, self).run()
+    def run(self, boot=True):
+        if self._api is not None:
+            self._api.close()
+            self._api = None
+        super(GoBGPContainer, self).run(boot)
+        if not boot:
+            return 0
+        return self.boot()
+
+    def boot(self):
+        """
+        Starts the daemons of a container started with run(boot=False),
+        with the config rendered by create_config().
+        """
         if self.zebra:
             self._start_zebra()
             if self.ospfd_config:
@@ -176,55 +447,18 @@ class GoBGPContainer(BGPContainer):
         self._wait_for_boot()
         return self.WAIT_FOR_BOOT
 
-    @staticmethod
-    def _get_as_path(path):
-        asps = (p['as_paths'] for p in path['attrs']
-                if p['type'] == BGP_ATTR_TYPE_AS_PATH and 'as_paths' in p and p['as_paths'] is not None)
-        asps = chain.from_iterable(asps)
-        asns = (asp['asns'] for asp in asps)
-        return list(chain.from_iterable(asns))
-
-    @staticmethod
-    def _get_nexthop(path):
-        for p in path['attrs']:
-            if p['type'] == BGP_ATTR_TYPE_NEXT_HOP or p['type'] == BGP_ATTR_TYPE_MP_REACH_NLRI:
-                return p['nexthop']
-
-    @staticmethod
-    def _get_local_pref(path):
-        for p in path['attrs']:
-            if p['type'] == BGP_ATTR_TYPE_LOCAL_PREF:
-                return p['value']
-        return None
-
-    @staticmethod
-    def _get_med(path):
-        for p in path['attrs']:
-            if p['type'] == BGP_ATTR_TYPE_MULTI_EXIT_DISC:
-                return p['metric']
-        return None
-
-    @staticmethod
-    def _get_community(path):
-        for p in path['attrs']:
-            if p['type'] == BGP_ATTR_TYPE_COMMUNITIES:
-                return [community_str(c) for c in p['communities']]
-        return None
-
     def _get_rib(self, dests_dict):
         dests = []
-        for k, v in list(dests_dict.items()):
+        for k, v in dests_dict.items():
+            paths = []
             for p in v:
-                p["nexthop"] = self._get_nexthop(p)
-                p["aspath"] = self._get_as_path(p)
-                p["local-pref"] = self._get_local_pref(p)
-                p["community"] = self._get_community(p)
-                p["med"] = self._get_med(p)
+                p = RibPath(p)
                 p["prefix"] = k
                 path_id = p.get("id", None)
                 if path_id:
                     p["identifier"] = p["id"]
-            dests.append({'paths': v, 'prefix': k})
+                paths.append(p)
+            dests.append({'paths': paths, 'prefix': k})
         return dests
 
     def _trigger_peer_cmd(self, cmd, peer):
@@ -246,15 +480,60 @@ class GoBGPContainer(BGPContainer):
 
     def get_local_rib(self, peer, prefix='', rf='ipv4'):
         peer_addr = self.peer_name(peer)
+        if self.driver == 'grpc':
+            return self._get_rib(self.api().list_path(
+                gobgp_api.gobgp_pb2.LOCAL, rf, name=peer_addr,
+                prefixes=[prefix] if prefix else None))
         cmd = 'gobgp -j neighbor {0} local {1} -a {2}'.format(peer_addr, prefix, rf)
         output = self.local(cmd, capture=True)
         return self._get_rib(json.loads(output))
 
     def get_global_rib(self, prefix='', rf='ipv4'):
+        if self.driver == 'grpc':
+            return self._get_rib(self.api().list_path(
+                gobgp_api.gobgp_pb2.GLOBAL, rf,
+                prefixes=[prefix] if prefix else None))
         cmd = 'gobgp -j global rib {0} -a {1}'.format(prefix, rf)
         output = self.local(cmd, capture=True)
         return self._get_rib(json.loads(output))
 
+    def _lookup_rib(self, prefixes, rf, lookup, table_type, resource, name=''):
+        if lookup not in LOOKUP_OPTIONS:
+            raise Exception('invalid lookup option {0}'.format(lookup))
+        if self.driver == 'grpc':
+            option = gobgp_api.lookup_option(lookup)
+            return self._get_rib(self.api().list_path(
+                getattr(gobgp_api.gobgp_pb2, table_type), rf, name=name,
+                prefixes=[(p, option) for p in prefixes]))
+        # The CLI looks up one prefix per command, so run all of them
+        # through a single exec.
+        suffix = ''
+        if lookup != 'exact':
+            suffix = ' {0}-prefixes'.format(lookup)
+        cmds = CmdBuffer(' && ')
+        for p in prefixes:
+            cmds << 'gobgp -j {0} {1}{2} -a {3}'.format(resource, p, suffix, rf)
+        dests = {}
+        if len(cmds) > 0:
+            output = self.local("sh -c '{0}'".format(cmds), capture=True)
+            for line in output.split('\n'):
+                if line:
+                    dests.update(json.loads(line))
+        return self._get_rib(dests)
+
+    def lookup_global_rib(self, prefixes, rf='ipv4', lookup='exact'):
+        """
+        Returns the destinations of the global RIB matching any of prefixes
+        in one query. lookup is one of LOOKUP_OPTIONS.
+        """
+        return self._lookup_rib(prefixes, rf, lookup, 'GLOBAL', 'global rib')
+
+    def lookup_local_rib(self, peer, prefixes, rf='ipv4', lookup='exact'):
+        peer_addr = self.peer_name(peer)
+        return self._lookup_rib(prefixes, rf, lookup, 'LOCAL',
+                                'neighbor {0} local'.format(peer_addr),
+                                name=peer_addr)
+
     def monitor_global_rib(self, queue, rf='ipv4'):
         host = self.ip_addrs[0][1].split('/')[0]
 
@@ -266,33 +545,48 @@ class GoBGPContainer(BGPContainer):
         def monitor():
             process = subprocess.Popen(args, stdout=subprocess.PIPE)
             for line in iter(process.stdout.readline, ''):
-                p = json.loads(line)[0]
-                p["nexthop"] = self._get_nexthop(p)
-                p["aspath"] = self._get_as_path(p)
-                p["local-pref"] = self._get_local_pref(p)
-                p["med"] = self._get_med(p)
-                queue.put(p)
+                queue.put(RibPath(json.loads(line)[0]))
 
         t = Thread(target=monitor)
         t.daemon = True
         t.start()
 
+    def mirror_rib(self, peer=None, rf='ipv4', post_policy=False):
+        """
+        Returns a started gobgp_api.RibMirror of the global table, or of
+        the adj-in of peer if given. Call stop() on it when done.
+        """
+        table_type = gobgp_api.gobgp_pb2.GLOBAL
+        name = ''
+        if peer is not None:
+            table_type = gobgp_api.gobgp_pb2.ADJ_IN
+            name = self.peer_name(peer)
+        multipath = self.zebra_multipath_enabled or (self.zebra and self.zapi_version == 2)
+        return gobgp_api.RibMirror(self.api(), table_type, rf, name=name,
+                                   post_policy=post_policy,
+                                   multipath=multipath).start()
+
     def _get_adj_rib(self, adj_type, peer, prefix='', rf='ipv4', add_path_enabled=False):
         peer_addr = self.peer_name(peer)
-        cmd = 'gobgp neighbor {0} adj-{1} {2} -a {3} -j'.format(peer_addr,
-                                                                adj_type,
-                                                                prefix, rf)
-        output = self.local(cmd, capture=True)
+        if self.driver == 'grpc':
+            table_type = gobgp_api.gobgp_pb2.ADJ_IN
+            if adj_type == 'out':
+                table_type = gobgp_api.gobgp_pb2.ADJ_OUT
+            dests = self.api().list_path(table_type, rf, name=peer_addr,
+                                         prefixes=[prefix] if prefix else None)
+        else:
+            cmd = 'gobgp neighbor {0} adj-{1} {2} -a {3} -j'.format(peer_addr,
+                                                                    adj_type,
+                                                                    prefix, rf)
+            dests = json.loads(self.local(cmd, capture=True))
         if add_path_enabled:
-            return self._get_rib(json.loads(output))
+            return self._get_rib(dests)
 
-        ret = [p[0] for p in json.loads(output).values()]
-        for p in ret:
-            p["nexthop"] = self._get_nexthop(p)
-            p["aspath"] = self._get_as_path(p)
+        ret = []
+        for v in dests.values():
+            p = RibPath(v[0])
             p["prefix"] = p['nlri']['prefix']
-            p["local-pref"] = self._get_local_pref(p)
-            p["med"] = self._get_med(p)
+            ret.append(p)
         return ret
 
     def get_adj_rib_in(self, peer, prefix='', rf='ipv4', add_path_enabled=False):
@@ -301,7 +595,51 @@ class GoBGPContainer(BGPContainer):
     def get_adj_rib_out(self, peer, prefix='', rf='ipv4', add_path_enabled=False):
         return self._get_adj_rib('out', peer, prefix, rf, add_path_enabled)
 
+    def get_table_info(self, table='global', peer=None, rf='ipv4'):
+        """
+        Returns the number of destinations, paths and accepted paths
+        (adj-in only) of a table without transferring the table itself.
+        """
+        # table -> (CLI resource, gRPC TableType)
+        tables = {
+            'global': ('global rib', 'GLOBAL'),
+            'local': ('local', 'LOCAL'),
+            'adj-in': ('adj-in', 'ADJ_IN'),
+            'adj-out': ('adj-out', 'ADJ_OUT'),
+        }
+        if table not in tables:
+            raise Exception('invalid table {0}'.format(table))
+        resource, table_type = tables[table]
+        name = ''
+        if table != 'global':
+            name = self.peer_name(peer)
+        if self.driver == 'grpc':
+            return self.api().get_table(getattr(gobgp_api.gobgp_pb2, table_type),
+                                        rf, name=name)
+        if table == 'global':
+            cmd = 'gobgp -j global rib summary -a {0}'.format(rf)
+        else:
+            cmd = 'gobgp -j neighbor {0} {1} summary -a {2}'.format(name, resource, rf)
+        info = json.loads(self.local(cmd, capture=True))
+        # zero values are omitted from the JSON output
+        return {k: info.get(k, 0) for k in ('num_destination', 'num_path', 'num_accepted')}
+
+    def _count(self, table, peer, rf, paths):
+        info = self.get_table_info(table, peer, rf)
+        return info['num_path'] if paths else info['num_destination']
+
+    def count_global_rib(self, rf='ipv4', paths=False):
+        return self._count('global', None, rf, paths)
+
+    def count_local_rib(self, peer, rf='ipv4', paths=False):
+        return self._count('local', peer, rf, paths)
+
+    def count_adj_rib(self, peer, rf='ipv4', adj_type='in', paths=False):
+        return self._count('adj-{0}'.format(adj_type), peer, rf, paths)
+
     def get_neighbor(self, peer):
+        if self.driver == 'grpc':
+            return self.api().list_peer(self.peer_name(peer))[0]
         cmd = 'gobgp -j neighbor {0}'.format(self.peer_name(peer))
         return json.loads(self.local(cmd, capture=True))
 
@@ -323,6 +661,33 @@ class GoBGPContainer(BGPContainer):
         self.neighbor_set = []
         self.statements = []
 
+    def reset_policy(self):
+        """
+        Removes every policy from the running gobgpd, both the ones of its
+        config and the ones added through the CLI or API, together with
+        their assignments, statements and defined sets.
+        """
+        self.clear_policy()
+        self.bgp_set = None
+        for info in self.peers.values():
+            info.pop('default-policy', None)
+
+        for d in ('import', 'export'):
+            self.local('gobgp global policy {0} del'.format(d), capture=True)
+            for peer in self.peers:
+                self._trigger_peer_cmd('policy {0} del'.format(d), peer)
+        for name in self.local('gobgp -q policy', capture=True).split():
+            self.local('gobgp policy del {0}'.format(name), capture=True)
+        for name in self.local('gobgp -q policy statement', capture=True).split():
+            self.local('gobgp policy statement del {0}'.format(name), capture=True)
+        for typ in ('prefix', 'neighbor', 'as-path', 'community',
+                    'ext-community', 'large-community'):
+            for name in self.local('gobgp -q policy {0}'.format(typ), capture=True).split():
+                self.local('gobgp policy {0} del {1}'.format(typ, name), capture=True)
+
+        self.create_config()
+        self.reload_config()
+
     def set_prefix_set(self, ps):
         if not isinstance(ps, list):
             ps = [ps]
@@ -530,6 +895,9 @@ class GoBGPContainer(BGPContainer):
                                           'redistribute-route-type-list': ['connect'],
                                           'version': self.zapi_version}}
 
+        if self.mrt_dumps:
+            config['mrt-dump'] = self.mrt_dumps
+
         with open('{0}/gobgpd.conf'.format(self.config_dir), 'w') as f:
             print(yellow('[{0}\'s new gobgpd.conf]'.format(self.name)))
             if self.config_format is 'toml':
@@ -607,6 +975,14 @@ class GoBGPContainer(BGPContainer):
             'thens': thens,
         }
 
+        if self.driver == 'grpc' and rf in ('ipv4', 'ipv6'):
+            path['uuid'] = self.api().add_path(gobgp_api.new_path(
+                route, rf, nexthop=nexthop, med=med,
+                local_pref=local_pref, community=community,
+                identifier=identifier))
+            self.routes[route].append(path)
+            return
+
         c = CmdBuffer(' ')
         c << 'gobgp global rib -a {0} add'.format(rf)
         if rf in ('ipv4', 'ipv6'):
@@ -633,6 +1009,53 @@ class GoBGPContainer(BGPContainer):
 
         self.routes[route].append(path)
 
+    def add_routes(self, routes, rf='ipv4', batch_size=1000):
+        """
+        Injects many IPv4/IPv6 unicast routes at once through the
+        AddPathStream API and returns the achieved paths/second.
+
+        Each element of routes is either a prefix or a dict holding
+        'prefix' and any of 'next-hop', 'med', 'local-pref', 'community'
+        and 'identifier', like the entries of self.routes.
+        """
+        if not self._is_running():
+            raise RuntimeError('GoBGP is not yet running')
+        if rf not in ('ipv4', 'ipv6'):
+            raise Exception('unsupported address family: {0}'.format(rf))
+
+        count = [0]
+
+        def _paths():
+            for r in routes:
+                if not isinstance(r, dict):
+                    r = {'prefix': r}
+                path = {
+                    'prefix': r['prefix'],
+                    'rf': rf,
+                    'attr': None,
+                    'next-hop': r.get('next-hop'),
+                    'as-path': None,
+                    'community': r.get('community'),
+                    'med': r.get('med'),
+                    'local-pref': r.get('local-pref'),
+                    'extended-community': None,
+                    'identifier': r.get('identifier'),
+                    'matchs': None,
+                    'thens': None,
+                }
+                yield gobgp_api.new_path(
+                    path['prefix'], rf, nexthop=path['next-hop'],
+                    med=path['med'], local_pref=path['local-pref'],
+                    community=path['community'],
+                    identifier=path['identifier'])
+                self.routes.setdefault(path['prefix'], []).append(path)
+                count[0] += 1
+
+        start = time.time()
+        self.api().add_path_stream(_paths(), batch_size=batch_size)
+        elapsed = time.time() - start
+        return count[0] / elapsed if elapsed > 0 else float(count[0])
+
     def del_route(self, route, identifier=None, reload_config=True):
         if not self._is_running():
             raise RuntimeError('GoBGP is not yet running')
@@ -644,6 +1067,8 @@ class GoBGPContainer(BGPContainer):
         for path in self.routes[route]:
             if path['identifier'] != identifier:
                 new_paths.append(path)
+            elif path.get('uuid'):
+                self.api().delete_path(uuid=path['uuid'], rf=path['rf'])
             else:
                 r = CmdBuffer(' ')
                 r << 'gobgp global -a {0}'.format(path['rf'])
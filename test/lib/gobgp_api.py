@@ -0,0 +1,476 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+import time
+
+import netaddr
+
+# The Python stubs are generated from api/*.proto (see STUBS_COMMAND) and
+# are expected to be found on PYTHONPATH.
+try:
+    import grpc
+    from google.protobuf.any_pb2 import Any
+    from google.protobuf.descriptor import FieldDescriptor
+    from google.protobuf.json_format import MessageToDict
+    import gobgp_pb2
+    import gobgp_pb2_grpc
+    import attribute_pb2
+except ImportError:
+    grpc = None
+
+from lib.base import (
+    BGP_ATTR_TYPE_ORIGIN,
+    BGP_ATTR_TYPE_AS_PATH,
+    BGP_ATTR_TYPE_NEXT_HOP,
+    BGP_ATTR_TYPE_MULTI_EXIT_DISC,
+    BGP_ATTR_TYPE_LOCAL_PREF,
+    BGP_ATTR_TYPE_COMMUNITIES,
+    BGP_ATTR_TYPE_ORIGINATOR_ID,
+    BGP_ATTR_TYPE_CLUSTER_LIST,
+    BGP_ATTR_TYPE_MP_REACH_NLRI,
+    BGP_ATTR_TYPE_EXTENDED_COMMUNITIES,
+    WaitEvent,
+)
+
+
+GRPC_PORT = 50051
+# run from the top of the source tree, with grpcio-tools installed
+STUBS_COMMAND = ('python3 -m grpc_tools.protoc -I./api --python_out=./test '
+                 '--grpc_python_out=./test api/*.proto')
+TIMEOUT_SECONDS = 30
+
+ORIGIN_INCOMPLETE = 2
+
+WELL_KNOWN_COMMUNITIES = {
+    'graceful-shutdown': 0xffff0000,
+    'accept-own': 0xffff0001,
+    'llgr-stale': 0xffff0006,
+    'no-llgr': 0xffff0007,
+    'blackhole': 0xffff029a,
+    'no-export': 0xffffff01,
+    'no-advertise': 0xffffff02,
+    'no-export-subconfed': 0xffffff03,
+    'no-peer': 0xffffff04,
+}
+
+# route family name used by the harness -> (afi, safi)
+ROUTE_FAMILIES = {
+    'ipv4': (1, 1),
+    'ipv6': (2, 1),
+    'ipv4-l3vpn': (1, 128),
+    'ipv6-l3vpn': (2, 128),
+    'evpn': (25, 70),
+    'rtc': (1, 132),
+    'ipv4-flowspec': (1, 133),
+    'ipv6-flowspec': (2, 133),
+    'ipv4-l3vpn-flowspec': (1, 134),
+    'ipv6-l3vpn-flowspec': (2, 134),
+}
+
+
+def available():
+    return grpc is not None
+
+
+def new_family(rf):
+    if rf not in ROUTE_FAMILIES:
+        raise Exception('unsupported address family: {0}'.format(rf))
+    afi, safi = ROUTE_FAMILIES[rf]
+    return gobgp_pb2.Family(afi=afi, safi=safi)
+
+
+def lookup_option(lookup):
+    # one of base.LOOKUP_OPTIONS, as TableLookupOption LOOKUP_<OPTION>
+    return gobgp_pb2.TableLookupOption.Value('LOOKUP_{0}'.format(lookup.upper()))
+
+
+def community_int(c):
+    if isinstance(c, int):
+        return c
+    if c in WELL_KNOWN_COMMUNITIES:
+        return WELL_KNOWN_COMMUNITIES[c]
+    if ':' in c:
+        high, low = c.split(':')
+        return (int(high) << 16) | int(low)
+    return int(c)
+
+
+def _pack(msg):
+    a = Any()
+    a.Pack(msg)
+    return a
+
+
+def _unpack(a, cls):
+    msg = cls()
+    a.Unpack(msg)
+    return msg
+
+
+def new_path(prefix, rf='ipv4', nexthop=None, aspath=None, med=None,
+             local_pref=None, community=None, identifier=None,
+             is_withdraw=False, origin=ORIGIN_INCOMPLETE):
+    """
+    Builds a gobgp_pb2.Path for an IPv4/IPv6 unicast prefix with the same
+    defaults as "gobgp global rib add".
+    """
+    if rf not in ('ipv4', 'ipv6'):
+        raise Exception('unsupported address family: {0}'.format(rf))
+    n = netaddr.IPNetwork(prefix)
+    nlri = _pack(attribute_pb2.IPAddressPrefix(prefix=str(n.network),
+                                               prefix_len=n.prefixlen))
+    pattrs = [_pack(attribute_pb2.OriginAttribute(origin=origin))]
+    if aspath:
+        segment = attribute_pb2.AsSegment(numbers=[int(a) for a in aspath])
+        segment.type = 2  # AS_SEQUENCE
+        pattrs.append(_pack(attribute_pb2.AsPathAttribute(segments=[segment])))
+    if rf == 'ipv4':
+        pattrs.append(_pack(attribute_pb2.NextHopAttribute(
+            next_hop=nexthop or '0.0.0.0')))
+    else:
+        pattrs.append(_pack(attribute_pb2.MpReachNLRIAttribute(
+            family=new_family(rf),
+            next_hops=[nexthop or '::'],
+            nlris=[nlri])))
+    if med:
+        pattrs.append(_pack(attribute_pb2.MultiExitDiscAttribute(med=int(med))))
+    if local_pref:
+        pattrs.append(_pack(attribute_pb2.LocalPrefAttribute(local_pref=int(local_pref))))
+    if community:
+        if not isinstance(community, (list, tuple)):
+            community = str(community).split(',')
+        pattrs.append(_pack(attribute_pb2.CommunitiesAttribute(
+            communities=[community_int(c) for c in community])))
+    return gobgp_pb2.Path(nlri=nlri, pattrs=pattrs, family=new_family(rf),
+                          identifier=int(identifier or 0),
+                          is_withdraw=is_withdraw)
+
+
+def attribute_to_dict(a):
+    """
+    Converts a path attribute into the JSON representation printed by
+    "gobgp -j", e.g. {'type': 3, 'nexthop': '10.0.0.1'}.
+    """
+    if a.Is(attribute_pb2.OriginAttribute.DESCRIPTOR):
+        return {'type': BGP_ATTR_TYPE_ORIGIN,
+                'value': _unpack(a, attribute_pb2.OriginAttribute).origin}
+    elif a.Is(attribute_pb2.AsPathAttribute.DESCRIPTOR):
+        segments = _unpack(a, attribute_pb2.AsPathAttribute).segments
+        return {'type': BGP_ATTR_TYPE_AS_PATH,
+                'as_paths': [{'segment_type': s.type,
+                              'num': len(s.numbers),
+                              'asns': list(s.numbers)} for s in segments]}
+    elif a.Is(attribute_pb2.NextHopAttribute.DESCRIPTOR):
+        return {'type': BGP_ATTR_TYPE_NEXT_HOP,
+                'nexthop': _unpack(a, attribute_pb2.NextHopAttribute).next_hop}
+    elif a.Is(attribute_pb2.MultiExitDiscAttribute.DESCRIPTOR):
+        return {'type': BGP_ATTR_TYPE_MULTI_EXIT_DISC,
+                'metric': _unpack(a, attribute_pb2.MultiExitDiscAttribute).med}
+    elif a.Is(attribute_pb2.LocalPrefAttribute.DESCRIPTOR):
+        return {'type': BGP_ATTR_TYPE_LOCAL_PREF,
+                'value': _unpack(a, attribute_pb2.LocalPrefAttribute).local_pref}
+    elif a.Is(attribute_pb2.CommunitiesAttribute.DESCRIPTOR):
+        return {'type': BGP_ATTR_TYPE_COMMUNITIES,
+                'communities': list(_unpack(a, attribute_pb2.CommunitiesAttribute).communities)}
+    elif a.Is(attribute_pb2.OriginatorIdAttribute.DESCRIPTOR):
+        return {'type': BGP_ATTR_TYPE_ORIGINATOR_ID,
+                'value': _unpack(a, attribute_pb2.OriginatorIdAttribute).id}
+    elif a.Is(attribute_pb2.ClusterListAttribute.DESCRIPTOR):
+        return {'type': BGP_ATTR_TYPE_CLUSTER_LIST,
+                'value': list(_unpack(a, attribute_pb2.ClusterListAttribute).ids)}
+    elif a.Is(attribute_pb2.MpReachNLRIAttribute.DESCRIPTOR):
+        m = _unpack(a, attribute_pb2.MpReachNLRIAttribute)
+        return {'type': BGP_ATTR_TYPE_MP_REACH_NLRI,
+                'nexthop': m.next_hops[0] if m.next_hops else '',
+                'afi': m.family.afi,
+                'safi': m.family.safi}
+    elif a.Is(attribute_pb2.ExtendedCommunitiesAttribute.DESCRIPTOR):
+        m = _unpack(a, attribute_pb2.ExtendedCommunitiesAttribute)
+        return {'type': BGP_ATTR_TYPE_EXTENDED_COMMUNITIES,
+                'value': [MessageToDict(c) for c in m.communities]}
+    # Other attributes are not inspected by the scenario tests, so keep
+    # only their message name.
+    return {'type': None, 'name': a.TypeName()}
+
+
+def _int64_fields(msg, d):
+    # MessageToDict renders 64-bit integers as strings, "gobgp -j" as numbers
+    for field in msg.DESCRIPTOR.fields:
+        if field.name not in d:
+            continue
+        if hasattr(field, 'is_repeated'):
+            repeated = field.is_repeated
+        else:
+            # older protobuf releases
+            repeated = field.label == FieldDescriptor.LABEL_REPEATED
+        if field.cpp_type in (FieldDescriptor.CPPTYPE_INT64, FieldDescriptor.CPPTYPE_UINT64):
+            v = d[field.name]
+            d[field.name] = [int(i) for i in v] if repeated else int(v)
+        elif field.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE and \
+                not field.message_type.GetOptions().map_entry:
+            value = getattr(msg, field.name)
+            if repeated:
+                for m, v in zip(value, d[field.name]):
+                    _int64_fields(m, v)
+            else:
+                _int64_fields(value, d[field.name])
+    return d
+
+
+def message_to_dict(msg):
+    return _int64_fields(msg, MessageToDict(msg, preserving_proto_field_name=True,
+                                            use_integers_for_enums=True))
+
+
+def nlri_to_dict(a, prefix):
+    if a.Is(attribute_pb2.IPAddressPrefix.DESCRIPTOR):
+        n = _unpack(a, attribute_pb2.IPAddressPrefix)
+        return {'prefix': '{0}/{1}'.format(n.prefix, n.prefix_len)}
+    return {'prefix': prefix}
+
+
+def path_to_dict(path, prefix=''):
+    """
+    Converts a gobgp_pb2.Path into the JSON representation printed by
+    "gobgp -j", so that the same post-processing applies to both drivers.
+    """
+    d = {
+        'nlri': nlri_to_dict(path.nlri, prefix),
+        'age': path.age.seconds,
+        'best': path.best,
+        'attrs': [attribute_to_dict(a) for a in path.pattrs],
+        'stale': path.stale,
+    }
+    if path.is_withdraw:
+        d['withdrawal'] = True
+    if path.source_id:
+        d['source-id'] = path.source_id
+    if path.neighbor_ip:
+        d['neighbor-ip'] = path.neighbor_ip
+    if path.identifier:
+        d['id'] = path.identifier
+    return d
+
+
+class GoBGPAPIClient(object):
+    """
+    Keeps one gRPC channel open to the gobgpd running in a container.
+    """
+
+    def __init__(self, host, port=GRPC_PORT, timeout=TIMEOUT_SECONDS):
+        if not available():
+            raise RuntimeError('gRPC python stubs for GoBGP are not available, '
+                               'generate them with "{0}"'.format(STUBS_COMMAND))
+        self.host = host
+        self.timeout = timeout
+        self.channel = grpc.insecure_channel('{0}:{1}'.format(host, port))
+        self.stub = gobgp_pb2_grpc.GobgpApiStub(self.channel)
+
+    def close(self):
+        self.channel.close()
+
+    def is_running(self):
+        try:
+            self.stub.GetBgp(gobgp_pb2.GetBgpRequest(), 1)
+        except grpc.RpcError:
+            return False
+        return True
+
+    def list_path(self, table_type=None, rf='ipv4', name='', prefixes=None):
+        """
+        Returns the table as a dict of prefix -> list of paths in the same
+        format as "gobgp -j global rib".
+        """
+        if table_type is None:
+            table_type = gobgp_pb2.GLOBAL
+        lookups = []
+        for p in prefixes or []:
+            if isinstance(p, (list, tuple)):
+                p, option = p
+            else:
+                option = gobgp_pb2.LOOKUP_EXACT
+            lookups.append(gobgp_pb2.TableLookupPrefix(prefix=p, lookup_option=option))
+        req = gobgp_pb2.ListPathRequest(table_type=table_type, name=name,
+                                        family=new_family(rf),
+                                        prefixes=lookups)
+        dests = {}
+        for rsp in self.stub.ListPath(req, self.timeout):
+            d = rsp.destination
+            dests[d.prefix] = [path_to_dict(p, d.prefix) for p in d.paths]
+        return dests
+
+    def get_table(self, table_type=None, rf='ipv4', name=''):
+        """
+        Returns the table summary in the same format as
+        "gobgp -j global rib summary".
+        """
+        if table_type is None:
+            table_type = gobgp_pb2.GLOBAL
+        req = gobgp_pb2.GetTableRequest(table_type=table_type, name=name,
+                                        family=new_family(rf))
+        rsp = self.stub.GetTable(req, self.timeout)
+        return {'num_destination': rsp.num_destination,
+                'num_path': rsp.num_path,
+                'num_accepted': rsp.num_accepted}
+
+    def list_peer(self, address=''):
+        req = gobgp_pb2.ListPeerRequest(address=address)
+        return [message_to_dict(rsp.peer) for rsp in self.stub.ListPeer(req, self.timeout)]
+
+    def add_path(self, path):
+        req = gobgp_pb2.AddPathRequest(table_type=gobgp_pb2.GLOBAL, path=path)
+        return self.stub.AddPath(req, self.timeout).uuid
+
+    def add_path_stream(self, paths, batch_size=1000):
+        """
+        Streams paths to the global table in AddPathStreamRequest batches of
+        batch_size paths. paths may be any iterable and is consumed lazily.
+        """
+        def _batches():
+            batch = []
+            for path in paths:
+                batch.append(path)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        self.add_path_batches(_batches())
+
+    def add_path_batches(self, batches):
+        """
+        Streams each list of paths of batches to the global table as one
+        AddPathStreamRequest, as soon as batches yields it.
+        """
+        self.stub.AddPathStream(gobgp_pb2.AddPathStreamRequest(
+            table_type=gobgp_pb2.GLOBAL, paths=batch) for batch in batches)
+
+    def delete_path(self, path=None, uuid=b'', rf='ipv4'):
+        req = gobgp_pb2.DeletePathRequest(table_type=gobgp_pb2.GLOBAL,
+                                          family=new_family(rf),
+                                          path=path, uuid=uuid)
+        self.stub.DeletePath(req, self.timeout)
+
+
+class RibMirror(object):
+    """
+    Keeps a local copy of a gobgpd table up to date from the MonitorTable
+    stream, so that tests can wait on it instead of re-listing the table.
+
+    The mirror holds a dict of prefix -> {(neighbor-ip, identifier): path}
+    with paths in the same format as path_to_dict(). For the global table
+    gobgpd streams best path changes only, so each prefix holds its best
+    path (or its multipath set when multipath is True). For adj-in, every
+    received path is kept and withdrawals are applied in place.
+
+    event is notified on every update, so that base.wait_for_completion()
+    can wait on conditions which the mirror does not hold itself.
+    """
+
+    def __init__(self, client, table_type=None, rf='ipv4', name='',
+                 post_policy=False, multipath=False):
+        if table_type is None:
+            table_type = gobgp_pb2.GLOBAL
+        self.client = client
+        self.table_type = table_type
+        self.rf = rf
+        self.name = name
+        self.post_policy = post_policy
+        self.multipath = multipath
+        self.dests = {}
+        self.error = None
+        self.event = WaitEvent()
+        self._cond = threading.Condition()
+        self._stream = None
+        self._thread = None
+
+    def start(self):
+        req = gobgp_pb2.MonitorTableRequest(table_type=self.table_type,
+                                            name=self.name,
+                                            family=new_family(self.rf),
+                                            current=True,
+                                            post_policy=self.post_policy)
+        self._stream = self.client.stub.MonitorTable(req)
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.cancel()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        try:
+            for rsp in self._stream:
+                self._apply(rsp.path)
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.CANCELLED:
+                self.error = e
+        with self._cond:
+            self._cond.notify_all()
+        self.event.notify()
+
+    def _apply(self, path):
+        p = path_to_dict(path)
+        prefix = p['nlri']['prefix']
+        key = (path.neighbor_ip, path.identifier)
+        with self._cond:
+            paths = self.dests.setdefault(prefix, {})
+            if self.table_type == gobgp_pb2.GLOBAL and not self.multipath:
+                # a best path event replaces the previous best path
+                paths.clear()
+            if path.is_withdraw:
+                paths.pop(key, None)
+            else:
+                paths[key] = p
+            if not paths:
+                del self.dests[prefix]
+            self._cond.notify_all()
+        self.event.notify()
+
+    def paths(self, prefix):
+        with self._cond:
+            return list(self.dests.get(prefix, {}).values())
+
+    def prefixes(self):
+        with self._cond:
+            return list(self.dests.keys())
+
+    def wait_for(self, f, timeout=120):
+        """
+        Waits until f(dests) returns True. f is evaluated on every update
+        received from gobgpd while the mirror lock is held.
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while not f(self.dests):
+                if self.error is not None:
+                    raise self.error
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError('timeout')
+                self._cond.wait(remaining)
+
+    def wait_for_paths(self, prefix, num, timeout=120):
+        self.wait_for(lambda dests: len(dests.get(prefix, {})) == num, timeout)
+
+    def wait_for_num_prefixes(self, num, timeout=120):
+        self.wait_for(lambda dests: len(dests) == num, timeout)
@@ -0,0 +1,276 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+MRT (RFC 6396) dump reader.
+
+MRTReader maps a dump file, e.g. one written by gobgpd into the shared
+volume of its container (see GoBGPContainer.add_mrt_dump()), and iterates
+its records lazily. The paths of the TABLE_DUMP_V2 RIB records are
+yielded as compact Path tuples whose attributes are a zero-copy slice of
+the file, decoded only on demand:
+
+    with MRTReader(g1.add_mrt_dump('table', 'rib.mrt', dump_interval=60)) as r:
+        n = sum(1 for p in r.paths('ipv4', start=r.dumps()[-1]))
+
+The BGP messages of BGP4MP update dumps (gobgpd's, or RIS and RouteViews
+ones once decompressed) are yielded as Message tuples, see messages().
+"""
+
+import collections
+import mmap
+import os
+import socket
+import struct
+
+from lib import bgp_message as bm
+
+
+TABLE_DUMP_V2 = 13
+BGP4MP = 16
+BGP4MP_ET = 17
+
+PEER_INDEX_TABLE = 1
+RIB_IPV4_UNICAST = 2
+RIB_IPV6_UNICAST = 4
+RIB_IPV4_UNICAST_ADDPATH = 8
+RIB_IPV6_UNICAST_ADDPATH = 10
+
+BGP4MP_MESSAGE = 1
+BGP4MP_MESSAGE_AS4 = 4
+BGP4MP_MESSAGE_LOCAL = 6
+BGP4MP_MESSAGE_AS4_LOCAL = 7
+BGP4MP_MESSAGE_ADDPATH = 8
+BGP4MP_MESSAGE_AS4_ADDPATH = 9
+BGP4MP_MESSAGE_LOCAL_ADDPATH = 10
+BGP4MP_MESSAGE_AS4_LOCAL_ADDPATH = 11
+
+# subtype -> (4-octet AS, add-path)
+_BGP4MP_SUBTYPES = {
+    BGP4MP_MESSAGE: (False, False),
+    BGP4MP_MESSAGE_AS4: (True, False),
+    BGP4MP_MESSAGE_LOCAL: (False, False),
+    BGP4MP_MESSAGE_AS4_LOCAL: (True, False),
+    BGP4MP_MESSAGE_ADDPATH: (False, True),
+    BGP4MP_MESSAGE_AS4_ADDPATH: (True, True),
+    BGP4MP_MESSAGE_LOCAL_ADDPATH: (False, True),
+    BGP4MP_MESSAGE_AS4_LOCAL_ADDPATH: (True, True),
+}
+
+# subtype -> (rf, AFI, add-path)
+_RIB_SUBTYPES = {
+    RIB_IPV4_UNICAST: ('ipv4', bm.AFI_IP, False),
+    RIB_IPV6_UNICAST: ('ipv6', bm.AFI_IP6, False),
+    RIB_IPV4_UNICAST_ADDPATH: ('ipv4', bm.AFI_IP, True),
+    RIB_IPV6_UNICAST_ADDPATH: ('ipv6', bm.AFI_IP6, True),
+}
+
+_HEADER = struct.Struct('!IHHI')
+# peer index, originated time, [path identifier,] attribute length
+_ENTRY = struct.Struct('!HIH')
+_ENTRY_ADDPATH = struct.Struct('!HIIH')
+
+
+Peer = collections.namedtuple('Peer', ['bgp_id', 'address', 'asn'])
+
+# time is in seconds, with the microseconds of BGP4MP_ET; data is the BGP
+# message, header included, a memoryview of the dump
+Message = collections.namedtuple('Message', ['time', 'peer_as', 'local_as', 'peer_ip',
+                                             'local_ip', 'four_octet_as', 'addpath', 'data'])
+
+
+class Path(collections.namedtuple('Path', ['rf', 'network', 'length', 'peer_index',
+                                           'originated', 'path_id', 'attributes'])):
+    """
+    One RIB entry: the network address is an integer, attributes the
+    encoded path attributes, a memoryview of the dump.
+    """
+
+    __slots__ = ()
+
+    @property
+    def prefix(self):
+        return bm.format_prefix(self.network, self.length, bm.FAMILIES[self.rf][0])
+
+    def decode(self):
+        """
+        Returns the path attributes decoded by
+        bgp_message.decode_path_attributes(), with the next hop of
+        MP_REACH_NLRI in 'nexthop' for IPv6. The attribute is either
+        complete (as gobgpd writes it) or, as RFC 6396 says, reduced to the
+        next hop length and address.
+        """
+        attrs = bm.decode_path_attributes(self.attributes)
+        if attrs['mp_reach']:
+            attrs['nexthop'] = attrs['mp_reach'][0][1]
+        else:
+            mp = attrs['unknown'].get(bm.ATTR_MP_REACH_NLRI)
+            if mp and len(mp[1]) and mp[1][0] == len(mp[1]) - 1:
+                # the global address only, when a link-local one follows
+                size = 4 if self.rf == 'ipv4' else 16
+                attrs['nexthop'] = socket.inet_ntop(
+                    socket.AF_INET if size == 4 else socket.AF_INET6,
+                    bytes(mp[1][1:1 + min(mp[1][0], size)]))
+                del attrs['unknown'][bm.ATTR_MP_REACH_NLRI]
+        return attrs
+
+
+class MRTReader(object):
+    """
+    Reads an MRT file through mmap. A record cut short at the end of the
+    file, being written by gobgpd, ends the iteration.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.peers = []
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self._map) if self._map is not None else memoryview(b'')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._view.release()
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Paths still refer to the mapping, which goes with them
+                pass
+            self._map = None
+
+    def records(self, start=0):
+        """
+        Yields (offset, timestamp, type, subtype, body) of the records from
+        the offset start, body a memoryview. The microseconds of the _ET
+        types are left in the body.
+        """
+        view = self._view
+        end = len(view)
+        i = start
+        while i + _HEADER.size <= end:
+            timestamp, typ, subtype, length = _HEADER.unpack_from(view, i)
+            if i + _HEADER.size + length > end:
+                return
+            yield i, timestamp, typ, subtype, view[i + _HEADER.size:i + _HEADER.size + length]
+            i += _HEADER.size + length
+
+    def dumps(self):
+        """
+        Returns the offsets of the PEER_INDEX_TABLE records, each starting
+        a table dump; gobgpd appends one every dump interval.
+        """
+        return [off for off, _, typ, subtype, _ in self.records()
+                if typ == TABLE_DUMP_V2 and subtype == PEER_INDEX_TABLE]
+
+    def _peer_index_table(self, body):
+        view_len = struct.unpack_from('!H', body, 4)[0]
+        count = struct.unpack_from('!H', body, 6 + view_len)[0]
+        peers = []
+        i = 8 + view_len
+        for _ in range(count):
+            typ = body[i]
+            bgp_id = socket.inet_ntoa(body[i + 1:i + 5])
+            i += 5
+            if typ & 1:
+                address = socket.inet_ntop(socket.AF_INET6, bytes(body[i:i + 16]))
+                i += 16
+            else:
+                address = socket.inet_ntoa(body[i:i + 4])
+                i += 4
+            if typ & 2:
+                asn = struct.unpack_from('!I', body, i)[0]
+                i += 4
+            else:
+                asn = struct.unpack_from('!H', body, i)[0]
+                i += 2
+            peers.append(Peer(bgp_id, address, asn))
+        self.peers = peers
+
+    def _rib(self, body, rf, afi, addpath):
+        length = body[4]
+        n = (length + 7) // 8
+        network = int.from_bytes(body[5:5 + n], 'big') << ((32 if afi == bm.AFI_IP else 128) - 8 * n)
+        count = struct.unpack_from('!H', body, 5 + n)[0]
+        i = 7 + n
+        if addpath:
+            for _ in range(count):
+                peer_index, originated, path_id, alen = _ENTRY_ADDPATH.unpack_from(body, i)
+                i += _ENTRY_ADDPATH.size
+                yield Path(rf, network, length, peer_index, originated, path_id, body[i:i + alen])
+                i += alen
+        else:
+            for _ in range(count):
+                peer_index, originated, alen = _ENTRY.unpack_from(body, i)
+                i += _ENTRY.size
+                yield Path(rf, network, length, peer_index, originated, None, body[i:i + alen])
+                i += alen
+
+    def paths(self, rf=None, start=0):
+        """
+        Yields the Path of each entry of the RIB records of the unicast
+        families (or of rf only) from the offset start, updating
+        self.peers at each PEER_INDEX_TABLE. peer_index refers to them.
+        """
+        for _, _, typ, subtype, body in self.records(start):
+            if typ != TABLE_DUMP_V2:
+                continue
+            if subtype == PEER_INDEX_TABLE:
+                self._peer_index_table(body)
+                continue
+            info = _RIB_SUBTYPES.get(subtype)
+            if info is None or (rf is not None and info[0] != rf):
+                continue
+            for path in self._rib(body, *info):
+                yield path
+
+    def messages(self, start=0):
+        """
+        Yields a Message for each BGP message of the BGP4MP and BGP4MP_ET
+        records from the offset start; state changes are skipped.
+        """
+        for _, timestamp, typ, subtype, body in self.records(start):
+            if typ not in (BGP4MP, BGP4MP_ET):
+                continue
+            info = _BGP4MP_SUBTYPES.get(subtype)
+            if info is None:
+                continue
+            four_octet_as, addpath = info
+            t = float(timestamp)
+            i = 0
+            if typ == BGP4MP_ET:
+                t += struct.unpack_from('!I', body)[0] / 1000000.0
+                i = 4
+            if four_octet_as:
+                peer_as, local_as, _, afi = struct.unpack_from('!IIHH', body, i)
+                i += 12
+            else:
+                peer_as, local_as, _, afi = struct.unpack_from('!HHHH', body, i)
+                i += 8
+            if afi == bm.AFI_IP:
+                peer_ip = socket.inet_ntoa(body[i:i + 4])
+                local_ip = socket.inet_ntoa(body[i + 4:i + 8])
+                i += 8
+            else:
+                peer_ip = socket.inet_ntop(socket.AF_INET6, bytes(body[i:i + 16]))
+                local_ip = socket.inet_ntop(socket.AF_INET6, bytes(body[i + 16:i + 32]))
+                i += 32
+            yield Message(t, peer_as, local_as, peer_ip, local_ip, four_octet_as, addpath, body[i:])
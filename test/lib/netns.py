@@ -0,0 +1,409 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Network-namespace backend of Container and Bridge (--backend netns).
+
+A container is a process tree in its own PID, mount, network, UTS and IPC
+namespaces, chrooted into an overlay of the root filesystem of its Docker
+image, which is exported once and cached. Networks are Linux bridges on
+the host joined by veth pairs, and the management address docker0 would
+give is taken from MGMT_SUBNET on the MGMT_BRIDGE bridge, which the host
+reaches gRPC and pprof through. Booting a container costs a few process
+spawns instead of a "docker run". The init is INIT, under which the
+Entrypoint and Cmd of the image are started like "docker run" does.
+
+Docker is only used to export the images.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import signal
+import subprocess
+import time
+
+import netaddr
+
+from lib import trace
+
+
+MGMT_BRIDGE = 'gobgp0'
+MGMT_SUBNET = '10.233.0.0/16'
+# the init process of a container, which its namespaces live as long as
+INIT = ['sleep', '2147483647']
+BOOT_TIMEOUT = 10
+
+
+def _run(cmd):
+    # cmd is a shell command line or an argv
+    shell = isinstance(cmd, str)
+    s = cmd if shell else ' '.join(cmd)
+    print('[localhost] local:', s)
+    with trace.span(s.split()[0], 'local', cmd=s):
+        p = subprocess.run(cmd, shell=shell, stdout=subprocess.PIPE,
+                           stderr=subprocess.STDOUT)
+    out = p.stdout.decode('utf-8', 'replace').strip()
+    if p.returncode != 0:
+        raise Exception('command "{0}" exited with {1}: {2}'.format(s, p.returncode, out))
+    return out
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def _device(prefix, name):
+    # Interface names are limited to 15 characters
+    if len(name) <= 15 and not prefix:
+        return name
+    return prefix + hashlib.md5(name.encode('utf-8')).hexdigest()[:15 - len(prefix)]
+
+
+def export_image(image, base_dir):
+    """
+    Returns the root filesystem of image, exported to base_dir once per
+    image ID, and its config.
+    """
+    info = json.loads(_run('docker image inspect {0}'.format(image)))[0]
+    image_dir = os.path.join(base_dir, 'rootfs', info['Id'].split(':')[-1][:12])
+    rootfs = os.path.join(image_dir, 'rootfs')
+    if not os.path.isdir(rootfs):
+        # exported aside first, as parallel test runs may race for it
+        tmp = '{0}.{1}'.format(image_dir, os.getpid())
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(os.path.join(tmp, 'rootfs'))
+        ctn = _run('docker create {0}'.format(image))
+        try:
+            _run('docker export {0} | tar -x -C {1}/rootfs'.format(ctn, tmp))
+        finally:
+            _run('docker rm {0}'.format(ctn))
+        with open(os.path.join(tmp, 'config.json'), 'w') as f:
+            json.dump(info['Config'], f)
+        try:
+            os.rename(tmp, image_dir)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+    with open(os.path.join(image_dir, 'config.json')) as f:
+        return rootfs, json.load(f)
+
+
+def image_command(config):
+    """
+    Returns the argv an image runs, its Entrypoint followed by its Cmd.
+    """
+    return list(config.get('Entrypoint') or []) + list(config.get('Cmd') or [])
+
+
+def _is_init(pid):
+    try:
+        return _read('/proc/{0}/cmdline'.format(pid)).split('\0')[:2] == INIT
+    except (IOError, OSError):
+        return False
+
+
+def _child(pid):
+    for d in os.listdir('/proc'):
+        if not d.isdigit():
+            continue
+        try:
+            stat = _read('/proc/{0}/stat'.format(d))
+        except (IOError, OSError):
+            continue
+        if int(stat[stat.rindex(')') + 2:].split()[1]) == pid:
+            return int(d)
+    return -1
+
+
+class _MgmtAddresses(object):
+    """
+    Addresses of MGMT_SUBNET, leased to containers by name through files
+    under base_dir, so that parallel test runs share the bridge. A lease
+    records the init pid of its container, and is taken over once that
+    init is gone, e.g. after a test run crashed.
+    """
+
+    def __init__(self, base_dir):
+        self.dir = os.path.join(base_dir, 'mgmt')
+        self.lock = os.path.join(base_dir, 'mgmt.lock')
+
+    def _locked(self, f):
+        if not os.path.isdir(self.dir):
+            os.makedirs(self.dir, exist_ok=True)
+        with open(self.lock, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            return f()
+
+    @staticmethod
+    def _holder(path):
+        # (name, init pid) of a lease, None when there is none
+        try:
+            name, pid = _read(path).split()
+            return name, int(pid)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def lease(self, name, pid):
+        def _f():
+            subnet = netaddr.IPNetwork(MGMT_SUBNET)
+            # the first host address is the one of the bridge
+            for ip in list(subnet.iter_hosts())[1:]:
+                path = os.path.join(self.dir, str(ip))
+                holder = self._holder(path)
+                if holder is None or not _is_init(holder[1]):
+                    with open(path, 'w') as f:
+                        f.write('{0} {1}'.format(name, pid))
+                    return '{0}/{1}'.format(ip, subnet.prefixlen)
+            raise Exception('no address left in {0}'.format(MGMT_SUBNET))
+        return self._locked(_f)
+
+    def release(self, name):
+        def _f():
+            for ip in os.listdir(self.dir):
+                path = os.path.join(self.dir, ip)
+                holder = self._holder(path)
+                if holder is None or holder[0] == name:
+                    os.remove(path)
+        self._locked(_f)
+
+
+def bridge_exists(dev):
+    return os.path.isdir('/sys/class/net/{0}/bridge'.format(dev))
+
+
+def bridges():
+    """
+    Returns the names of the bridges created by create_bridge().
+    """
+    names = []
+    for dev in os.listdir('/sys/class/net'):
+        if not bridge_exists(dev):
+            continue
+        try:
+            alias = _read('/sys/class/net/{0}/ifalias'.format(dev)).strip()
+        except (IOError, OSError):
+            alias = ''
+        names.append(alias or dev)
+    return names
+
+
+def bridge_device(name):
+    return _device('', name)
+
+
+def create_bridge(name):
+    dev = bridge_device(name)
+    _run('ip link add name {0} type bridge forward_delay 0'.format(dev))
+    _run('ip link set dev {0} alias {1}'.format(dev, name))
+    _run('ip link set dev {0} up'.format(dev))
+    return dev
+
+
+def delete_bridge(name):
+    _run('ip link del dev {0}'.format(bridge_device(name)))
+
+
+def _ensure_mgmt_bridge():
+    if bridge_exists(MGMT_BRIDGE):
+        return
+    try:
+        create_bridge(MGMT_BRIDGE)
+        subnet = netaddr.IPNetwork(MGMT_SUBNET)
+        _run('ip addr add {0}/{1} dev {2}'.format(subnet[1], subnet.prefixlen, MGMT_BRIDGE))
+    except Exception:
+        # created by a parallel test run in the meantime
+        if not bridge_exists(MGMT_BRIDGE):
+            raise
+
+
+class NetnsContainer(object):
+    """
+    The namespaces and processes of one container, with its state (init
+    pid, overlay directories and logs) under <base_dir>/ctn/<name>.
+    """
+
+    def __init__(self, name, base_dir):
+        self.name = name
+        self.base_dir = base_dir
+        self.dir = os.path.join(base_dir, 'ctn', name)
+        self.mgmt = _MgmtAddresses(base_dir)
+        self.env = []
+        self.workdir = '/'
+        self._init = None
+        self._spawned = []
+
+    def pid(self):
+        try:
+            pid = int(_read(os.path.join(self.dir, 'pid')))
+        except (IOError, OSError, ValueError):
+            return -1
+        return pid if _is_init(pid) else -1
+
+    def _boot_argv(self, rootfs, volumes):
+        """
+        Returns the command line which sets the namespaces and mounts of the
+        container up, then execs INIT chrooted into them.
+        """
+        merged = os.path.join(self.dir, 'merged')
+        script = [
+            'set -e',
+            'mount -t overlay overlay -o lowerdir={0},upperdir={1}/upper,workdir={1}/work {2}'.format(
+                rootfs, self.dir, merged),
+        ]
+        for src, dst in volumes:
+            script.append('mkdir -p {0}{1}'.format(merged, dst))
+            script.append('mount --bind {0} {1}{2}'.format(src, merged, dst))
+        script += [
+            'mount --rbind /dev {0}/dev'.format(merged),
+            # as pid 1 of the new PID namespace, so /proc shows its processes
+            'mount -t proc proc {0}/proc'.format(merged),
+            'mount -t sysfs sysfs {0}/sys'.format(merged),
+            'hostname {0}'.format(self.name.replace('_', '-')),
+            'touch {0}/ready'.format(self.dir),
+            # commands run in the working directory of the init
+            "exec chroot {0} sh -c 'cd {1} || true; exec {2}'".format(merged, self.workdir, ' '.join(INIT)),
+        ]
+        return ['unshare', '--pid', '--mount', '--net', '--uts', '--ipc', '--fork',
+                '--propagation', 'private', 'sh', '-c', '\n'.join(script)]
+
+    def start(self, image, volumes):
+        """
+        Boots the container with the given (host path, container path)
+        bind mounts, and returns its management address on MGMT_BRIDGE.
+        """
+        rootfs, config = export_image(image, self.base_dir)
+        self.env = list(config.get('Env') or [])
+        if not any(e.startswith('HOME=') for e in self.env):
+            self.env.append('HOME=/root')
+        self.workdir = config.get('WorkingDir') or '/'
+
+        shutil.rmtree(self.dir, ignore_errors=True)
+        for d in ('upper', 'work', 'merged'):
+            os.makedirs(os.path.join(self.dir, d))
+        print('[localhost] local: unshare {0}'.format(self.name))
+        with open(os.path.join(self.dir, 'init.log'), 'w') as log:
+            self._init = subprocess.Popen(
+                self._boot_argv(rootfs, volumes),
+                stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                start_new_session=True)
+
+        deadline = time.time() + BOOT_TIMEOUT
+        pid = -1
+        while pid < 0 or not os.path.exists(os.path.join(self.dir, 'ready')):
+            if self._init.poll() is not None or time.time() > deadline:
+                self.stop()
+                raise Exception('failed to boot {0}: {1}'.format(
+                    self.name, _read(os.path.join(self.dir, 'init.log')).strip()))
+            if pid < 0:
+                pid = _child(self._init.pid)
+            time.sleep(0.01)
+        # the init may not have exec'ed chroot yet
+        while not _is_init(pid):
+            time.sleep(0.01)
+        with open(os.path.join(self.dir, 'pid'), 'w') as f:
+            f.write(str(pid))
+
+        _ensure_mgmt_bridge()
+        addr = self.mgmt.lease(self.name, pid)
+        self.add_interface(MGMT_BRIDGE, 'eth0', addr)
+
+        cmd = image_command(config)
+        if cmd:
+            # what "docker run" would start, e.g. the supervisord of
+            # osrg/quagga which starts zebra and bgpd
+            with open(os.path.join(self.dir, 'cmd.log'), 'w') as log:
+                self._spawn(self.argv(cmd), log)
+        return addr
+
+    def add_interface(self, bridge, ifname, addr=''):
+        """
+        Connects the container to a bridge by a veth pair whose container
+        end is named ifname, and gives it addr.
+        """
+        host = _device('gv', '{0}/{1}'.format(self.name, ifname))
+        if os.path.exists('/sys/class/net/{0}'.format(host)):
+            # left by a container which was not removed
+            _run('ip link del dev {0}'.format(host))
+        _run('ip link add {0} type veth peer name {1} netns {2}'.format(host, ifname, self.pid()))
+        _run('ip link set dev {0} master {1} up'.format(host, bridge_device(bridge)))
+        cmd = 'ip link set dev {0} up'.format(ifname)
+        if addr:
+            cmd = 'ip addr add {0} dev {1} && {2}'.format(addr, ifname, cmd)
+        _run(self.argv(['sh', '-c', cmd]))
+
+    def argv(self, cmd):
+        """
+        Returns the command line running cmd (an argv) in the container.
+        """
+        return ['nsenter', '-t', str(self.pid()), '-m', '-u', '-i', '-n', '-p',
+                '-r', '-w', 'env', '-i'] + self.env + cmd
+
+    def _spawn(self, argv, out=subprocess.DEVNULL):
+        p = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=out,
+                             stderr=subprocess.STDOUT, start_new_session=True)
+        self._spawned = [s for s in self._spawned if s.poll() is None] + [p]
+
+    def spawn(self, cmd):
+        """
+        Runs cmd in the background, like "docker exec -d".
+        """
+        self._spawn(self.argv(['sh', '-c', cmd]))
+
+    def stream(self, cmd):
+        """
+        Runs cmd and returns a generator of its output lines.
+        """
+        p = subprocess.Popen(self.argv(['sh', '-c', cmd]), stdin=subprocess.DEVNULL,
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+        def _lines():
+            try:
+                for line in iter(p.stdout.readline, b''):
+                    yield line
+            finally:
+                if p.poll() is None:
+                    p.kill()
+                p.wait()
+        return _lines()
+
+    def stop(self):
+        """
+        Kills the init, which terminates all the processes of the
+        container and releases its namespaces, veth pairs and mounts.
+        """
+        pid = self.pid()
+        if pid > 0:
+            os.kill(pid, signal.SIGKILL)
+        if self._init is not None:
+            self._init.wait()
+            self._init = None
+        for p in self._spawned:
+            p.wait()
+        self._spawned = []
+        self.mgmt.release(self.name)
+
+    def remove(self):
+        self.stop()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def containers(base_dir):
+    d = os.path.join(base_dir, 'ctn')
+    if not os.path.isdir(d):
+        return []
+    return os.listdir(d)
@@ -1,6 +1,10 @@
 import os
 from nose.plugins import Plugin
 
+from lib import base
+from lib import gobgp_api
+from lib import trace
+
 parser_option = None
 
 
@@ -12,18 +16,43 @@ class OptionParser(Plugin):
         parser.add_option('--gobgp-image', action="store", dest="gobgp_image", default="osrg/gobgp")
         parser.add_option('--exabgp-path', action="store", dest="exabgp_path", default="")
         parser.add_option('--go-path', action="store", dest="go_path", default="")
+        parser.add_option('--gobgp-driver', action="store", dest="gobgp_driver",
+                          default="cli", choices=["cli", "grpc"])
         parser.add_option('--gobgp-log-level', action="store",
                           dest="gobgp_log_level", default="info")
         parser.add_option('--test-index', action="store", type="int", dest="test_index", default=0)
+        parser.add_option('--test-indexes', action="store", dest="test_indexes", default="",
+                          help="comma separated test indexes run in one process, see run_scenarios.py")
         parser.add_option('--config-format', action="store", dest="config_format", default="yaml")
+        parser.add_option('--backend', action="store", dest="backend",
+                          default="docker", choices=["docker", "netns"],
+                          help="run containers with Docker or in network namespaces (see lib/netns.py)")
+        parser.add_option('--trace-dir', action="store", dest="trace_dir", default="",
+                          help="write a timeline trace of the harness to this directory")
 
     def configure(self, options, conf):
         super(OptionParser, self).configure(options, conf)
         global parser_option
         parser_option = options
+        base.BACKEND = options.backend
+        if options.gobgp_driver == 'grpc' and not gobgp_api.available():
+            raise Exception('--gobgp-driver grpc needs the gRPC python stubs, '
+                            'generate them with "{0}"'.format(gobgp_api.STUBS_COMMAND))
+
+        if options.trace_dir:
+            trace.enable()
+            # finalize() is only called for enabled plugins
+            self.enabled = True
 
         if not self.enabled:
             return
 
     def finalize(self, result):
-        pass
+        if parser_option is None or not parser_option.trace_dir:
+            return
+        if not os.path.isdir(parser_option.trace_dir):
+            os.makedirs(parser_option.trace_dir)
+        path = os.path.join(parser_option.trace_dir, 'trace_{0}_{1}.json'.format(
+            parser_option.test_prefix or 'default', os.getpid()))
+        print(trace.dump(path))
+        print('trace written to {0}'.format(path))
@@ -15,11 +15,14 @@
 
 
 
+import collections
+import itertools
 import re
 import netaddr
 
 from lib.base import (
     wait_for_completion,
+    prefix_matches,
     BGPContainer,
     OSPFContainer,
     CmdBuffer,
@@ -28,6 +31,7 @@ from lib.base import (
     BGP_FSM_ESTABLISHED,
     BGP_ATTR_TYPE_MULTI_EXIT_DISC,
     BGP_ATTR_TYPE_LOCAL_PREF,
+    LOOKUP_OPTIONS,
     yellow,
     indent,
 )
@@ -37,6 +41,17 @@ class QuaggaBGPContainer(BGPContainer):
 
     WAIT_FOR_BOOT = 1
     SHARED_VOLUME = '/etc/quagga'
+    DAEMON = 'bgpd'
+    DEFAULT_LOCAL_PREF = 100
+    # path attributes set through a route-map
+    ROUTE_MAP_ATTRIBUTES = (
+        'next-hop',
+        'as-path',
+        'community',
+        'med',
+        'local-pref',
+        'extended-community',
+    )
 
     def __init__(self, name, asn, router_id, ctn_image_name='osrg/quagga', bgpd_config=None, zebra=False):
         super(QuaggaBGPContainer, self).__init__(name, asn, router_id,
@@ -56,6 +71,11 @@ class QuaggaBGPContainer(BGPContainer):
         # }
         self.bgpd_config = bgpd_config or {}
 
+        # route-maps shared by the routes added with add_routes()
+        # {<attribute tuple>: {'name': <route-map name>, 'refs': <# of routes>}}
+        self.shared_route_maps = {}
+        self._route_map_ids = itertools.count()
+
     def _get_enabled_daemons(self):
         daemons = ['bgpd']
         if self.zebra:
@@ -87,6 +107,12 @@ class QuaggaBGPContainer(BGPContainer):
         if out.startswith('No BGP network exists'):
             return rib
 
+        try:
+            return self._parse_rib_summary(out)
+        except Exception as e:
+            print(yellow('failed to parse the summary table ({0}), '
+                         'fall back to per-prefix queries'.format(e)))
+
         for line in out.split('\n')[6:-2]:
             line = line[3:]
 
@@ -98,10 +124,129 @@ class QuaggaBGPContainer(BGPContainer):
 
         return rib
 
-    def get_global_rib_with_prefix(self, prefix, rf):
+    def _parse_rib_summary(self, out):
+        # Example:
+        #    Network          Next Hop            Metric LocPrf Weight Path
+        # *> 10.0.0.0/24      192.168.0.1              0             0 65000 i
+        # *                   192.168.0.5                   100      0 65002 ?
+        # *>i2001:db8:1111:2222::/64
+        #                     2001:db8:ffff::100
+        #                                              0    100      0 i
+        #
+        # Columns are fixed width. A network of 17 characters or more and a
+        # next hop of 16 characters or more are followed by a line break and
+        # the rest of the row is indented to the next column.
+        lines = out.split('\n')
+        for i, line in enumerate(lines):
+            if 'Network' in line and 'Next Hop' in line:
+                header = line
+                lines = lines[i + 1:]
+                break
+        else:
+            raise Exception('header not found')
+
+        network_col = header.index('Network')
+        nexthop_col = header.index('Next Hop')
+        metric_end = header.index('Metric') + len('Metric')
+        locprf_end = header.index('LocPrf') + len('LocPrf')
+        weight_end = header.index('Weight') + len('Weight')
+        path_col = header.index('Path')
+        attr_col = metric_end - 10  # metric is printed with "%10u"
+
         rib = []
+        prefix = None
+        lines = iter(lines)
+        for line in lines:
+            if not line.strip():
+                continue
+            if line.startswith('Total number of prefixes') or line.startswith('Displayed'):
+                break
+
+            status = line[:network_col]
+            # a row without network (another path to the previous one) is
+            # blank up to the next hop column
+            if line[network_col:nexthop_col].strip():
+                if line[nexthop_col - 1:nexthop_col] != ' ':
+                    # the network is too long and the row continues on next line
+                    prefix = line[network_col:].strip()
+                    line = next(lines)
+                else:
+                    prefix = line[network_col:nexthop_col].strip()
+            if prefix is None or '/' not in prefix:
+                raise Exception('unknown output format {0}'.format(line))
+
+            if line[attr_col - 1:attr_col] != ' ' or not line[attr_col:].strip():
+                # the next hop is too long and the row continues on next line
+                nexthop = line[nexthop_col:].strip()
+                line = next(lines)
+            else:
+                nexthop = line[nexthop_col:attr_col].strip()
+
+            metric = line[attr_col:metric_end].strip()
+            localpref = line[metric_end:locprf_end].strip()
+            weight = line[locprf_end:weight_end].strip()
+            path = line[path_col:].split()
+            if not weight or not path:
+                raise Exception('unknown output format {0}'.format(line))
+
+            # the last element is the origin code
+            aspath = [int(re.sub(r'\D', '', asn)) for asn in path[:-1]]
+            attrs = []
+            if metric:
+                attrs.append({'type': BGP_ATTR_TYPE_MULTI_EXIT_DISC, 'metric': int(metric)})
+            # blank unless received, where "show bgp <prefix>" shows the
+            # default
+            attrs.append({'type': BGP_ATTR_TYPE_LOCAL_PREF,
+                          'value': int(localpref) if localpref else self.DEFAULT_LOCAL_PREF})
+
+            rib.append({'prefix': prefix, 'nexthop': nexthop,
+                        'aspath': aspath, 'attrs': attrs,
+                        'ibgp': status[2:3] == 'i', 'best': status[1:2] == '>'})
 
+        return rib
+
+    def get_global_rib_with_prefix(self, prefix, rf):
         lines = [line.strip() for line in self.vtysh('show bgp {0} unicast {1}'.format(rf, prefix), config=False).split('\n')]
+        return self._parse_rib_entry(prefix, lines)
+
+    def lookup_global_rib(self, prefixes, rf='ipv4', lookup='exact'):
+        """
+        Returns the paths for all of prefixes, reading every entry through
+        a single vtysh invocation. The 'longer' and 'shorter' lookups filter
+        the whole table.
+        """
+        if lookup not in LOOKUP_OPTIONS:
+            raise Exception('invalid lookup option {0}'.format(lookup))
+        rib = []
+        prefixes = list(prefixes)
+        if not prefixes:
+            return rib
+        if lookup != 'exact':
+            return [p for p in self.get_global_rib(rf=rf)
+                    if any(prefix_matches(p['prefix'], q, lookup) for q in prefixes)]
+
+        out = self.vtysh(['show bgp {0} unicast {1}'.format(rf, p) for p in prefixes], config=False)
+        # vtysh prints the output of each command in order, and each
+        # starts with one of the following lines.
+        entries = []
+        for line in out.split('\n'):
+            line = line.strip()
+            if line.startswith('BGP routing table entry for') or line == '% Network not in table':
+                entries.append([])
+            if entries:
+                entries[-1].append(line)
+
+        if len(entries) != len(prefixes):
+            raise Exception('unknown output format {0}'.format(out))
+
+        for prefix, lines in zip(prefixes, entries):
+            while lines and lines[-1] == '':
+                lines.pop()
+            rib.extend(self._parse_rib_entry(prefix, lines))
+        return rib
+
+    def _parse_rib_entry(self, prefix, lines):
+        rib = []
 
         if lines[0] == '% Network not in table':
             return rib
@@ -119,7 +264,7 @@ class QuaggaBGPContainer(BGPContainer):
             if lines[0] == 'Local':
                 aspath = []
             else:
-                aspath = [int(re.sub('\D', '', asn)) for asn in lines[0].split()]
+                aspath = [int(re.sub(r'\D', '', asn)) for asn in lines[0].split()]
 
             nexthop = lines[1].split()[0].strip()
             info = [s.strip(',') for s in lines[2].split()]
@@ -276,43 +421,41 @@ class QuaggaBGPContainer(BGPContainer):
             self.local('pkill -SIGHUP {0}'.format(daemon), capture=True)
         self._wait_for_boot()
 
-    def _vtysh_add_route_map(self, path):
-        supported_attributes = (
-            'next-hop',
-            'as-path',
-            'community',
-            'med',
-            'local-pref',
-            'extended-community',
-        )
-        if not any([path[k] for k in supported_attributes]):
-            return ''
-
-        c = CmdBuffer(' ')
-        route_map_name = 'RM-{0}'.format(path['prefix'])
-        c << "vtysh -c 'configure terminal'"
-        c << "-c 'route-map {0} permit 10'".format(route_map_name)
+    def _route_map_commands(self, path):
+        c = []
         if path['next-hop']:
             if path['rf'] == 'ipv4':
-                c << "-c 'set ip next-hop {0}'".format(path['next-hop'])
+                c.append('set ip next-hop {0}'.format(path['next-hop']))
             elif path['rf'] == 'ipv6':
-                c << "-c 'set ipv6 next-hop {0}'".format(path['next-hop'])
+                c.append('set ipv6 next-hop {0}'.format(path['next-hop']))
             else:
                 raise ValueError('Unsupported address family: {0}'.format(path['rf']))
         if path['as-path']:
             as_path = ' '.join([str(n) for n in path['as-path']])
-            c << "-c 'set as-path prepend {0}'".format(as_path)
+            c.append('set as-path prepend {0}'.format(as_path))
         if path['community']:
             comm = ' '.join(path['community'])
-            c << "-c 'set community {0}'".format(comm)
+            c.append('set community {0}'.format(comm))
         if path['med']:
-            c << "-c 'set metric {0}'".format(path['med'])
+            c.append('set metric {0}'.format(path['med']))
         if path['local-pref']:
-            c << "-c 'set local-preference {0}'".format(path['local-pref'])
+            c.append('set local-preference {0}'.format(path['local-pref']))
         if path['extended-community']:
             # Note: Currently only RT is supported.
             extcomm = ' '.join(path['extended-community'])
-            c << "-c 'set extcommunity rt {0}'".format(extcomm)
+            c.append('set extcommunity rt {0}'.format(extcomm))
+        return c
+
+    def _vtysh_add_route_map(self, path):
+        if not any([path[k] for k in self.ROUTE_MAP_ATTRIBUTES]):
+            return ''
+
+        c = CmdBuffer(' ')
+        route_map_name = 'RM-{0}'.format(path['prefix'])
+        c << "vtysh -c 'configure terminal'"
+        c << "-c 'route-map {0} permit 10'".format(route_map_name)
+        for cmd in self._route_map_commands(path):
+            c << "-c '{0}'".format(cmd)
         self.local(str(c), capture=True)
 
         return route_map_name
@@ -367,10 +510,19 @@ class QuaggaBGPContainer(BGPContainer):
         if not route_map_name:
             return
 
+        key = path.get('route_map_key')
+        if key is not None:
+            shared = self.shared_route_maps[key]
+            if shared['refs'] > 1:
+                shared['refs'] -= 1
+                return
+
         c = CmdBuffer(' ')
         c << "vtysh -c 'configure terminal'"
         c << "-c 'no route-map {0}'".format(route_map_name)
         self.local(str(c), capture=True)
+        if key is not None:
+            del self.shared_route_maps[key]
 
     def del_route(self, route, identifier=None, reload_config=False):
         if not self._is_running():
@@ -399,6 +551,132 @@ class QuaggaBGPContainer(BGPContainer):
 
         self.routes[route] = new_paths
 
+    def _vtysh_configure(self, cmds):
+        c = CmdBuffer(' ')
+        c << "vtysh -c 'configure terminal'"
+        for cmd in cmds:
+            c << "-c '{0}'".format(cmd)
+        self.local(str(c), capture=True)
+
+    def _vtysh_networks(self, rf, cmds, batch_size):
+        # Split into chunks, so that each vtysh invocation stays well below
+        # the argument size limit.
+        for i in range(0, len(cmds), batch_size):
+            c = ['address-family {0} unicast'.format(rf)]
+            c.extend(cmds[i:i + batch_size])
+            c.append('exit-address-family')
+            self.vtysh(c)
+
+    def add_routes(self, routes, rf='ipv4', batch_size=500):
+        """
+        Originates many routes with a few vtysh invocations.
+
+        Each element of routes is either a prefix or a dict holding
+        'prefix' and any of 'next-hop', 'as-path', 'community', 'med',
+        'local-pref' and 'extended-community'. Routes with the same
+        attributes share one route-map.
+        """
+        if not self._is_running():
+            raise RuntimeError('Quagga/Zebra is not yet running')
+
+        if rf not in ('ipv4', 'ipv6'):
+            raise ValueError('Unsupported address family: {0}'.format(rf))
+
+        route_map_cmds = []
+        network_cmds = []
+        paths = []
+        new_route_maps = {}
+        for r in routes:
+            if not isinstance(r, dict):
+                r = {'prefix': r}
+            path = {
+                'prefix': r['prefix'],
+                'rf': rf,
+                'attr': None,
+                'identifier': None,
+                'matchs': None,
+                'thens': None,
+            }
+            for k in self.ROUTE_MAP_ATTRIBUTES:
+                path[k] = r.get(k)
+
+            route_map_name = ''
+            if any([path[k] for k in self.ROUTE_MAP_ATTRIBUTES]):
+                key = (rf,) + tuple(tuple(path[k]) if isinstance(path[k], list) else path[k]
+                                    for k in self.ROUTE_MAP_ATTRIBUTES)
+                shared = self.shared_route_maps.get(key) or new_route_maps.get(key)
+                if shared is None:
+                    name = 'RM-SHARED-{0}'.format(next(self._route_map_ids))
+                    shared = new_route_maps[key] = {'name': name, 'refs': 0}
+                    route_map_cmds.append('route-map {0} permit 10'.format(name))
+                    route_map_cmds.extend(self._route_map_commands(path))
+                    route_map_cmds.append('exit')
+                route_map_name = shared['name']
+                path['route_map_key'] = key
+            path['route_map'] = route_map_name
+
+            if route_map_name:
+                network_cmds.append('network {0} route-map {1}'.format(path['prefix'], route_map_name))
+            else:
+                network_cmds.append('network {0}'.format(path['prefix']))
+            paths.append(path)
+
+        # Prepare route-maps before adding prefixes
+        if route_map_cmds:
+            self._vtysh_configure(route_map_cmds)
+        self.shared_route_maps.update(new_route_maps)
+
+        self._vtysh_networks(rf, network_cmds, batch_size)
+
+        for path in paths:
+            key = path.get('route_map_key')
+            if key is not None:
+                self.shared_route_maps[key]['refs'] += 1
+            self.routes.setdefault(path['prefix'], []).append(path)
+
+    def del_routes(self, routes, batch_size=500):
+        """
+        Withdraws many routes added with add_route() or add_routes() with a
+        few vtysh invocations.
+        """
+        if not self._is_running():
+            raise RuntimeError('Quagga/Zebra is not yet running')
+
+        network_cmds = {'ipv4': [], 'ipv6': []}
+        deleted = collections.OrderedDict()
+        for route in routes:
+            paths = self.routes.get(route, [])
+            if not paths or route in deleted:
+                continue
+            network_cmds[paths[-1]['rf']].append('no network {0}'.format(route))
+            deleted[route] = paths
+
+        for rf, cmds in network_cmds.items():
+            self._vtysh_networks(rf, cmds, batch_size)
+        for route in deleted:
+            self.routes[route] = []
+
+        # Delete route-maps after deleting prefixes
+        route_map_cmds = []
+        released = collections.Counter()
+        for path in itertools.chain.from_iterable(deleted.values()):
+            key = path.get('route_map_key')
+            if key is not None:
+                released[key] += 1
+            elif path.get('route_map'):
+                route_map_cmds.append('no route-map {0}'.format(path['route_map']))
+        for key, n in released.items():
+            shared = self.shared_route_maps[key]
+            if shared['refs'] <= n:
+                route_map_cmds.append('no route-map {0}'.format(shared['name']))
+        if route_map_cmds:
+            self._vtysh_configure(route_map_cmds)
+        for key, n in released.items():
+            shared = self.shared_route_maps[key]
+            shared['refs'] -= n
+            if shared['refs'] <= 0:
+                del self.shared_route_maps[key]
+
 
 class RawQuaggaBGPContainer(QuaggaBGPContainer):
     def __init__(self, name, config, ctn_image_name='osrg/quagga', zebra=False):
@@ -0,0 +1,361 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Replay of BGP4MP update dumps into gobgpd.
+
+MRTReplay reads the UPDATEs of an MRT file lazily (see lib/mrt.py) and
+sends them at their original pace, speed times faster, or as fast as
+possible, either through the session of a BGPSpeaker to gobgpd
+(SpeakerTarget) or through the AddPathStream API (GoBGPTarget). Unlike
+"gobgp mrt inject", which loads TABLE_DUMP_V2 snapshots, it keeps the
+timing of the updates:
+
+    replay = MRTReplay('/tmp/updates.20200101.0000', speed=10)
+    stats = replay.run(SpeakerTarget(s1, g1), monitor=g1)
+
+With monitor, the lag of gobgpd is measured on a sample of the UPDATEs,
+from their sending to the change of the global table reported by
+MonitorTable. The updates of all the peers of the dump are sent as if
+they came from one peer, unless peer_ip selects one of them.
+"""
+
+import collections
+import queue
+import statistics
+import threading
+import time
+
+from lib import bgp_message as bm
+from lib import gobgp_api
+from lib.base import yellow
+from lib.mrt import MRTReader
+
+
+# UPDATEs sent at once when behind schedule
+BATCH = 256
+# AddPathStream requests queued before the replay waits for gobgpd
+QUEUE_BATCHES = 64
+# sampled UPDATEs waiting for their MonitorTable event
+MAX_PENDING = 10000
+
+
+class SpeakerTarget(object):
+    """
+    Writes the UPDATEs as they are to the session of speaker to peer. Their
+    AS_PATH is re-encoded when the session and the dump differ in 4-octet
+    AS support; the ones whose path identifiers do not match the add-path
+    support of the session, or too long for it, are dropped.
+    """
+
+    def __init__(self, speaker, peer):
+        self.speaker = speaker
+        self.peer = peer
+        self.session = None
+
+    def open(self):
+        self.session = self.speaker.negotiated(self.peer)
+
+    def send(self, msgs):
+        out = []
+        dropped = 0
+        for m in msgs:
+            if m.addpath != bool(self.session['add_path']) or len(m.data) > self.session['max_len']:
+                dropped += 1
+            elif m.four_octet_as == self.session['four_octet_as']:
+                out.append(bytes(m.data))
+            else:
+                body = bm.convert_as_path(m.data[bm.HEADER_LEN:], m.four_octet_as,
+                                          self.session['four_octet_as'])
+                out.append(bm.message(bm.UPDATE, body))
+        sent = self.speaker.send_messages(out, self.peer) if out else 0
+        return sent, dropped + len(out) - sent
+
+    def close(self):
+        pass
+
+
+def _paths(msg):
+    # the gobgp_pb2.Path of each prefix of an UPDATE
+    u = bm.decode_update(msg.data[bm.HEADER_LEN:], msg.four_octet_as,
+                         bm.FAMILIES if msg.addpath else ())
+    a = u['attributes']
+    attrs = {'aspath': a['aspath'], 'med': a['med'], 'local_pref': a['local-pref'],
+             'community': a['community']}
+    if a['origin'] is not None:
+        attrs['origin'] = a['origin']
+    paths = []
+    for prefix, path_id in u['withdrawn']:
+        paths.append(gobgp_api.new_path(prefix, 'ipv4', identifier=path_id, is_withdraw=True))
+    for rf, prefixes in u['mp_unreach']:
+        for prefix, path_id in prefixes:
+            paths.append(gobgp_api.new_path(prefix, rf, identifier=path_id, is_withdraw=True))
+    for prefix, path_id in u['nlri']:
+        paths.append(gobgp_api.new_path(prefix, 'ipv4', nexthop=a['nexthop'],
+                                        identifier=path_id, **attrs))
+    for rf, nexthop, prefixes in u['mp_reach']:
+        for prefix, path_id in prefixes:
+            paths.append(gobgp_api.new_path(prefix, rf, nexthop=nexthop,
+                                            identifier=path_id, **attrs))
+    return paths
+
+
+class GoBGPTarget(object):
+    """
+    Decodes the UPDATEs into paths and streams them to the global table of
+    the gobgpd of ctn through AddPathStream, one request per batch of
+    UPDATEs. The IPv4 and IPv6 unicast prefixes are sent, with their
+    origin, AS path, next hop, MED, local preference and communities; the
+    UPDATEs which cannot be decoded are dropped.
+    """
+
+    def __init__(self, ctn):
+        self.ctn = ctn
+        self.error = None
+        self._queue = None
+        self._thread = None
+
+    def open(self):
+        client = self.ctn.api()
+        self._queue = queue.Queue(QUEUE_BATCHES)
+
+        def _batches():
+            while True:
+                batch = self._queue.get()
+                if batch is None:
+                    return
+                yield batch
+
+        def _run():
+            try:
+                client.add_path_batches(_batches())
+            except Exception as e:
+                self.error = e
+        self._thread = threading.Thread(target=_run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _put(self, item):
+        # blocks while gobgpd is behind, as long as the stream is alive
+        while True:
+            if self.error is not None:
+                raise self.error
+            try:
+                self._queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                pass
+
+    def send(self, msgs):
+        paths = []
+        dropped = 0
+        for m in msgs:
+            try:
+                paths.extend(_paths(m))
+            except (ValueError, IndexError, KeyError):
+                dropped += 1
+        if paths:
+            self._put(paths)
+        return len(msgs) - dropped, dropped
+
+    def close(self):
+        self._put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+class _LagProbe(object):
+    """
+    Measures the time from the sending of sampled UPDATEs to the change
+    of the global table of gobgpd they cause, from MonitorTable streams.
+    """
+
+    def __init__(self, client, families=('ipv4', 'ipv6')):
+        self.client = client
+        self.families = families
+        # (prefix, withdrawal) -> sending time, oldest first
+        self.pending = collections.OrderedDict()
+        self.lags = collections.deque(maxlen=100000)
+        self.expired = 0
+        self._lock = threading.Lock()
+        self._streams = []
+        self._threads = []
+
+    def start(self):
+        for rf in self.families:
+            req = gobgp_api.gobgp_pb2.MonitorTableRequest(
+                table_type=gobgp_api.gobgp_pb2.GLOBAL,
+                family=gobgp_api.new_family(rf), current=False)
+            stream = self.client.stub.MonitorTable(req)
+            t = threading.Thread(target=self._run, args=(stream,))
+            t.daemon = True
+            t.start()
+            self._streams.append(stream)
+            self._threads.append(t)
+        return self
+
+    def _run(self, stream):
+        try:
+            for rsp in stream:
+                now = time.time()
+                key = (gobgp_api.nlri_to_dict(rsp.path.nlri, '')['prefix'], rsp.path.is_withdraw)
+                with self._lock:
+                    sent = self.pending.pop(key, None)
+                    if sent is not None:
+                        self.lags.append(now - sent)
+        except gobgp_api.grpc.RpcError:
+            pass
+
+    def sent(self, key, when):
+        with self._lock:
+            self.pending.pop(key, None)
+            self.pending[key] = when
+            if len(self.pending) > MAX_PENDING:
+                self.pending.popitem(last=False)
+                self.expired += 1
+
+    def stop(self, grace):
+        """
+        Waits up to grace seconds for the pending samples, and returns the
+        number of samples gobgpd did not report.
+        """
+        deadline = time.time() + grace
+        while self.pending and time.time() < deadline:
+            time.sleep(0.1)
+        for stream in self._streams:
+            stream.cancel()
+        for t in self._threads:
+            t.join()
+        return self.expired + len(self.pending)
+
+
+def _sample_key(msg):
+    # the first prefix an UPDATE announces, or withdraws
+    u = bm.decode_update(msg.data[bm.HEADER_LEN:], msg.four_octet_as,
+                         bm.FAMILIES if msg.addpath else ())
+    for prefixes in [u['nlri']] + [p for _, _, p in u['mp_reach']]:
+        if prefixes:
+            return prefixes[0][0], False
+    for prefixes in [u['withdrawn']] + [p for _, p in u['mp_unreach']]:
+        if prefixes:
+            return prefixes[0][0], True
+    return None
+
+
+class MRTReplay(object):
+    """
+    Replays the UPDATEs of a BGP4MP dump file. speed is the factor applied
+    to the original pace, None to send as fast as the target takes them.
+    One UPDATE in sample is used to measure the lag of gobgpd.
+    """
+
+    def __init__(self, path, speed=1.0, peer_ip=None, sample=100):
+        self.path = path
+        self.speed = speed
+        self.peer_ip = peer_ip
+        self.sample = sample
+
+    def _flush(self, target, batch, probe, stats):
+        if probe is not None:
+            now = time.time()
+            for m in batch:
+                stats['updates'] += 1
+                if stats['updates'] % self.sample == 0:
+                    key = _sample_key(m)
+                    if key is not None:
+                        probe.sent(key, now)
+        else:
+            stats['updates'] += len(batch)
+        sent, dropped = target.send(batch)
+        stats['sent'] += sent
+        stats['dropped'] += dropped
+
+    def _replay(self, target, probe, limit, stats, start):
+        # returns the times of the first and last UPDATEs read
+        batch = []
+        first = last = None
+        with MRTReader(self.path) as r:
+            for m in r.messages():
+                if len(m.data) < bm.HEADER_LEN or m.data[bm.HEADER_LEN - 1] != bm.UPDATE:
+                    continue
+                if self.peer_ip is not None and m.peer_ip != self.peer_ip:
+                    continue
+                if limit is not None and stats['updates'] + len(batch) >= limit:
+                    break
+                if first is None:
+                    first = m.time
+                last = m.time
+                if self.speed:
+                    due = start + (m.time - first) / self.speed
+                    now = time.time()
+                    if due > now:
+                        if batch:
+                            self._flush(target, batch, probe, stats)
+                            batch = []
+                        time.sleep(max(0, due - time.time()))
+                    else:
+                        stats['behind'] = max(stats['behind'], now - due)
+                batch.append(m)
+                if len(batch) >= BATCH:
+                    self._flush(target, batch, probe, stats)
+                    batch = []
+            if batch:
+                self._flush(target, batch, probe, stats)
+        return first, last
+
+    def run(self, target, monitor=None, limit=None, grace=30):
+        """
+        Sends the UPDATEs (at most limit of them) to target, and returns
+        the statistics of the replay: the UPDATEs read, sent and dropped,
+        the achieved rate and the one of the dump in UPDATEs/second, how
+        far behind schedule the replay fell, and with monitor, a
+        GoBGPContainer, the lag of gobgpd ('lag_median', 'lag_p99' and
+        'lag_max', in seconds) and the number of sampled UPDATEs it did not
+        report within grace seconds ('unconfirmed').
+        """
+        probe = _LagProbe(monitor.api()).start() if monitor is not None else None
+        stats = {'updates': 0, 'sent': 0, 'dropped': 0, 'behind': 0.0}
+        try:
+            target.open()
+            start = time.time()
+            try:
+                first, last = self._replay(target, probe, limit, stats, start)
+            finally:
+                target.close()
+        except Exception:
+            if probe is not None:
+                probe.stop(0)
+            raise
+        elapsed = time.time() - start
+        stats['elapsed'] = elapsed
+        stats['rate'] = stats['sent'] / elapsed if elapsed > 0 else float(stats['sent'])
+        span = (last - first) if first is not None else 0
+        stats['original_rate'] = stats['updates'] / span if span > 0 else None
+
+        msg = 'replayed {0} of {1} UPDATEs in {2:.2f} sec ({3:.0f}/sec), {4} dropped'.format(
+            stats['sent'], stats['updates'], elapsed, stats['rate'], stats['dropped'])
+        if probe is not None:
+            stats['unconfirmed'] = probe.stop(grace)
+            lags = sorted(probe.lags)
+            if lags:
+                stats['lag_median'] = statistics.median(lags)
+                stats['lag_p99'] = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+                stats['lag_max'] = lags[-1]
+                msg += ', lag median {0:.3f} sec p99 {1:.3f} sec max {2:.3f} sec'.format(
+                    stats['lag_median'], stats['lag_p99'], stats['lag_max'])
+            msg += ', {0} unconfirmed'.format(stats['unconfirmed'])
+        print(yellow(msg))
+        return stats
@@ -0,0 +1,278 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Resource usage of the daemons under test.
+
+ResourceSampler reads /proc/<pid> of the daemon of each container (the
+process named by the DAEMON of its class, or the container init) and the
+memory usage of its cgroup from the host, at a fixed interval, in a
+background thread. The samples are written to
+<config_dir>/resource_usage.csv and kept for assertions:
+
+    with ResourceSampler([g1], interval=0.5) as s:
+        e1.add_routes(routes)
+    assert s.peak(g1, 'rss') < 500 * 1024 * 1024
+"""
+
+import os
+import statistics
+import threading
+import time
+
+from lib.base import yellow
+
+
+# cpu is the share of one CPU used since the previous sample, in percent,
+# rss and cgroup_mem are in bytes.
+FIELDS = ('time', 'cpu', 'rss', 'threads', 'fds', 'goroutines', 'cgroup_mem')
+
+_CLK_TCK = os.sysconf('SC_CLK_TCK')
+
+# where procfs and cgroupfs are mounted on the host
+PROC = '/proc'
+CGROUP = '/sys/fs/cgroup'
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def _is_process(pid, name):
+    try:
+        if _read('{0}/{1}/comm'.format(PROC, pid)).strip() == name:
+            return True
+        argv = _read('{0}/{1}/cmdline'.format(PROC, pid)).split('\0')
+    except (IOError, OSError):
+        return False
+    # interpreted daemons, e.g. "python3 /usr/local/bin/exabgp ..."
+    return any(os.path.basename(a) == name for a in argv[:2])
+
+
+def find_process(root, name):
+    """
+    Returns the pid of the oldest process named name in the PID namespace
+    of root, or -1. Daemons started by "docker exec" are not descendants
+    of the container init, so the namespace is what they share.
+    """
+    try:
+        ns = os.readlink('{0}/{1}/ns/pid'.format(PROC, root))
+    except OSError:
+        return -1
+    found = []
+    for d in os.listdir(PROC):
+        if not d.isdigit():
+            continue
+        try:
+            if os.readlink('{0}/{1}/ns/pid'.format(PROC, d)) != ns:
+                continue
+            stat = _read('{0}/{1}/stat'.format(PROC, d))
+        except (IOError, OSError):
+            continue
+        if _is_process(d, name):
+            # the start time, the 22nd field of stat
+            found.append((int(stat[stat.rindex(')') + 2:].split()[19]), int(d)))
+    return min(found)[1] if found else -1
+
+
+def cgroup_memory(pid):
+    """
+    Returns the memory usage in bytes of the cgroup of pid, cgroup v2 or
+    v1, or None.
+    """
+    for line in _read('{0}/{1}/cgroup'.format(PROC, pid)).splitlines():
+        _, controllers, path = line.split(':', 2)
+        if controllers == '':
+            f = '{0}{1}/memory.current'.format(CGROUP, path)
+        elif 'memory' in controllers.split(','):
+            f = '{0}/memory{1}/memory.usage_in_bytes'.format(CGROUP, path)
+        else:
+            continue
+        if os.path.exists(f):
+            return int(_read(f))
+    return None
+
+
+def read_usage(pid):
+    """
+    Returns the cumulative CPU time in seconds and the RSS, threads and
+    open files of pid.
+    """
+    stat = _read('{0}/{1}/stat'.format(PROC, pid))
+    fields = stat[stat.rindex(')') + 2:].split()
+    # utime and stime, the 14th and 15th fields of stat
+    cpu = (int(fields[11]) + int(fields[12])) / float(_CLK_TCK)
+    usage = {'cpu_time': cpu, 'fds': len(os.listdir('{0}/{1}/fd'.format(PROC, pid)))}
+    for line in _read('{0}/{1}/status'.format(PROC, pid)).splitlines():
+        if line.startswith('VmRSS:'):
+            usage['rss'] = int(line.split()[1]) * 1024
+        elif line.startswith('Threads:'):
+            usage['threads'] = int(line.split()[1])
+    return usage
+
+
+class _Series(object):
+
+    def __init__(self, ctn, path):
+        self.ctn = ctn
+        self.pid = -1
+        self.cpu_time = None
+        self.samples = []
+        self.path = path
+        self.out = None
+
+    def open(self):
+        if not self.path:
+            return
+        # a restarted sampler appends to the series
+        self.out = open(self.path, 'a' if self.samples else 'w')
+        if not self.samples:
+            self.out.write(','.join(FIELDS) + '\n')
+
+    def _pid(self):
+        if self.pid > 0 and os.path.exists('{0}/{1}'.format(PROC, self.pid)):
+            return self.pid
+        # not started yet, or restarted
+        self.cpu_time = None
+        root = self.ctn.get_pid()
+        daemon = self.ctn.DAEMON
+        self.pid = find_process(root, daemon) if daemon and root > 0 else root
+        return self.pid
+
+    def sample(self, now, interval):
+        pid = self._pid()
+        if pid <= 0:
+            return
+        try:
+            usage = read_usage(pid)
+            mem = cgroup_memory(pid)
+        except (IOError, OSError):
+            # the process exited between the lookup and the reads
+            self.pid = -1
+            return
+        cpu = 0.0
+        if self.cpu_time is not None:
+            cpu = (usage['cpu_time'] - self.cpu_time) * 100 / interval
+        self.cpu_time = usage['cpu_time']
+        goroutines = None
+        if hasattr(self.ctn, 'goroutines'):
+            try:
+                goroutines = self.ctn.goroutines()
+            except Exception:
+                pass
+        s = {'time': now, 'cpu': cpu, 'rss': usage.get('rss'),
+             'threads': usage.get('threads'), 'fds': usage['fds'],
+             'goroutines': goroutines, 'cgroup_mem': mem}
+        self.samples.append(s)
+        if self.out:
+            self.out.write(','.join('' if s[k] is None else str(s[k]) for k in FIELDS) + '\n')
+            self.out.flush()
+
+    def close(self):
+        if self.out:
+            self.out.close()
+            self.out = None
+
+
+class ResourceSampler(object):
+
+    def __init__(self, ctns, interval=1, out_name='resource_usage.csv'):
+        self.interval = interval
+        self._series = {}
+        for ctn in ctns:
+            path = None
+            if out_name and hasattr(ctn, 'config_dir'):
+                path = '{0}/{1}'.format(ctn.config_dir, out_name)
+            self._series[ctn.name] = _Series(ctn, path)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _run(self):
+        last = time.time()
+        while True:
+            now = time.time()
+            for series in self._series.values():
+                series.sample(now, max(now - last, 1e-3))
+            last = now
+            if self._stop.wait(max(0, now + self.interval - time.time())):
+                return
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError('sampler already running')
+        self._stop.clear()
+        for series in self._series.values():
+            series.open()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        for series in self._series.values():
+            series.close()
+            if series.samples:
+                print(yellow('[{0}] {1}'.format(series.ctn.name, self.report(series.ctn))))
+
+    def series(self, ctn, key=None):
+        """
+        Returns the samples of ctn, or the (time, value) pairs of one field.
+        """
+        samples = self._series[ctn.name].samples
+        if key is None:
+            return list(samples)
+        return [(s['time'], s[key]) for s in samples if s[key] is not None]
+
+    def peak(self, ctn, key):
+        values = [v for _, v in self.series(ctn, key)]
+        if not values:
+            raise Exception('no {0} samples of {1}'.format(key, ctn.name))
+        return max(values)
+
+    def steady(self, ctn, key, since=None):
+        """
+        Returns the median of a field over the samples taken since the given
+        time, by default over the second half of the sampled period.
+        """
+        points = self.series(ctn, key)
+        if not points:
+            raise Exception('no {0} samples of {1}'.format(key, ctn.name))
+        if since is None:
+            since = (points[0][0] + points[-1][0]) / 2
+        values = [v for t, v in points if t >= since] or [points[-1][1]]
+        return statistics.median(values)
+
+    def report(self, ctn):
+        parts = []
+        for key, scale, unit in (('cpu', 1, '%'), ('rss', 1024 * 1024, 'MiB'),
+                                 ('fds', 1, ''), ('goroutines', 1, '')):
+            if not self.series(ctn, key):
+                continue
+            parts.append('{0} peak {1:.4g}{3} steady {2:.4g}{3}'.format(
+                key, self.peak(ctn, key) / float(scale),
+                self.steady(ctn, key) / float(scale), unit))
+        return ', '.join(parts)
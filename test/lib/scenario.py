@@ -0,0 +1,97 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import functools
+import itertools
+
+from lib.base import (
+    BGP_FSM_ESTABLISHED,
+    wait_for_completion,
+    yellow,
+)
+
+
+def warm_boot(topology, reset=None):
+    """
+    Decorator for the boot() of a scenario which builds a topology, named
+    topology so that the scenarios reusing this boot() can declare it as
+    their topology attribute.
+
+    When env still holds the topology built by the previous call of the
+    same boot(), reset(env) is called instead, which should bring the
+    topology back to its state right after boot and raise if it cannot.
+    The topology is only rebuilt when there is no reset or it failed.
+    """
+    def decorator(boot):
+        @functools.wraps(boot)
+        def _boot(env):
+            if reset is not None and getattr(env, 'warm_boot', None) == topology:
+                try:
+                    reset(env)
+                except Exception as e:
+                    print(yellow('failed to reset {0}, rebooting: {1}'.format(topology, e)))
+                else:
+                    print(yellow('reusing the topology of {0}'.format(topology)))
+                    return
+            env.warm_boot = None
+            boot(env)
+            env.warm_boot = topology
+        _boot.topology = topology
+        return _boot
+    return decorator
+
+
+def boot_signature(scenario):
+    """
+    Returns the topology a scenario runs on: its topology attribute, which
+    scenarios reusing the boot() of another one declare, then the one given
+    to the warm_boot() of its boot(), then the name of the scenario.
+    """
+    topology = getattr(scenario, 'topology', None)
+    if topology is None:
+        topology = getattr(scenario.boot, 'topology', scenario.__name__)
+    return topology
+
+
+def order_by_boot(scenarios):
+    """
+    Returns scenarios reordered so that the ones sharing a topology run
+    one after another, keeping the original order otherwise.
+    """
+    groups = collections.OrderedDict()
+    for s in scenarios:
+        groups.setdefault(boot_signature(s), []).append(s)
+    return list(itertools.chain.from_iterable(groups.values()))
+
+
+def reset_route_server(env):
+    """
+    Brings g1, e1, q1 and q2 of the route server policy tests back to
+    their state right after boot: no policies on g1 and no routes anywhere.
+    """
+    g1 = env.g1
+    e1 = env.e1
+    e1.del_routes([(prefix, p['identifier'])
+                   for prefix, paths in e1.routes.items() for p in paths])
+    g1.reset_policy()
+    for c in [e1, env.q1, env.q2]:
+        g1.wait_for(BGP_FSM_ESTABLISHED, c, timeout=30)
+        g1.softreset(c, type='in')
+    for rf in ['ipv4', 'ipv6']:
+        wait_for_completion(lambda: g1.count_global_rib(rf=rf), timeout=30, expected=0)
+        for q in [env.q1, env.q2]:
+            wait_for_completion(lambda: g1.count_local_rib(q, rf=rf), timeout=30, expected=0)
+            wait_for_completion(lambda: len(q.get_global_rib(rf=rf)) == 0, timeout=30)
@@ -0,0 +1,518 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-process BGP speaker standing in for a peer container.
+
+BGPSpeaker implements the BGPContainer interface with asyncio sessions
+running in one background thread of the test process, so that many
+speakers (hundreds of route server clients) cost no container, no daemon
+and no CLI round trip. It connects to its peers from an address added
+to a bridge on the host, announces its routes, and keeps what it
+receives in an adj-RIB-in indexed by family, prefix and path identifier.
+
+    br01 = Bridge(name='br01', subnet='192.168.10.0/24')
+    br01.addif(g1)
+    s1 = BGPSpeaker(name='s1', asn=65001, router_id='192.168.0.2')
+    s1.attach(br01)
+    g1.add_peer(s1, is_rs_client=True)
+    s1.add_peer(g1)
+    s1.run()
+    s1.add_routes('10.{0}.{1}.0/24'.format(i // 256, i % 256) for i in range(65536))
+"""
+
+import asyncio
+import ipaddress
+import socket
+import struct
+import threading
+import time
+
+from lib import bgp_message as bm
+from lib.base import (
+    BGPContainer,
+    BGP_FSM_IDLE,
+    BGP_FSM_ACTIVE,
+    BGP_FSM_ESTABLISHED,
+    WaitEvent,
+    community_str,
+    local,
+    yellow,
+)
+
+
+BGP_PORT = 179
+HOLD_TIME = 90
+CONNECT_RETRY = 1
+
+FAMILIES = bm.FAMILIES
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def event_loop():
+    """
+    Returns the event loop of the speakers, started on first use in a
+    daemon thread.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            t = threading.Thread(target=_loop.run_forever, name='bgp-speakers')
+            t.daemon = True
+            t.start()
+        return _loop
+
+
+def _call(f, *args):
+    # Runs f in the loop thread, where all the session state lives
+    async def _f():
+        return f(*args)
+    return asyncio.run_coroutine_threadsafe(_f(), event_loop()).result()
+
+
+class _Session(object):
+    """
+    One BGP session to a peer, run by the event loop: connects, exchanges
+    OPEN messages, announces the routes of the speaker and keeps the
+    received ones, and reconnects after CONNECT_RETRY when it fails.
+    """
+
+    def __init__(self, speaker, peer, info):
+        self.speaker = speaker
+        self.peer = peer
+        self.remote_addr = info['neigh_addr'].split('/')[0]
+        self.local_addr = info['local_addr'].split('/')[0]
+        self.remote_as = info['remote_as'] or peer.asn
+        self.local_as = info['local_as'] or speaker.asn
+        self.four_octet_as = not info['as2']
+        self.addpath = bool(info['addpath'])
+        self.state = BGP_FSM_IDLE
+        # rf -> {prefix: {path identifier: attributes}}
+        self.adj_rib_in = {rf: {} for rf in FAMILIES}
+        self.send_path_id = set()
+        self.recv_path_id = set()
+        self.max_len = bm.MAX_LEN
+        self.writer = None
+        self.closed = False
+        # the last error which reset the session
+        self.error = None
+        self.task = asyncio.ensure_future(self._run())
+
+    def ebgp(self):
+        return self.remote_as != self.local_as
+
+    async def _run(self):
+        while not self.closed:
+            try:
+                await self._connect()
+            except Exception as e:
+                # whatever went wrong, e.g. an UPDATE the decoder chokes
+                # on, only resets this session
+                self.error = e
+                print(yellow('[{0}] session to {1}: {2!r}'.format(
+                    self.speaker.name, self.remote_addr, e)))
+            finally:
+                self._reset()
+            if not self.closed:
+                await asyncio.sleep(CONNECT_RETRY)
+
+    def _reset(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.state == BGP_FSM_ESTABLISHED:
+            self.adj_rib_in = {rf: {} for rf in FAMILIES}
+            self.speaker.event.notify()
+        self.state = BGP_FSM_IDLE
+        self.max_len = bm.MAX_LEN
+
+    async def _connect(self):
+        self.state = BGP_FSM_ACTIVE
+        reader, self.writer = await asyncio.open_connection(
+            self.remote_addr, BGP_PORT, local_addr=(self.local_addr, 0))
+        sock = self.writer.get_extra_info('socket')
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.writer.write(self._open())
+        typ, body = await self._read(reader)
+        if typ != bm.OPEN:
+            raise ValueError('expected OPEN, got message type {0}'.format(typ))
+        hold_time = self._parse_open(body)
+        self.writer.write(bm.keepalive())
+        keepalive = None
+        if hold_time:
+            keepalive = asyncio.ensure_future(self._keepalive(hold_time / 3.0))
+        try:
+            while True:
+                typ, body = await asyncio.wait_for(self._read(reader), hold_time or None)
+                if typ == bm.KEEPALIVE and self.state != BGP_FSM_ESTABLISHED:
+                    self.state = BGP_FSM_ESTABLISHED
+                    self.speaker.event.notify()
+                    await self._announce_all()
+                elif typ == bm.UPDATE:
+                    self._update(body)
+                elif typ == bm.NOTIFICATION:
+                    raise ValueError('NOTIFICATION {0}/{1}'.format(body[0], body[1]))
+        except asyncio.TimeoutError:
+            raise ValueError('hold timer expired')
+        finally:
+            if keepalive is not None:
+                keepalive.cancel()
+
+    async def _read(self, reader):
+        header = await reader.readexactly(bm.HEADER_LEN)
+        length, typ = struct.unpack('!HB', header[16:])
+        return typ, await reader.readexactly(length - bm.HEADER_LEN)
+
+    async def _keepalive(self, interval):
+        while self.writer is not None:
+            await asyncio.sleep(interval)
+            if self.writer is not None:
+                self.writer.write(bm.keepalive())
+
+    def _open(self):
+        caps = [bm.cap_multiprotocol(afi, safi) for afi, safi in FAMILIES.values()]
+        caps += [bm.cap_route_refresh(), bm.cap_extended_message()]
+        if self.four_octet_as:
+            caps.append(bm.cap_four_octet_as(self.local_as))
+        if self.addpath:
+            caps.append(bm.cap_add_path([(afi, safi, bm.ADD_PATH_BOTH)
+                                         for afi, safi in FAMILIES.values()]))
+        return bm.open_message(self.local_as, HOLD_TIME, self.speaker.router_id, caps)
+
+    def _parse_open(self, body):
+        msg = bm.decode_open(body)
+        if self.addpath:
+            for (afi, safi), mode in msg['add_path'].items():
+                rf = bm.RF.get((afi, safi))
+                # the peer can receive or send them
+                if rf and mode & bm.ADD_PATH_RECEIVE:
+                    self.send_path_id.add(rf)
+                if rf and mode & bm.ADD_PATH_SEND:
+                    self.recv_path_id.add(rf)
+        self.four_octet_as = self.four_octet_as and msg['four_octet_as'] is not None
+        if msg['extended_message']:
+            self.max_len = bm.EXTENDED_MAX_LEN
+        return min(msg['hold_time'], HOLD_TIME)
+
+    def _update(self, body):
+        msg = bm.decode_update(body, self.four_octet_as, self.recv_path_id)
+        a = msg['attributes']
+        attrs = {'aspath': a['aspath'], 'origin': a['origin'], 'nexthop': a['nexthop'],
+                 'med': a['med'], 'local-pref': a['local-pref'], 'community': None}
+        if a['community'] is not None:
+            attrs['community'] = [community_str(c) for c in a['community']]
+
+        for prefix, path_id in msg['withdrawn']:
+            self._withdraw('ipv4', prefix, path_id)
+        for rf, prefixes in msg['mp_unreach']:
+            for prefix, path_id in prefixes:
+                self._withdraw(rf, prefix, path_id)
+        for prefix, path_id in msg['nlri']:
+            self.adj_rib_in['ipv4'].setdefault(prefix, {})[path_id] = attrs
+        for rf, nexthop, prefixes in msg['mp_reach']:
+            # the attributes are shared by all the prefixes of an UPDATE
+            mp_attrs = dict(attrs, nexthop=nexthop)
+            for prefix, path_id in prefixes:
+                self.adj_rib_in[rf].setdefault(prefix, {})[path_id] = mp_attrs
+        self.speaker.event.notify()
+
+    def _withdraw(self, rf, prefix, path_id):
+        paths = self.adj_rib_in[rf].get(prefix)
+        if paths is not None:
+            paths.pop(path_id, None)
+            if not paths:
+                del self.adj_rib_in[rf][prefix]
+
+    def _path_attrs(self, path, rf):
+        aspath = path['as-path']
+        if aspath is None:
+            aspath = [self.local_as] if self.ebgp() else []
+        return bm.path_attributes(
+            as_path=aspath,
+            next_hop=(path['next-hop'] or self.local_addr) if rf == 'ipv4' else None,
+            med=path['med'],
+            local_pref=None if self.ebgp() else path['local-pref'],
+            communities=path['community'],
+            four_octet_as=self.four_octet_as)
+
+    def _updates(self, paths, withdraw=False):
+        """
+        Returns the UPDATE messages announcing (or withdrawing) paths, with
+        the prefixes sharing the attributes of their path packed together.
+        """
+        groups = {}
+        for p in paths:
+            rf = p['rf']
+            key = (rf, None if withdraw else self._path_attrs(p, rf),
+                   None if withdraw or rf == 'ipv4' else p['next-hop'])
+            _, value, length = bm.parse_prefix(p['prefix'])
+            path_id = (p['identifier'] or 0) if rf in self.send_path_id else None
+            groups.setdefault(key, []).append((value, length, path_id))
+
+        msgs = []
+        for (rf, attrs, nexthop), prefixes in groups.items():
+            afi, safi = FAMILIES[rf]
+            values, lengths, path_ids = zip(*prefixes)
+            records = bm.nlri_records(values, lengths, afi,
+                                      path_ids if rf in self.send_path_id else None)
+            msgs += bm.updates(records, afi, safi, attributes=attrs or b'',
+                               next_hop=nexthop or '::ffff:{0}'.format(self.local_addr),
+                               withdraw=withdraw, max_len=self.max_len)
+        return msgs
+
+    async def write(self, msgs):
+        if self.state != BGP_FSM_ESTABLISHED:
+            return 0
+        for msg in msgs:
+            self.writer.write(msg)
+            if self.writer.transport.get_write_buffer_size() > 1 << 20:
+                await self.writer.drain()
+        await self.writer.drain()
+        return len(msgs)
+
+    async def send(self, paths, withdraw=False):
+        if self.state != BGP_FSM_ESTABLISHED:
+            return 0
+        await self.write(self._updates(paths, withdraw=withdraw))
+        return len(paths)
+
+    async def _announce_all(self):
+        # routes may be added by the test thread meanwhile
+        paths = [p for ps in list(self.speaker.routes.values()) for p in list(ps)]
+        await self.send(paths)
+
+    def close(self):
+        self.closed = True
+        self.task.cancel()
+        self._reset()
+
+
+class BGPSpeaker(BGPContainer):
+    """
+    BGPContainer whose BGP sessions are run by the test process itself.
+
+    It supports the IPv4 and IPv6 unicast families, 4-octet AS and
+    add-path. Peers are configured with add_peer() as usual, after the
+    speaker has been given an address with attach(); the speaker always
+    opens the connections itself.
+    """
+
+    DAEMON = None
+
+    def __init__(self, name, asn, router_id):
+        super(BGPSpeaker, self).__init__(name, asn, router_id, None)
+        self.event = WaitEvent()
+        self._sessions = {}
+
+    def attach(self, bridge, ip_addr=''):
+        """
+        Adds an address of bridge to its interface on the host, to connect
+        to the peers on that bridge from.
+        """
+        addr = ip_addr or bridge.host_ip_address()
+        local('ip addr add {0} dev {1}'.format(addr, bridge.host_device()))
+        version = ipaddress.ip_interface(addr).version
+        self.eths.append(bridge.host_device())
+        if version == 4:
+            self.ip_addrs.append((bridge.host_device(), addr, bridge.name))
+        else:
+            self.ip6_addrs.append((bridge.host_device(), addr, bridge.name))
+
+    def run(self):
+        self.is_running = True
+        self.reload_config()
+        return 0
+
+    def stop(self):
+        _call(self._close_sessions, list(self._sessions))
+        self.is_running = False
+
+    def remove(self):
+        if self.is_running:
+            self.stop()
+        for dev, addr, _ in self.ip_addrs + self.ip6_addrs:
+            local('ip addr del {0} dev {1}; true'.format(addr, dev))
+        self.ip_addrs = []
+        self.ip6_addrs = []
+
+    def local(self, cmd, capture=False, stream=False, detach=False, tty=True):
+        raise Exception('{0} is not a container'.format(self.name))
+
+    def get_pid(self):
+        return -1
+
+    def create_config(self):
+        pass
+
+    def _close_sessions(self, peers):
+        for peer in peers:
+            self._sessions.pop(peer).close()
+
+    def _sync_sessions(self):
+        self._close_sessions([p for p in self._sessions if p not in self.peers])
+        for peer, info in self.peers.items():
+            if peer not in self._sessions:
+                self._sessions[peer] = _Session(self, peer, info)
+
+    def reload_config(self):
+        if self.is_running:
+            _call(self._sync_sessions)
+
+    def _session(self, peer):
+        if peer not in self._sessions:
+            raise Exception('not found peer {0}'.format(peer.router_id))
+        return self._sessions[peer]
+
+    def get_neighbor_state(self, peer):
+        return self._session(peer).state
+
+    def negotiated(self, peer):
+        """
+        Returns what the session to peer uses: 'four_octet_as', 'add_path'
+        (the families sent with path identifiers) and 'max_len'.
+        """
+        s = self._session(peer)
+        return _call(lambda: {'four_octet_as': s.four_octet_as,
+                              'add_path': set(s.send_path_id),
+                              'max_len': s.max_len})
+
+    def send_messages(self, msgs, peer):
+        """
+        Writes encoded BGP messages to the session to peer as they are, and
+        returns how many were written: none when the session is not
+        established.
+        """
+        s = self._session(peer)
+        return asyncio.run_coroutine_threadsafe(s.write(msgs), event_loop()).result()
+
+    def disable_peer(self, peer):
+        _call(self._close_sessions, [peer])
+
+    def enable_peer(self, peer):
+        self.reload_config()
+
+    def _send(self, paths, peer=None, withdraw=False):
+        sessions = [self._session(peer)] if peer else list(self._sessions.values())
+
+        async def _f():
+            for s in sessions:
+                await s.send(paths, withdraw=withdraw)
+        start = time.time()
+        asyncio.run_coroutine_threadsafe(_f(), event_loop()).result()
+        return time.time() - start
+
+    def _new_path(self, r, rf):
+        if not isinstance(r, dict):
+            r = {'prefix': r}
+        if rf not in FAMILIES:
+            raise ValueError('unsupported route family: {0}'.format(rf))
+        return {
+            'prefix': r['prefix'],
+            'rf': rf,
+            'attr': None,
+            'next-hop': r.get('next-hop'),
+            'as-path': r.get('as-path'),
+            'community': r.get('community'),
+            'med': r.get('med'),
+            'local-pref': r.get('local-pref'),
+            'extended-community': None,
+            'identifier': r.get('identifier'),
+            'matchs': None,
+            'thens': None,
+        }
+
+    def add_route(self, route, rf='ipv4', attribute=None, aspath=None,
+                  community=None, med=None, extendedcommunity=None,
+                  nexthop=None, matchs=None, thens=None,
+                  local_pref=None, identifier=None, reload_config=True):
+        if attribute or extendedcommunity or matchs or thens:
+            raise ValueError('{0} only supports the unicast path attributes'.format(self.name))
+        path = self._new_path({'prefix': route, 'next-hop': nexthop, 'as-path': aspath,
+                               'community': community, 'med': med,
+                               'local-pref': local_pref, 'identifier': identifier}, rf)
+        self.routes.setdefault(route, []).append(path)
+        if self.is_running:
+            self._send([path])
+
+    def del_route(self, route, identifier=None, reload_config=True):
+        paths = [p for p in self.routes.get(route, []) if p['identifier'] == identifier]
+        if not paths:
+            return
+        self.routes[route] = [p for p in self.routes[route] if p['identifier'] != identifier]
+        if self.is_running:
+            self._send(paths, withdraw=True)
+
+    def add_routes(self, routes, rf='ipv4', peer=None):
+        """
+        Announces many routes at once and returns the achieved
+        updates/second. Each element of routes is either a prefix or a
+        dict holding 'prefix' and any of 'next-hop', 'as-path',
+        'community', 'med', 'local-pref' and 'identifier'; the prefixes
+        sharing attributes are packed into the same UPDATE messages.
+        """
+        paths = [self._new_path(r, rf) for r in routes]
+        for path in paths:
+            self.routes.setdefault(path['prefix'], []).append(path)
+        elapsed = self._send(paths, peer=peer)
+        return len(paths) / elapsed if elapsed > 0 else float(len(paths))
+
+    def del_routes(self, routes, peer=None):
+        """
+        Withdraws many routes previously added. Each element of routes is
+        either a prefix or a (prefix, identifier) tuple.
+        """
+        paths = []
+        for r in routes:
+            route, identifier = r if isinstance(r, tuple) else (r, None)
+            for p in self.routes.get(route, []):
+                if p['identifier'] == identifier:
+                    paths.append(p)
+            if route in self.routes:
+                self.routes[route] = [p for p in self.routes[route] if p['identifier'] != identifier]
+        if paths:
+            self._send(paths, peer=peer, withdraw=True)
+
+    def _adj_rib_in(self, peer, rf, prefix):
+        rib = self._session(peer).adj_rib_in[rf]
+        if prefix:
+            return {prefix: dict(rib[prefix])} if prefix in rib else {}
+        return {p: dict(paths) for p, paths in rib.items()}
+
+    def get_adj_rib_in(self, peer, prefix='', rf='ipv4', add_path_enabled=False):
+        """
+        Returns the paths received from peer, in the format of
+        GoBGPContainer.get_adj_rib_in().
+        """
+        rib = _call(self._adj_rib_in, peer, rf, prefix)
+        ret = []
+        for p, paths in rib.items():
+            for path_id, attrs in paths.items():
+                path = dict(attrs, prefix=p, identifier=path_id)
+                if not add_path_enabled:
+                    ret.append(path)
+                    break
+                ret.append(path)
+        return ret
+
+    def count_adj_rib_in(self, peer, rf='ipv4'):
+        """
+        Returns the number of paths received from peer, without copying
+        them; wait_for_completion() can be woken up by self.event.
+        """
+        return _call(lambda: sum(len(paths) for paths in self._session(peer).adj_rib_in[rf].values()))
@@ -0,0 +1,256 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    wait,
+)
+
+import toml
+import yaml
+
+from lib.base import (
+    Bridge,
+    get_bridges,
+    get_containers,
+    yellow,
+)
+from lib.exabgp import ExaBGPContainer
+from lib.gobgp import GoBGPContainer
+from lib.quagga import QuaggaBGPContainer
+
+
+# Example (YAML):
+#
+# bridges:
+#   br01:
+#     subnet: 192.168.10.0/24
+# routers:
+#   g1:
+#     type: gobgp
+#     asn: 65000
+#     router-id: 192.168.0.1
+#     bridges: [br01]
+#   q1:
+#     type: quagga
+#     asn: 65001
+#     router-id: 192.168.0.2
+#     bridges:
+#       - {bridge: br01, ip: 192.168.10.10/24}
+#     routes: [10.0.1.0/24]
+# peers:
+#   g1:
+#     q1: {is_rs_client: true, passive: true}
+#   q1:
+#     g1: {}
+#
+# "options" of a router are passed to the constructor of its container
+# class, the options of "peers" to add_peer() and the dicts of "routes" to
+# add_route(), which takes the prefix as "route".
+ROUTER_TYPES = {
+    'gobgp': GoBGPContainer,
+    'quagga': QuaggaBGPContainer,
+    'exabgp': ExaBGPContainer,
+}
+
+
+def load_topology(path, defaults=None):
+    """
+    Reads a topology file, YAML or TOML by its extension, and returns a
+    Topology built from it.
+    """
+    with open(path) as f:
+        if path.endswith('.toml'):
+            spec = toml.load(f)
+        elif path.endswith('.yaml') or path.endswith('.yml'):
+            spec = yaml.safe_load(f)
+        else:
+            raise ValueError('unknown topology format: {0}'.format(path))
+    return Topology(spec, defaults=defaults)
+
+
+def run_graph(tasks, max_workers=16):
+    """
+    Runs tasks = {key: (function, set of keys it depends on)} on a thread
+    pool, each one as soon as all its dependencies have completed.
+
+    Errors are collected and raised together once the running tasks have
+    finished; the tasks depending on a failed one are not started.
+    """
+    pending = dict(tasks)
+    for key, (_, deps) in pending.items():
+        unknown = deps - set(pending)
+        if unknown:
+            raise ValueError('{0} depends on unknown tasks {1}'.format(key, sorted(unknown)))
+
+    done = set()
+    running = {}
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            if not errors:
+                for key in [k for k, (_, deps) in pending.items() if deps <= done]:
+                    f, _ = pending.pop(key)
+                    running[executor.submit(f)] = key
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                key = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append('{0}: {1}'.format(key, e))
+                else:
+                    done.add(key)
+
+    if errors:
+        raise Exception('failed to set up topology: {0}'.format(', '.join(errors)))
+    if pending:
+        raise Exception('dependency cycle among {0}'.format(sorted(pending)))
+
+
+class Topology(object):
+    """
+    Bridges, routers and BGP sessions described by a topology file.
+
+    start() brings the whole topology up, with independent networks and
+    containers handled concurrently. GoBGP and ExaBGP routers are booted
+    with their config rendered once, after all their peers are known;
+    Quagga, whose daemons start with the container, boots with a config
+    without peers and reloads it. destroy() removes it again in parallel.
+    """
+
+    def __init__(self, spec, defaults=None):
+        self.spec = spec
+        # Per router type constructor arguments, e.g.
+        # {'gobgp': {'ctn_image_name': parser_option.gobgp_image}}
+        self.defaults = defaults or {}
+        self.bridges = {}
+        self.routers = {}
+
+        bridges = spec.get('bridges', {})
+        routers = spec.get('routers', {})
+        for name, r in routers.items():
+            if r.get('type') not in ROUTER_TYPES:
+                raise ValueError('{0}: unknown router type {1}'.format(name, r.get('type')))
+            for b in self._attachments(r):
+                if b['bridge'] not in bridges:
+                    raise ValueError('{0}: unknown bridge {1}'.format(name, b['bridge']))
+        for name, peers in spec.get('peers', {}).items():
+            for peer in [name] + list(peers):
+                if peer not in routers:
+                    raise ValueError('unknown router {0} in peers'.format(peer))
+
+    @staticmethod
+    def _attachments(router):
+        return [b if isinstance(b, dict) else {'bridge': b}
+                for b in router.get('bridges', [])]
+
+    def __getitem__(self, name):
+        return self.routers[name]
+
+    def _new_bridge(self, name):
+        b = self.spec['bridges'][name]
+        self.bridges[name] = Bridge(name=name, subnet=b.get('subnet', ''),
+                                    with_ip=b.get('with-ip', True),
+                                    self_ip=b.get('self-ip', False))
+
+    def _new_router(self, name):
+        r = self.spec['routers'][name]
+        kwargs = dict(self.defaults.get(r['type'], {}))
+        kwargs.update(r.get('options', {}))
+        if 'image' in r:
+            kwargs['ctn_image_name'] = r['image']
+        self.routers[name] = ROUTER_TYPES[r['type']](
+            name=name, asn=r['asn'], router_id=r['router-id'], **kwargs)
+
+    def _run_router(self, name):
+        ctn = self.routers[name]
+        # The config of the routers whose daemon the harness starts is
+        # rendered once their peers are known, see _configure_router().
+        time.sleep(ctn.run(boot=False) if hasattr(ctn, 'boot') else ctn.run())
+
+    def _attach_router(self, name):
+        # The interfaces of a container are numbered in attachment order,
+        # so they are attached one by one.
+        ctn = self.routers[name]
+        for b in self._attachments(self.spec['routers'][name]):
+            self.bridges[b['bridge']].addif(ctn, ip_addr=b.get('ip', ''))
+
+    def _configure_router(self, name):
+        ctn = self.routers[name]
+        for peer, options in self.spec.get('peers', {}).get(name, {}).items():
+            ctn.add_peer(self.routers[peer], reload_config=False, **(options or {}))
+        if hasattr(ctn, 'boot'):
+            ctn.create_config()
+            time.sleep(ctn.boot())
+        elif ctn.peers:
+            # Quagga starts with its container, so it reloads the config
+            ctn.create_config()
+            ctn.reload_config()
+        for route in self.spec['routers'][name].get('routes', []):
+            if not isinstance(route, dict):
+                route = {'route': route}
+            ctn.add_route(**route)
+
+    def graph(self):
+        """
+        Returns the bring-up tasks as {key: (function, dependencies)}.
+
+        A router is attached to its bridges once both exist and it runs,
+        and is configured once it and all its peers are attached, because
+        the peer addresses are only known then.
+        """
+        tasks = {}
+        for name in self.spec.get('bridges', {}):
+            tasks['bridge:' + name] = (lambda n=name: self._new_bridge(n), set())
+
+        peers = {}
+        for name, ps in self.spec.get('peers', {}).items():
+            for peer in ps:
+                peers.setdefault(name, set()).add(peer)
+                peers.setdefault(peer, set()).add(name)
+
+        for name, r in self.spec.get('routers', {}).items():
+            tasks['router:' + name] = (lambda n=name: self._new_router(n), set())
+            tasks['run:' + name] = (lambda n=name: self._run_router(n), {'router:' + name})
+            deps = {'run:' + name} | set('bridge:' + b['bridge'] for b in self._attachments(r))
+            tasks['attach:' + name] = (lambda n=name: self._attach_router(n), deps)
+            deps = set('attach:' + n for n in peers.get(name, set()) | {name})
+            tasks['configure:' + name] = (lambda n=name: self._configure_router(n), deps)
+        return tasks
+
+    def start(self, max_workers=16):
+        print(yellow('bringing up topology: {0} bridges, {1} routers'.format(
+            len(self.spec.get('bridges', {})), len(self.spec.get('routers', {})))))
+        run_graph(self.graph(), max_workers=max_workers)
+        return self
+
+    def destroy(self, max_workers=16):
+        """
+        Removes the containers, then the networks, of this topology which
+        still exist.
+        """
+        ctns = get_containers()
+        nets = get_bridges()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(lambda c: c.remove(),
+                              [c for c in self.routers.values() if c.docker_name() in ctns]))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(lambda b: b.delete(),
+                              [b for b in self.bridges.values() if b.name in nets]))
@@ -0,0 +1,134 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Timeline tracing of the test harness.
+
+When enabled (--trace-dir), spans of host commands, container commands,
+container boots, config reloads and waits are recorded and written as a
+Chrome trace-event JSON file, which chrome://tracing or Perfetto can
+open, together with a summary of the top time sinks.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+
+_enabled = False
+_events = []
+_threads = {}
+_lock = threading.Lock()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def enabled():
+    return _enabled
+
+
+@contextlib.contextmanager
+def span(name, cat, **args):
+    """
+    Records the enclosed block as a complete event. The yielded args dict
+    can be updated to attach results to the event.
+    """
+    if not _enabled:
+        yield args
+        return
+    start = time.time()
+    try:
+        yield args
+    finally:
+        end = time.time()
+        t = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': cat,
+            'ph': 'X',
+            'ts': int(start * 1e6),
+            'dur': int((end - start) * 1e6),
+            'pid': os.getpid(),
+            'tid': t.ident,
+            'args': args,
+        }
+        with _lock:
+            _threads.setdefault(t.ident, t.name)
+            _events.append(event)
+
+
+def traced(f):
+    """
+    Decorator recording the calls of a Container method as spans named
+    <class>.<method>, with the container name as argument.
+    """
+    name = f.__qualname__
+
+    @functools.wraps(f)
+    def _f(self, *args, **kwargs):
+        if not _enabled:
+            return f(self, *args, **kwargs)
+        with span(name, 'container', container=self.name):
+            return f(self, *args, **kwargs)
+    _f.traced = True
+    return _f
+
+
+def summary(top=20):
+    """
+    Returns the spans aggregated by name, sorted by their total duration.
+    Durations are inclusive, so nested spans are counted in their parents
+    too.
+    """
+    stats = {}
+    with _lock:
+        events = list(_events)
+    for e in events:
+        s = stats.setdefault((e['cat'], e['name']), [0, 0, 0])
+        s[0] += 1
+        s[1] += e['dur']
+        s[2] = max(s[2], e['dur'])
+    rows = sorted(stats.items(), key=lambda kv: kv[1][1], reverse=True)[:top]
+    lines = ['{0:>10} {1:>7} {2:>10} {3:>10}  {4}'.format(
+        'total(s)', 'count', 'avg(ms)', 'max(ms)', 'span')]
+    for (cat, name), (count, total, longest) in rows:
+        lines.append('{0:>10.2f} {1:>7} {2:>10.1f} {3:>10.1f}  {4}: {5}'.format(
+            total / 1e6, count, total / 1e3 / count, longest / 1e3, cat, name))
+    return '\n'.join(lines)
+
+
+def dump(path):
+    """
+    Writes the trace to path and the summary next to it, and returns the
+    summary.
+    """
+    with _lock:
+        events = list(_events)
+        threads = dict(_threads)
+    pid = os.getpid()
+    meta = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+             'args': {'name': name}} for tid, name in threads.items()]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': meta + events, 'displayTimeUnit': 'ms'}, f)
+    s = summary()
+    with open('{0}.summary.txt'.format(os.path.splitext(path)[0]), 'w') as f:
+        f.write(s + '\n')
+    return s
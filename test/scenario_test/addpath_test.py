@@ -49,7 +49,7 @@ class GoBGPTestBase(unittest.TestCase):
         e1 = ExaBGPContainer(name='e1', asn=65000, router_id='192.168.0.4')
 
         ctns = [g1, g2, g3, e1]
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
 
         time.sleep(initial_wait_time)
 
@@ -48,7 +48,7 @@ class GoBGPTestBase(unittest.TestCase):
                             log_level=parser_option.gobgp_log_level)
         ctns = [g1, g2, q1]
 
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
 
         time.sleep(initial_wait_time)
 
@@ -116,7 +116,7 @@ class GoBGPTestBase(unittest.TestCase):
         g4 = GoBGPContainer(name='g4', asn=200, router_id='192.168.0.5',
                             ctn_image_name=parser_option.gobgp_image,
                             log_level=parser_option.gobgp_log_level)
-        time.sleep(max(ctn.run() for ctn in [g3, g4]))
+        time.sleep(base.run_containers([g3, g4]))
 
         self.ctns['g3'] = g3
         self.ctns['g4'] = g4
@@ -72,7 +72,7 @@ class GoBGPTestBase(unittest.TestCase):
 
         ctns = [g1, q1, q2, q3, q11, q12, q22]
 
-        cls.initial_wait_time = max(ctn.run() for ctn in ctns)
+        cls.initial_wait_time = base.run_containers(ctns)
 
         time.sleep(cls.initial_wait_time)
 
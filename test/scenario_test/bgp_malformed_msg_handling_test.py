@@ -41,7 +41,7 @@ class GoBGPTestBase(unittest.TestCase):
         e1 = ExaBGPContainer(name='e1', asn=65001, router_id='192.168.0.2')
 
         ctns = [g1, e1]
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
         time.sleep(initial_wait_time)
 
         g1.add_peer(e1, treat_as_withdraw=True)
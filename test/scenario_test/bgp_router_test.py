@@ -59,7 +59,7 @@ class GoBGPTestBase(unittest.TestCase):
         qs = [q1, q2, q3]
         ctns = [g1, q1, q2, q3]
 
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
         time.sleep(initial_wait_time)
 
         for q in qs:
@@ -436,7 +436,7 @@ class GoBGPTestBase(unittest.TestCase):
                             ctn_image_name=gobgp_ctn_image_name,
                             log_level=parser_option.gobgp_log_level)
 
-        initial_wait_time = max(ctn.run() for ctn in [g3, g4])
+        initial_wait_time = base.run_containers([g3, g4])
         time.sleep(initial_wait_time)
 
         self.quaggas = {'g3': g3, 'g4': g4}
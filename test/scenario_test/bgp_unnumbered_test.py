@@ -41,7 +41,7 @@ class GoBGPTestBase(unittest.TestCase):
                             log_level=parser_option.gobgp_log_level)
         ctns = [g1, g2]
 
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
 
         time.sleep(initial_wait_time + 2)
 
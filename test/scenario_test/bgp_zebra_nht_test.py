@@ -125,7 +125,7 @@ class ZebraNHTTest(unittest.TestCase):
                 },
             })
 
-        wait_time = max(ctn.run() for ctn in [cls.r1, cls.r2, cls.r3, cls.r4])
+        wait_time = base.run_containers([cls.r1, cls.r2, cls.r3, cls.r4])
         time.sleep(wait_time)
 
         cls.br_r1_r2 = Bridge(name='br_r1_r2', subnet='192.168.12.0/24')
@@ -114,7 +114,7 @@ class GoBGPTestBase(unittest.TestCase):
         o1 = self.others['ipv4'][0]
         o2 = self.others['ipv4'][1]
         # start up containers of ipv4 environment
-        initial_wait_time = max(ctn.run() for ctn in self.ctns['ipv4'])
+        initial_wait_time = base.run_containers(self.ctns['ipv4'])
         time.sleep(initial_wait_time)
 
         # make ipv4 bridge and set ip to each container
@@ -163,7 +163,7 @@ class GoBGPTestBase(unittest.TestCase):
         o1 = self.others['ipv6'][0]
         o2 = self.others['ipv6'][1]
         # start up containers of ipv6 environment
-        initial_wait_time = max(ctn.run() for ctn in self.ctns['ipv6'])
+        initial_wait_time = base.run_containers(self.ctns['ipv6'])
         time.sleep(initial_wait_time)
 
         # make ipv6 bridge and set ip to each container
@@ -220,7 +220,7 @@ class GoBGPTestBase(unittest.TestCase):
         for ctn in ctns:
             self.ctns[ctn.name] = ctn
 
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
 
         time.sleep(initial_wait_time)
 
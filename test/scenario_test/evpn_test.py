@@ -60,7 +60,7 @@ class GoBGPTestBase(unittest.TestCase):
                             log_level=parser_option.gobgp_log_level)
         ctns = [g1, g2]
 
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
 
         time.sleep(initial_wait_time)
         g1.local("gobgp vrf add vrf1 rd 10:10 rt both 10:10")
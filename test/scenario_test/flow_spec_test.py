@@ -60,7 +60,7 @@ class FlowSpecTest(unittest.TestCase):
         cls.y1 = YABGPContainer(name='y1', asn=65000, router_id='192.168.0.3')
 
         ctns = [cls.g1, cls.e1, cls.y1]
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
         time.sleep(initial_wait_time)
 
         # Add FlowSpec routes into GoBGP.
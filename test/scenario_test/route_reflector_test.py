@@ -23,24 +23,15 @@ import nose
 from lib.noseplugin import OptionParser, parser_option
 
 from lib import base
-from lib.base import BGP_FSM_ESTABLISHED, local
+from lib.base import (
+    BGP_FSM_ESTABLISHED,
+    local,
+    wait_for_completion,
+)
 from lib.gobgp import GoBGPContainer
 from lib.quagga import QuaggaBGPContainer
 
 
-def wait_for(f, timeout=120):
-    interval = 1
-    count = 0
-    while True:
-        if f():
-            return
-
-        time.sleep(interval)
-        count += interval
-        if count >= timeout:
-            raise Exception('timeout')
-
-
 class GoBGPTestBase(unittest.TestCase):
     def assert_adv_count(self, src, dst, rf, count):
         self.assertEqual(count, len(src.get_adj_rib_out(dst, rf=rf)))
@@ -67,7 +58,7 @@ class GoBGPTestBase(unittest.TestCase):
         qs = [q1, q2, q3, q4]
         ctns = [g1, q1, q2, q3, q4]
 
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
         time.sleep(initial_wait_time)
 
         # g1 as a route reflector
@@ -107,7 +98,7 @@ class GoBGPTestBase(unittest.TestCase):
                         routes.remove(p)
 
                 return len(routes) == 0
-            wait_for(f)
+            wait_for_completion(f)
 
     def test_03_check_gobgp_adj_rib_out(self):
         for q in self.quaggas.values():
@@ -157,7 +148,7 @@ class GoBGPTestBase(unittest.TestCase):
                                  ctn_image_name=gobgp_ctn_image_name,
                                  log_level=parser_option.gobgp_log_level)
 
-        time.sleep(max(ctn.run() for ctn in [rr, acme1, acme2, tyrell1, tyrell2]))
+        time.sleep(base.run_containers([rr, acme1, acme2, tyrell1, tyrell2]))
 
         rr.add_peer(acme1, vpn=True, addpath=True, graceful_restart=True, llgr=True, is_rr_client=True)
         acme1.add_peer(rr, vpn=True, addpath=True, graceful_restart=True, llgr=True)
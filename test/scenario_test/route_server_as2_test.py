@@ -52,7 +52,7 @@ class GoBGPTestBase(unittest.TestCase):
             for i in range(4)]
         ctns = [g1] + rs_clients
 
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
         time.sleep(initial_wait_time)
 
         for i, rs_client in enumerate(rs_clients):
@@ -50,7 +50,7 @@ class GoBGPIPv6Test(unittest.TestCase):
         v4 = [q1, q2]
         v6 = [q3, q4]
 
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
         time.sleep(initial_wait_time)
 
         for ctn in v4:
@@ -24,7 +24,11 @@ import nose
 from lib.noseplugin import OptionParser, parser_option
 
 from lib import base
-from lib.base import BGP_FSM_ESTABLISHED, local
+from lib.base import (
+    BGP_FSM_ESTABLISHED,
+    local,
+    wait_for_completion,
+)
 from lib.gobgp import GoBGPContainer
 from lib.exabgp import ExaBGPContainer
 
@@ -46,19 +50,6 @@ def lookup_scenario(name):
     return None
 
 
-def wait_for(f, timeout=120):
-    interval = 1
-    count = 0
-    while True:
-        if f():
-            return
-
-        time.sleep(interval)
-        count += interval
-        if count >= timeout:
-            raise Exception('timeout')
-
-
 @register_scenario
 class MalformedMpReachNlri(object):
     """
@@ -76,7 +67,7 @@ class MalformedMpReachNlri(object):
         e2 = ExaBGPContainer(name='e2', asn=65001, router_id='192.168.0.2')
 
         ctns = [g1, e1, e2]
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
         time.sleep(initial_wait_time)
 
         for q in [e1, e2]:
@@ -110,7 +101,7 @@ class MalformedMpReachNlri(object):
                     return True
             return False
 
-        wait_for(f)
+        wait_for_completion(f)
         # check e2 is still established
         g1.wait_for(BGP_FSM_ESTABLISHED, e2)
 
@@ -154,7 +145,7 @@ class MalformedMpUnReachNlri(object):
                     return True
             return False
 
-        wait_for(f)
+        wait_for_completion(f)
         # check e2 is still established
         g1.wait_for(BGP_FSM_ESTABLISHED, e2)
 
@@ -205,7 +196,7 @@ class MalformedAsPath(object):
                     return True
             return False
 
-        wait_for(f)
+        wait_for_completion(f)
         # check e2 is still established
         g1.wait_for(BGP_FSM_ESTABLISHED, e2)
 
@@ -249,7 +240,7 @@ class MalformedAs4Path(object):
                     return True
             return False
 
-        wait_for(f)
+        wait_for_completion(f)
         # check e2 is still established
         g1.wait_for(BGP_FSM_ESTABLISHED, e2)
 
@@ -300,7 +291,7 @@ class MalformedNexthop(object):
                     return True
             return False
 
-        wait_for(f)
+        wait_for_completion(f)
         # check e2 is still established
         g1.wait_for(BGP_FSM_ESTABLISHED, e2)
 
@@ -351,7 +342,7 @@ class MalformedRouteFamily(object):
                     return True
             return False
 
-        wait_for(f)
+        wait_for_completion(f)
         # check e2 is still established
         g1.wait_for(BGP_FSM_ESTABLISHED, e2)
 
@@ -402,7 +393,7 @@ class MalformedAsPathSegmentLengthInvalid(object):
                     return True
             return False
 
-        wait_for(f)
+        wait_for_completion(f)
         # check e2 is still established
         g1.wait_for(BGP_FSM_ESTABLISHED, e2)
 
@@ -448,7 +439,7 @@ class MalformedNexthopLoopbackAddr(object):
                     return True
             return False
 
-        wait_for(f)
+        wait_for_completion(f)
         # check e2 is still established
         g1.wait_for(BGP_FSM_ESTABLISHED, e2)
 
@@ -497,7 +488,7 @@ class MalformedOriginType(object):
                     return True
             return False
 
-        wait_for(f)
+        wait_for_completion(f)
         # check e2 is still established
         g1.wait_for(BGP_FSM_ESTABLISHED, e2)
 
@@ -34,10 +34,16 @@ from lib.base import (
     BGP_ATTR_TYPE_COMMUNITIES,
     BGP_ATTR_TYPE_EXTENDED_COMMUNITIES,
     local,
+    wait_for_completion,
 )
 from lib.gobgp import GoBGPContainer
 from lib.quagga import QuaggaBGPContainer
 from lib.exabgp import ExaBGPContainer
+from lib.scenario import (
+    order_by_boot,
+    reset_route_server,
+    warm_boot,
+)
 
 
 counter = 1
@@ -57,19 +63,6 @@ def lookup_scenario(name):
     return None
 
 
-def wait_for(f, timeout=120):
-    interval = 1
-    count = 0
-    while True:
-        if f():
-            return
-
-        time.sleep(interval)
-        count += interval
-        if count >= timeout:
-            raise Exception('timeout')
-
-
 @register_scenario
 class ImportPolicy(object):
     """
@@ -81,18 +74,20 @@ class ImportPolicy(object):
                             --------------------------------
     """
     @staticmethod
+    @warm_boot('ImportPolicy', reset=reset_route_server)
     def boot(env):
         gobgp_ctn_image_name = env.parser_option.gobgp_image
         log_level = env.parser_option.gobgp_log_level
         g1 = GoBGPContainer(name='g1', asn=65000, router_id='192.168.0.1',
                             ctn_image_name=gobgp_ctn_image_name,
-                            log_level=log_level)
+                            log_level=log_level,
+                            driver=env.parser_option.gobgp_driver)
         e1 = ExaBGPContainer(name='e1', asn=65001, router_id='192.168.0.2')
         q1 = QuaggaBGPContainer(name='q1', asn=65002, router_id='192.168.0.3')
         q2 = QuaggaBGPContainer(name='q2', asn=65003, router_id='192.168.0.4')
 
         ctns = [g1, e1, q1, q2]
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
         time.sleep(initial_wait_time)
 
         for q in [e1, q1, q2]:
@@ -142,12 +137,12 @@ class ImportPolicy(object):
 
     @staticmethod
     def check(env):
-        wait_for(lambda: len(env.g1.get_local_rib(env.q1)) == 2)
-        wait_for(lambda: len(env.g1.get_adj_rib_out(env.q1)) == 2)
-        wait_for(lambda: len(env.q1.get_global_rib()) == 2)
-        wait_for(lambda: len(env.g1.get_local_rib(env.q2)) == 1)
-        wait_for(lambda: len(env.g1.get_adj_rib_out(env.q2)) == 1)
-        wait_for(lambda: len(env.q2.get_global_rib()) == 1)
+        wait_for_completion(lambda: env.g1.count_local_rib(env.q1), expected=2)
+        wait_for_completion(lambda: env.g1.count_adj_rib(env.q1, adj_type='out'), expected=2)
+        wait_for_completion(lambda: len(env.q1.get_global_rib()) == 2)
+        wait_for_completion(lambda: env.g1.count_local_rib(env.q2), expected=1)
+        wait_for_completion(lambda: env.g1.count_adj_rib(env.q2, adj_type='out'), expected=1)
+        wait_for_completion(lambda: len(env.q2.get_global_rib()) == 1)
 
     @staticmethod
     def executor(env):
@@ -166,6 +161,8 @@ class ExportPolicy(object):
                             | -> q2-rib ->x q2-adj-rib-out |
                             --------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -211,12 +208,12 @@ class ExportPolicy(object):
         g1 = env.g1
         q1 = env.q1
         q2 = env.q2
-        wait_for(lambda: len(g1.get_local_rib(q1)) == 2)
-        wait_for(lambda: len(g1.get_adj_rib_out(q1)) == 2)
-        wait_for(lambda: len(q1.get_global_rib()) == 2)
-        wait_for(lambda: len(g1.get_local_rib(q2)) == 2)
-        wait_for(lambda: len(g1.get_adj_rib_out(q2)) == 1)
-        wait_for(lambda: len(q2.get_global_rib()) == 1)
+        wait_for_completion(lambda: g1.count_local_rib(q1), expected=2)
+        wait_for_completion(lambda: g1.count_adj_rib(q1, adj_type='out'), expected=2)
+        wait_for_completion(lambda: len(q1.get_global_rib()) == 2)
+        wait_for_completion(lambda: g1.count_local_rib(q2), expected=2)
+        wait_for_completion(lambda: g1.count_adj_rib(q2, adj_type='out'), expected=1)
+        wait_for_completion(lambda: len(q2.get_global_rib()) == 1)
 
     @staticmethod
     def executor(env):
@@ -252,6 +249,8 @@ class ImportPolicyUpdate(object):
                       | ->(r1,r3)->    rib ->(r1,r3)->    adj-rib-out | ->(r1,r3)-> q2
                       -------------------------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -297,12 +296,12 @@ class ImportPolicyUpdate(object):
         # e1 = env.e1
         q1 = env.q1
         q2 = env.q2
-        wait_for(lambda: len(g1.get_local_rib(q1)) == 3)
-        wait_for(lambda: len(g1.get_adj_rib_out(q1)) == 3)
-        wait_for(lambda: len(q1.get_global_rib()) == 3)
-        wait_for(lambda: len(g1.get_local_rib(q2)) == 1)
-        wait_for(lambda: len(g1.get_adj_rib_out(q2)) == 1)
-        wait_for(lambda: len(q2.get_global_rib()) == 1)
+        wait_for_completion(lambda: g1.count_local_rib(q1), expected=3)
+        wait_for_completion(lambda: g1.count_adj_rib(q1, adj_type='out'), expected=3)
+        wait_for_completion(lambda: len(q1.get_global_rib()) == 3)
+        wait_for_completion(lambda: g1.count_local_rib(q2), expected=1)
+        wait_for_completion(lambda: g1.count_adj_rib(q2, adj_type='out'), expected=1)
+        wait_for_completion(lambda: len(q2.get_global_rib()) == 1)
 
     @staticmethod
     def setup2(env):
@@ -339,12 +338,12 @@ class ImportPolicyUpdate(object):
         # e1 = env.e1
         q1 = env.q1
         q2 = env.q2
-        wait_for(lambda: len(g1.get_local_rib(q1)) == 3)
-        wait_for(lambda: len(g1.get_adj_rib_out(q1)) == 3)
-        wait_for(lambda: len(q1.get_global_rib()) == 3)
-        wait_for(lambda: len(g1.get_local_rib(q2)) == 2)
-        wait_for(lambda: len(g1.get_adj_rib_out(q2)) == 2)
-        wait_for(lambda: len(q2.get_global_rib()) == 2)
+        wait_for_completion(lambda: g1.count_local_rib(q1), expected=3)
+        wait_for_completion(lambda: g1.count_adj_rib(q1, adj_type='out'), expected=3)
+        wait_for_completion(lambda: len(q1.get_global_rib()) == 3)
+        wait_for_completion(lambda: g1.count_local_rib(q2), expected=2)
+        wait_for_completion(lambda: g1.count_adj_rib(q2, adj_type='out'), expected=2)
+        wait_for_completion(lambda: len(q2.get_global_rib()) == 2)
 
     @staticmethod
     def executor(env):
@@ -382,6 +381,8 @@ class ExportPolicyUpdate(object):
                       | ->(r1,r2,r3)-> rib ->(r1,r3)->    adj-rib-out | ->(r1,r3)-> q2
                       -------------------------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -426,12 +427,12 @@ class ExportPolicyUpdate(object):
         # e1 = env.e1
         q1 = env.q1
         q2 = env.q2
-        wait_for(lambda: len(g1.get_local_rib(q1)) == 3)
-        wait_for(lambda: len(g1.get_adj_rib_out(q1)) == 3)
-        wait_for(lambda: len(q1.get_global_rib()) == 3)
-        wait_for(lambda: len(g1.get_local_rib(q2)) == 3)
-        wait_for(lambda: len(g1.get_adj_rib_out(q2)) == 1)
-        wait_for(lambda: len(q2.get_global_rib()) == 1)
+        wait_for_completion(lambda: g1.count_local_rib(q1), expected=3)
+        wait_for_completion(lambda: g1.count_adj_rib(q1, adj_type='out'), expected=3)
+        wait_for_completion(lambda: len(q1.get_global_rib()) == 3)
+        wait_for_completion(lambda: g1.count_local_rib(q2), expected=3)
+        wait_for_completion(lambda: g1.count_adj_rib(q2, adj_type='out'), expected=1)
+        wait_for_completion(lambda: len(q2.get_global_rib()) == 1)
 
     @staticmethod
     def setup2(env):
@@ -473,12 +474,12 @@ class ExportPolicyUpdate(object):
         # e1 = env.e1
         q1 = env.q1
         q2 = env.q2
-        wait_for(lambda: len(g1.get_local_rib(q1)) == 3)
-        wait_for(lambda: len(g1.get_adj_rib_out(q1)) == 3)
-        wait_for(lambda: len(q1.get_global_rib()) == 3)
-        wait_for(lambda: len(g1.get_local_rib(q2)) == 3)
-        wait_for(lambda: len(g1.get_adj_rib_out(q2)) == 2)
-        wait_for(lambda: len(q2.get_global_rib()) == 2)
+        wait_for_completion(lambda: g1.count_local_rib(q1), expected=3)
+        wait_for_completion(lambda: g1.count_adj_rib(q1, adj_type='out'), expected=3)
+        wait_for_completion(lambda: len(q1.get_global_rib()) == 3)
+        wait_for_completion(lambda: g1.count_local_rib(q2), expected=3)
+        wait_for_completion(lambda: g1.count_adj_rib(q2, adj_type='out'), expected=2)
+        wait_for_completion(lambda: len(q2.get_global_rib()) == 2)
 
     @staticmethod
     def executor(env):
@@ -503,18 +504,20 @@ class ImportPolicyIPV6(object):
                    -------------------------------------------------
     """
     @staticmethod
+    @warm_boot('ImportPolicyIPV6', reset=reset_route_server)
     def boot(env):
         gobgp_ctn_image_name = env.parser_option.gobgp_image
         log_level = env.parser_option.gobgp_log_level
         g1 = GoBGPContainer(name='g1', asn=65000, router_id='192.168.0.1',
                             ctn_image_name=gobgp_ctn_image_name,
-                            log_level=log_level)
+                            log_level=log_level,
+                            driver=env.parser_option.gobgp_driver)
         e1 = ExaBGPContainer(name='e1', asn=65001, router_id='192.168.0.2')
         q1 = QuaggaBGPContainer(name='q1', asn=65002, router_id='192.168.0.3')
         q2 = QuaggaBGPContainer(name='q2', asn=65003, router_id='192.168.0.4')
 
         ctns = [g1, e1, q1, q2]
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
         time.sleep(initial_wait_time)
 
         br01 = Bridge(name='br01', subnet='2001::/96')
@@ -567,12 +570,12 @@ class ImportPolicyIPV6(object):
 
     @staticmethod
     def check(env):
-        wait_for(lambda: len(env.g1.get_local_rib(env.q1, rf='ipv6')) == 2)
-        wait_for(lambda: len(env.g1.get_adj_rib_out(env.q1, rf='ipv6')) == 2)
-        wait_for(lambda: len(env.q1.get_global_rib(rf='ipv6')) == 2)
-        wait_for(lambda: len(env.g1.get_local_rib(env.q2, rf='ipv6')) == 1)
-        wait_for(lambda: len(env.g1.get_adj_rib_out(env.q2, rf='ipv6')) == 1)
-        wait_for(lambda: len(env.q2.get_global_rib(rf='ipv6')) == 1)
+        wait_for_completion(lambda: len(env.g1.get_local_rib(env.q1, rf='ipv6')) == 2)
+        wait_for_completion(lambda: len(env.g1.get_adj_rib_out(env.q1, rf='ipv6')) == 2)
+        wait_for_completion(lambda: len(env.q1.get_global_rib(rf='ipv6')) == 2)
+        wait_for_completion(lambda: len(env.g1.get_local_rib(env.q2, rf='ipv6')) == 1)
+        wait_for_completion(lambda: len(env.g1.get_adj_rib_out(env.q2, rf='ipv6')) == 1)
+        wait_for_completion(lambda: len(env.q2.get_global_rib(rf='ipv6')) == 1)
 
     @staticmethod
     def executor(env):
@@ -594,6 +597,8 @@ class ExportPolicyIPV6(object):
                    | ->(r1,r2)-> q2-rib ->(r2)   -> q2-adj-rib-out | ->(r2)-> q2
                    -------------------------------------------------
     """
+    topology = 'ImportPolicyIPV6'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicyIPV6').boot(env)
@@ -636,12 +641,12 @@ class ExportPolicyIPV6(object):
 
     @staticmethod
     def check(env):
-        wait_for(lambda: len(env.g1.get_local_rib(env.q1, rf='ipv6')) == 2)
-        wait_for(lambda: len(env.g1.get_adj_rib_out(env.q1, rf='ipv6')) == 2)
-        wait_for(lambda: len(env.q1.get_global_rib(rf='ipv6')) == 2)
-        wait_for(lambda: len(env.g1.get_local_rib(env.q2, rf='ipv6')) == 2)
-        wait_for(lambda: len(env.g1.get_adj_rib_out(env.q2, rf='ipv6')) == 1)
-        wait_for(lambda: len(env.q2.get_global_rib(rf='ipv6')) == 1)
+        wait_for_completion(lambda: len(env.g1.get_local_rib(env.q1, rf='ipv6')) == 2)
+        wait_for_completion(lambda: len(env.g1.get_adj_rib_out(env.q1, rf='ipv6')) == 2)
+        wait_for_completion(lambda: len(env.q1.get_global_rib(rf='ipv6')) == 2)
+        wait_for_completion(lambda: len(env.g1.get_local_rib(env.q2, rf='ipv6')) == 2)
+        wait_for_completion(lambda: len(env.g1.get_adj_rib_out(env.q2, rf='ipv6')) == 1)
+        wait_for_completion(lambda: len(env.q2.get_global_rib(rf='ipv6')) == 1)
 
     @staticmethod
     def executor(env):
@@ -676,6 +681,8 @@ class ImportPolicyIPV6Update(object):
                       | ->(r1,r3)->    rib ->(r1,r3)->    adj-rib-out | ->(r1,r3)-> q2
                       -------------------------------------------------
     """
+    topology = 'ImportPolicyIPV6'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicyIPV6').boot(env)
@@ -717,12 +724,12 @@ class ImportPolicyIPV6Update(object):
 
     @staticmethod
     def check(env):
-        wait_for(lambda: len(env.g1.get_local_rib(env.q1, rf='ipv6')) == 3)
-        wait_for(lambda: len(env.g1.get_adj_rib_out(env.q1, rf='ipv6')) == 3)
-        wait_for(lambda: len(env.q1.get_global_rib(rf='ipv6')) == 3)
-        wait_for(lambda: len(env.g1.get_local_rib(env.q2, rf='ipv6')) == 1)
-        wait_for(lambda: len(env.g1.get_adj_rib_out(env.q2, rf='ipv6')) == 1)
-        wait_for(lambda: len(env.q2.get_global_rib(rf='ipv6')) == 1)
+        wait_for_completion(lambda: len(env.g1.get_local_rib(env.q1, rf='ipv6')) == 3)
+        wait_for_completion(lambda: len(env.g1.get_adj_rib_out(env.q1, rf='ipv6')) == 3)
+        wait_for_completion(lambda: len(env.q1.get_global_rib(rf='ipv6')) == 3)
+        wait_for_completion(lambda: len(env.g1.get_local_rib(env.q2, rf='ipv6')) == 1)
+        wait_for_completion(lambda: len(env.g1.get_adj_rib_out(env.q2, rf='ipv6')) == 1)
+        wait_for_completion(lambda: len(env.q2.get_global_rib(rf='ipv6')) == 1)
 
     @staticmethod
     def setup2(env):
@@ -755,12 +762,12 @@ class ImportPolicyIPV6Update(object):
 
     @staticmethod
     def check2(env):
-        wait_for(lambda: len(env.g1.get_local_rib(env.q1, rf='ipv6')) == 3)
-        wait_for(lambda: len(env.g1.get_adj_rib_out(env.q1, rf='ipv6')) == 3)
-        wait_for(lambda: len(env.q1.get_global_rib(rf='ipv6')) == 3)
-        wait_for(lambda: len(env.g1.get_local_rib(env.q2, rf='ipv6')) == 2)
-        wait_for(lambda: len(env.g1.get_adj_rib_out(env.q2, rf='ipv6')) == 2)
-        wait_for(lambda: len(env.q2.get_global_rib(rf='ipv6')) == 2)
+        wait_for_completion(lambda: len(env.g1.get_local_rib(env.q1, rf='ipv6')) == 3)
+        wait_for_completion(lambda: len(env.g1.get_adj_rib_out(env.q1, rf='ipv6')) == 3)
+        wait_for_completion(lambda: len(env.q1.get_global_rib(rf='ipv6')) == 3)
+        wait_for_completion(lambda: len(env.g1.get_local_rib(env.q2, rf='ipv6')) == 2)
+        wait_for_completion(lambda: len(env.g1.get_adj_rib_out(env.q2, rf='ipv6')) == 2)
+        wait_for_completion(lambda: len(env.q2.get_global_rib(rf='ipv6')) == 2)
 
     @staticmethod
     def executor(env):
@@ -797,6 +804,8 @@ class ExportPolicyIPv6Update(object):
                       | ->(r1,r2,r3)-> rib ->(r1,r3)->    adj-rib-out | ->(r1,r3)-> q2
                       -------------------------------------------------
     """
+    topology = 'ImportPolicyIPV6'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicyIPV6').boot(env)
@@ -838,12 +847,12 @@ class ExportPolicyIPv6Update(object):
 
     @staticmethod
     def check(env):
-        wait_for(lambda: len(env.g1.get_local_rib(env.q1, rf='ipv6')) == 3)
-        wait_for(lambda: len(env.g1.get_adj_rib_out(env.q1, rf='ipv6')) == 3)
-        wait_for(lambda: len(env.q1.get_global_rib(rf='ipv6')) == 3)
-        wait_for(lambda: len(env.g1.get_local_rib(env.q2, rf='ipv6')) == 3)
-        wait_for(lambda: len(env.g1.get_adj_rib_out(env.q2, rf='ipv6')) == 1)
-        wait_for(lambda: len(env.q2.get_global_rib(rf='ipv6')) == 1)
+        wait_for_completion(lambda: len(env.g1.get_local_rib(env.q1, rf='ipv6')) == 3)
+        wait_for_completion(lambda: len(env.g1.get_adj_rib_out(env.q1, rf='ipv6')) == 3)
+        wait_for_completion(lambda: len(env.q1.get_global_rib(rf='ipv6')) == 3)
+        wait_for_completion(lambda: len(env.g1.get_local_rib(env.q2, rf='ipv6')) == 3)
+        wait_for_completion(lambda: len(env.g1.get_adj_rib_out(env.q2, rf='ipv6')) == 1)
+        wait_for_completion(lambda: len(env.q2.get_global_rib(rf='ipv6')) == 1)
 
     @staticmethod
     def setup2(env):
@@ -878,12 +887,12 @@ class ExportPolicyIPv6Update(object):
 
     @staticmethod
     def check2(env):
-        wait_for(lambda: len(env.g1.get_local_rib(env.q1, rf='ipv6')) == 3)
-        wait_for(lambda: len(env.g1.get_adj_rib_out(env.q1, rf='ipv6')) == 3)
-        wait_for(lambda: len(env.q1.get_global_rib(rf='ipv6')) == 3)
-        wait_for(lambda: len(env.g1.get_local_rib(env.q2, rf='ipv6')) == 3)
-        wait_for(lambda: len(env.g1.get_adj_rib_out(env.q2, rf='ipv6')) == 2)
-        wait_for(lambda: len(env.q2.get_global_rib(rf='ipv6')) == 2)
+        wait_for_completion(lambda: len(env.g1.get_local_rib(env.q1, rf='ipv6')) == 3)
+        wait_for_completion(lambda: len(env.g1.get_adj_rib_out(env.q1, rf='ipv6')) == 3)
+        wait_for_completion(lambda: len(env.q1.get_global_rib(rf='ipv6')) == 3)
+        wait_for_completion(lambda: len(env.g1.get_local_rib(env.q2, rf='ipv6')) == 3)
+        wait_for_completion(lambda: len(env.g1.get_adj_rib_out(env.q2, rf='ipv6')) == 2)
+        wait_for_completion(lambda: len(env.q2.get_global_rib(rf='ipv6')) == 2)
 
     @staticmethod
     def executor(env):
@@ -904,6 +913,8 @@ class ImportPolicyAsPathLengthCondition(object):
                               | ->x q2-rib                   |
                               --------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -937,12 +948,12 @@ class ImportPolicyAsPathLengthCondition(object):
         # e1 = env.e1
         q1 = env.q1
         q2 = env.q2
-        wait_for(lambda: len(g1.get_local_rib(q1)) == 2)
-        wait_for(lambda: len(g1.get_adj_rib_out(q1)) == 2)
-        wait_for(lambda: len(q1.get_global_rib()) == 2)
-        wait_for(lambda: len(g1.get_local_rib(q2)) == 1)
-        wait_for(lambda: len(g1.get_adj_rib_out(q2)) == 1)
-        wait_for(lambda: len(q2.get_global_rib()) == 1)
+        wait_for_completion(lambda: g1.count_local_rib(q1), expected=2)
+        wait_for_completion(lambda: g1.count_adj_rib(q1, adj_type='out'), expected=2)
+        wait_for_completion(lambda: len(q1.get_global_rib()) == 2)
+        wait_for_completion(lambda: g1.count_local_rib(q2), expected=1)
+        wait_for_completion(lambda: g1.count_adj_rib(q2, adj_type='out'), expected=1)
+        wait_for_completion(lambda: len(q2.get_global_rib()) == 1)
 
     @staticmethod
     def executor(env):
@@ -961,6 +972,8 @@ class ImportPolicyAsPathCondition(object):
                                 | ->x q2-rib                   |
                                 --------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -1013,6 +1026,8 @@ class ImportPolicyAsPathAnyCondition(object):
                                    | ->x q2-rib                   |
                                    --------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -1065,6 +1080,8 @@ class ImportPolicyAsPathOriginCondition(object):
                                 | ->x q2-rib                   |
                                 --------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -1117,6 +1134,8 @@ class ImportPolicyAsPathOnlyCondition(object):
                               | ->x q2-rib                   |
                               --------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -1170,6 +1189,8 @@ class ImportPolicyAsPathMismatchCondition(object):
                                    -------------------------------
     This case check if policy passes the path to e1 because of condition mismatch.
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -1207,12 +1228,12 @@ class ImportPolicyAsPathMismatchCondition(object):
         # e1 = env.e1
         q1 = env.q1
         q2 = env.q2
-        wait_for(lambda: len(g1.get_local_rib(q1)) == 2)
-        wait_for(lambda: len(g1.get_adj_rib_out(q1)) == 2)
-        wait_for(lambda: len(q1.get_global_rib()) == 2)
-        wait_for(lambda: len(g1.get_local_rib(q2)) == 2)
-        wait_for(lambda: len(g1.get_adj_rib_out(q2)) == 2)
-        wait_for(lambda: len(q2.get_global_rib()) == 2)
+        wait_for_completion(lambda: g1.count_local_rib(q1), expected=2)
+        wait_for_completion(lambda: g1.count_adj_rib(q1, adj_type='out'), expected=2)
+        wait_for_completion(lambda: len(q1.get_global_rib()) == 2)
+        wait_for_completion(lambda: g1.count_local_rib(q2), expected=2)
+        wait_for_completion(lambda: g1.count_adj_rib(q2, adj_type='out'), expected=2)
+        wait_for_completion(lambda: len(q2.get_global_rib()) == 2)
 
     @staticmethod
     def executor(env):
@@ -1231,6 +1252,8 @@ class ImportPolicyCommunityCondition(object):
                                 | ->x q2-rib                   |
                                 --------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -1282,6 +1305,8 @@ class ImportPolicyCommunityRegexp(object):
                                 | ->x q2-rib                   |
                                 --------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -1343,6 +1368,8 @@ class ImportPolicyCommunityAction(object):
                                 |    apply action             |
                                 -------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -1380,12 +1407,12 @@ class ImportPolicyCommunityAction(object):
         # e1 = env.e1
         q1 = env.q1
         q2 = env.q2
-        wait_for(lambda: len(g1.get_local_rib(q1)) == 1)
-        wait_for(lambda: len(g1.get_adj_rib_out(q1)) == 1)
-        wait_for(lambda: len(q1.get_global_rib()) == 1)
-        wait_for(lambda: len(g1.get_local_rib(q2)) == 1)
-        wait_for(lambda: len(g1.get_adj_rib_out(q2)) == 1)
-        wait_for(lambda: len(q2.get_global_rib()) == 1)
+        wait_for_completion(lambda: g1.count_local_rib(q1), expected=1)
+        wait_for_completion(lambda: g1.count_adj_rib(q1, adj_type='out'), expected=1)
+        wait_for_completion(lambda: len(q1.get_global_rib()) == 1)
+        wait_for_completion(lambda: g1.count_local_rib(q2), expected=1)
+        wait_for_completion(lambda: g1.count_adj_rib(q2, adj_type='out'), expected=1)
+        wait_for_completion(lambda: len(q2.get_global_rib()) == 1)
 
     @staticmethod
     def check2(env):
@@ -1418,6 +1445,8 @@ class ImportPolicyCommunityReplace(object):
                                 |    apply action             |
                                 -------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -1485,6 +1514,8 @@ class ImportPolicyCommunityRemove(object):
                                 |    apply action             |
                                 -------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -1524,12 +1555,12 @@ class ImportPolicyCommunityRemove(object):
         # e1 = env.e1
         q1 = env.q1
         q2 = env.q2
-        wait_for(lambda: len(g1.get_local_rib(q1)) == 3)
-        wait_for(lambda: len(g1.get_adj_rib_out(q1)) == 3)
-        wait_for(lambda: len(q1.get_global_rib()) == 3)
-        wait_for(lambda: len(g1.get_local_rib(q2)) == 3)
-        wait_for(lambda: len(g1.get_adj_rib_out(q2)) == 3)
-        wait_for(lambda: len(q2.get_global_rib()) == 3)
+        wait_for_completion(lambda: g1.count_local_rib(q1), expected=3)
+        wait_for_completion(lambda: g1.count_adj_rib(q1, adj_type='out'), expected=3)
+        wait_for_completion(lambda: len(q1.get_global_rib()) == 3)
+        wait_for_completion(lambda: g1.count_local_rib(q2), expected=3)
+        wait_for_completion(lambda: g1.count_adj_rib(q2, adj_type='out'), expected=3)
+        wait_for_completion(lambda: len(q2.get_global_rib()) == 3)
 
     @staticmethod
     def check2(env):
@@ -1571,6 +1602,8 @@ class ImportPolicyCommunityNull(object):
                                 |    apply action             |
                                 -------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -1647,6 +1680,8 @@ class ExportPolicyCommunityAdd(object):
                                 |              apply action   |
                                 -------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -1722,6 +1757,8 @@ class ExportPolicyCommunityReplace(object):
                                 |              apply action   |
                                 -------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -1797,6 +1834,8 @@ class ExportPolicyCommunityRemove(object):
                                 |              apply action   |
                                 -------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -1875,6 +1914,8 @@ class ExportPolicyCommunityNull(object):
                                 |              apply action   |
                                 -------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -1960,6 +2001,8 @@ class ImportPolicyMedReplace(object):
                      |    apply action             |
                      -------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -2021,6 +2064,8 @@ class ImportPolicyMedAdd(object):
                      |    apply action             |
                      -------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -2082,6 +2127,8 @@ class ImportPolicyMedSub(object):
                      |    apply action             |
                      -------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -2143,6 +2190,8 @@ class ExportPolicyMedReplace(object):
                      |              apply action   |
                      -------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -2204,6 +2253,8 @@ class ExportPolicyMedAdd(object):
                      |              apply action   |
                      -------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -2265,6 +2316,8 @@ class ExportPolicyMedSub(object):
                      |              apply action   |
                      -------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -2326,6 +2379,8 @@ class ExportPolicyAsPathPrepend(object):
                             |               apply action   |
                             --------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -2364,13 +2419,13 @@ class ExportPolicyAsPathPrepend(object):
         e1 = env.e1
         q1 = env.q1
         q2 = env.q2
-        wait_for(lambda: len(g1.get_adj_rib_in(e1)) == 2)
-        wait_for(lambda: len(g1.get_local_rib(q1)) == 2)
-        wait_for(lambda: len(g1.get_adj_rib_out(q1)) == 2)
-        wait_for(lambda: len(q1.get_global_rib()) == 2)
-        wait_for(lambda: len(g1.get_local_rib(q2)) == 2)
-        wait_for(lambda: len(g1.get_adj_rib_out(q2)) == 2)
-        wait_for(lambda: len(q2.get_global_rib()) == 2)
+        wait_for_completion(lambda: g1.count_adj_rib(e1), expected=2)
+        wait_for_completion(lambda: g1.count_local_rib(q1), expected=2)
+        wait_for_completion(lambda: g1.count_adj_rib(q1, adj_type='out'), expected=2)
+        wait_for_completion(lambda: len(q1.get_global_rib()) == 2)
+        wait_for_completion(lambda: g1.count_local_rib(q2), expected=2)
+        wait_for_completion(lambda: g1.count_adj_rib(q2, adj_type='out'), expected=2)
+        wait_for_completion(lambda: len(q2.get_global_rib()) == 2)
 
     @staticmethod
     def check2(env):
@@ -2413,6 +2468,8 @@ class ImportPolicyAsPathPrependLastAS(object):
                             |     apply action             |
                             --------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -2490,6 +2547,8 @@ class ExportPolicyAsPathPrependLastAS(object):
                             |     apply action             |
                             --------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -2566,6 +2625,8 @@ class ImportPolicyExCommunityOriginCondition(object):
                                                  | ->x q2-rib                   |
                                                  --------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario("ImportPolicy").boot(env)
@@ -2617,6 +2678,8 @@ class ImportPolicyExCommunityTargetCondition(object):
                                            | ->x q2-rib                   |
                                            --------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -2680,6 +2743,8 @@ class ImportPolicyExCommunityAdd(object):
                                |     add ext-community         |
                                ---------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -2760,6 +2825,8 @@ class ImportPolicyExCommunityAdd2(object):
                                       |     add ext-community        |
                                       --------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -2845,6 +2912,8 @@ class ImportPolicyExCommunityMultipleAdd(object):
                                    |     add ext-community               |
                                    ---------------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -2930,6 +2999,8 @@ class ExportPolicyExCommunityAdd(object):
                                |                add ext-community |
                                ------------------------------------
     """
+    topology = 'ImportPolicy'
+
     @staticmethod
     def boot(env):
         lookup_scenario('ImportPolicy').boot(env)
@@ -3038,24 +3109,29 @@ class ImportPolicyRejectImplicitWithdraw(object):
                                               ----------------
     """
     @staticmethod
+    @warm_boot('ImportPolicyRejectImplicitWithdraw', reset=None)
     def boot(env):
         gobgp_ctn_image_name = env.parser_option.gobgp_image
         log_level = env.parser_option.gobgp_log_level
         g1 = GoBGPContainer(name='g1', asn=65001, router_id='192.168.0.1',
                             ctn_image_name=gobgp_ctn_image_name,
-                            log_level=log_level)
+                            log_level=log_level,
+                            driver=env.parser_option.gobgp_driver)
         g2 = GoBGPContainer(name='g2', asn=65002, router_id='192.168.0.2',
                             ctn_image_name=gobgp_ctn_image_name,
-                            log_level=log_level)
+                            log_level=log_level,
+                            driver=env.parser_option.gobgp_driver)
         g3 = GoBGPContainer(name='g3', asn=65003, router_id='192.168.0.3',
                             ctn_image_name=gobgp_ctn_image_name,
-                            log_level=log_level)
+                            log_level=log_level,
+                            driver=env.parser_option.gobgp_driver)
         g4 = GoBGPContainer(name='g4', asn=65004, router_id='192.168.0.4',
                             ctn_image_name=gobgp_ctn_image_name,
-                            log_level=log_level)
+                            log_level=log_level,
+                            driver=env.parser_option.gobgp_driver)
 
         ctns = [g1, g2, g3, g4]
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
         time.sleep(initial_wait_time)
 
         for cli in [g2, g4]:
@@ -3101,10 +3177,10 @@ class ImportPolicyRejectImplicitWithdraw(object):
         g1 = env.g1
         # g2 = env.g2
         g4 = env.g4
-        wait_for(lambda: len(g1.get_local_rib(g4)) == 1)
-        wait_for(lambda: len(g1.get_local_rib(g4)[0]['paths']) == 1)
-        wait_for(lambda: len(g4.get_global_rib()) == 1)
-        wait_for(lambda: len(g4.get_global_rib()[0]['paths']) == 1)
+        wait_for_completion(lambda: g1.count_local_rib(g4), expected=1)
+        wait_for_completion(lambda: len(g1.get_local_rib(g4)[0]['paths']) == 1)
+        wait_for_completion(lambda: g4.count_global_rib(), expected=1)
+        wait_for_completion(lambda: len(g4.get_global_rib()[0]['paths']) == 1)
 
     @staticmethod
     def setup2(env):
@@ -3115,13 +3191,13 @@ class ImportPolicyRejectImplicitWithdraw(object):
         g1 = env.g1
         g2 = env.g2
         g4 = env.g4
-        wait_for(lambda: len(g2.get_global_rib()) == 1)
-        wait_for(lambda: len(g2.get_global_rib()[0]['paths']) == 2)
-        wait_for(lambda: len(g1.get_local_rib(g4)) == 1)
-        wait_for(lambda: len(g1.get_local_rib(g4)[0]['paths']) == 1)
-        wait_for(lambda: len(g1.get_adj_rib_in(g2)) == 1)
-        wait_for(lambda: len(g4.get_global_rib()) == 1)
-        wait_for(lambda: len(g4.get_global_rib()[0]['paths']) == 1)
+        wait_for_completion(lambda: g2.count_global_rib(), expected=1)
+        wait_for_completion(lambda: len(g2.get_global_rib()[0]['paths']) == 2)
+        wait_for_completion(lambda: g1.count_local_rib(g4), expected=1)
+        wait_for_completion(lambda: len(g1.get_local_rib(g4)[0]['paths']) == 1)
+        wait_for_completion(lambda: g1.count_adj_rib(g2), expected=1)
+        wait_for_completion(lambda: g4.count_global_rib(), expected=1)
+        wait_for_completion(lambda: len(g4.get_global_rib()[0]['paths']) == 1)
 
     @staticmethod
     def setup3(env):
@@ -3132,11 +3208,11 @@ class ImportPolicyRejectImplicitWithdraw(object):
         g1 = env.g1
         g2 = env.g2
         g4 = env.g4
-        wait_for(lambda: len(g2.get_global_rib()) == 1)
-        wait_for(lambda: len(g2.get_global_rib()[0]['paths']) == 1)
-        wait_for(lambda: len(g1.get_adj_rib_in(g2)) == 1)
-        wait_for(lambda: len(g1.get_local_rib(g4)) == 0)
-        wait_for(lambda: len(g4.get_global_rib()) == 0)
+        wait_for_completion(lambda: g2.count_global_rib(), expected=1)
+        wait_for_completion(lambda: len(g2.get_global_rib()[0]['paths']) == 1)
+        wait_for_completion(lambda: g1.count_adj_rib(g2), expected=1)
+        wait_for_completion(lambda: g1.count_local_rib(g4), expected=0)
+        wait_for_completion(lambda: g4.count_global_rib(), expected=0)
 
     @staticmethod
     def executor(env):
@@ -3157,12 +3233,26 @@ class TestGoBGPBase(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         idx = parser_option.test_index
+        indexes = [int(i) for i in parser_option.test_indexes.split(',') if i]
         base.TEST_PREFIX = parser_option.test_prefix
         cls.parser_option = parser_option
         cls.executors = []
-        if idx == 0:
+        if indexes:
+            # scenarios sharing a topology, given by run_scenarios.py
+            unknown = [i for i in indexes if i not in _SCENARIOS]
+            if unknown:
+                print('invalid test-indexes {0}. # of scenarios: {1}'.format(unknown, len(_SCENARIOS)))
+                sys.exit(1)
+            for i in indexes:
+                for k, m in inspect.getmembers(_SCENARIOS[i], inspect.isfunction):
+                    if k == 'executor':
+                        cls.executor = m
+                cls.executors.append(cls.executor)
+        elif idx == 0:
             print('unset test-index. run all test sequential')
-            for _, v in list(_SCENARIOS.items()):
+            # scenarios sharing a topology run back to back, so that
+            # warm_boot() can reuse it
+            for v in order_by_boot(_SCENARIOS.values()):
                 for k, m in inspect.getmembers(v, inspect.isfunction):
                     if k == 'executor':
                         cls.executor = m
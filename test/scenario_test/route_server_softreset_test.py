@@ -55,7 +55,7 @@ class GoBGPTestBase(unittest.TestCase):
         cls.clients = {}
         for cli in [g2, g3, g4]:
             cls.clients[cli.name] = cli
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
 
         time.sleep(initial_wait_time)
 
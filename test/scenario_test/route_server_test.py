@@ -55,7 +55,7 @@ class GoBGPTestBase(unittest.TestCase):
         q2 = rs_clients[1]
         q3 = rs_clients[2]
 
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
         time.sleep(initial_wait_time)
 
         for rs_client in rs_clients:
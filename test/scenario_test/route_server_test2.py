@@ -48,7 +48,7 @@ class GoBGPTestBase(unittest.TestCase):
         ctns = [g1, g2, e1]
         cls.clients = {cli.name: cli for cli in (g2, e1)}
 
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
         time.sleep(initial_wait_time)
 
         for cli in list(cls.clients.values()):
@@ -54,7 +54,7 @@ class GoBGPTestBase(unittest.TestCase):
                             ctn_image_name=gobgp_ctn_image_name,
                             log_level=parser_option.gobgp_log_level)
 
-        time.sleep(max(ctn.run() for ctn in [g1, g2]))
+        time.sleep(base.run_containers([g1, g2]))
 
         g1.local("gobgp vrf add vrf1 rd 100:100 rt both 100:100")
         g1.local("gobgp vrf add vrf2 rd 200:200 rt both 200:200")
@@ -191,7 +191,7 @@ class GoBGPTestBase(unittest.TestCase):
                             ctn_image_name=gobgp_ctn_image_name,
                             log_level=parser_option.gobgp_log_level)
 
-        time.sleep(max(ctn.run() for ctn in [g3, g4, g5]))
+        time.sleep(base.run_containers([g3, g4, g5]))
 
         g3.add_peer(g4, vpn=True, is_rr_client=True)
         g4.add_peer(g3, vpn=True)
@@ -485,7 +485,7 @@ class GoBGPTestBase(unittest.TestCase):
                             ctn_image_name=gobgp_ctn_image_name,
                             log_level=parser_option.gobgp_log_level)
 
-        time.sleep(max(ctn.run() for ctn in [g6, g7]))
+        time.sleep(base.run_containers([g6, g7]))
 
         g6.local("gobgp vrf add vrf1 rd 100:100 rt both 100:100")
         g6.local("gobgp vrf add vrf2 rd 200:200 rt both 200:200")
@@ -89,77 +89,15 @@ do
     fi
 done
 
-PIDS=()
-
-# route server malformed message test
-NUM=$(python3 route_server_malformed_test.py --test-index -1 -s 2> /dev/null | awk '/invalid/{print $NF}')
-PARALLEL_NUM=10
-for (( i = 1; i < $(( $NUM + 1)); ++i ))
-do
-    python3 route_server_malformed_test.py --gobgp-image $GOBGP_IMAGE --test-prefix mal$i --test-index $i -s -x --gobgp-log-level debug --with-xunit --xunit-file=${WS}/nosetest_malform${i}.xml &
-    PIDS=("${PIDS[@]}" $!)
-    sleep 3
-done
-
-for (( i = 0; i < ${#PIDS[@]}; ++i ))
-do
-    wait ${PIDS[$i]}
-    if [ $? != 0 ]; then
-        exit 1
-    fi
-done
-
-# route server policy test
-NUM=$(python3 route_server_policy_test.py --test-index -1 -s 2> /dev/null | awk '/invalid/{print $NF}')
-PARALLEL_NUM=25
-for (( i = 0; i < $(( NUM / PARALLEL_NUM + 1)); ++i ))
-do
-    PIDS=()
-    for (( j = $((PARALLEL_NUM * $i + 1)); j < $((PARALLEL_NUM * ($i+1) + 1)); ++j))
-    do
-        python3 route_server_policy_test.py --gobgp-image $GOBGP_IMAGE --test-prefix p$j --test-index $j -s -x --gobgp-log-level debug --with-xunit --xunit-file=${WS}/nosetest_policy${j}.xml &
-        PIDS=("${PIDS[@]}" $!)
-        if [ $j -eq $NUM ]; then
-            break
-        fi
-        sleep 3
-    done
-
-    for (( j = 0; j < ${#PIDS[@]}; ++j ))
-    do
-        wait ${PIDS[$j]}
-        if [ $? != 0 ]; then
-            exit 1
-        fi
-    done
-
-done
-
-# route server policy grpc test
-NUM=$(python3 route_server_policy_grpc_test.py --test-index -1 -s 2> /dev/null | awk '/invalid/{print $NF}')
-PARALLEL_NUM=25
-for (( i = 0; i < $(( NUM / PARALLEL_NUM + 1)); ++i ))
-do
-    PIDS=()
-    for (( j = $((PARALLEL_NUM * $i + 1)); j < $((PARALLEL_NUM * ($i+1) + 1)); ++j))
-    do
-        python3 route_server_policy_grpc_test.py --gobgp-image $GOBGP_IMAGE --test-prefix pg$j --test-index $j -s -x --gobgp-log-level debug --with-xunit --xunit-file=${WS}/nosetest_policy_grpc${j}.xml &
-        PIDS=("${PIDS[@]}" $!)
-        if [ $j -eq $NUM ]; then
-            break
-        fi
-        sleep 3
-    done
-
-    for (( j = 0; j < ${#PIDS[@]}; ++j ))
-    do
-        wait ${PIDS[$j]}
-        if [ $? != 0 ]; then
-            exit 1
-        fi
-    done
-
-done
+# route server malformed message test, route server policy test and
+# route server policy grpc test: every scenario is a job of one queue
+python3 run_scenarios.py --gobgp-image $GOBGP_IMAGE --xunit-dir ${WS} \
+    route_server_malformed_test.py \
+    route_server_policy_test.py \
+    route_server_policy_grpc_test.py
+if [ $? != 0 ]; then
+    exit 1
+fi
 
 echo 'all tests passed successfully'
 exit 0
@@ -0,0 +1,263 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Runs scenario test modules from one work queue.
+
+Every scenario of a module registering its scenarios in _SCENARIOS is a
+job of its own (--test-index), except that the scenarios of a module using
+warm_boot() which share a topology make one job (--test-indexes), so that
+it is booted once; other modules are a single job. Jobs run longest first,
+by the durations recorded in previous runs, on as many workers as the CPUs
+and memory of the host allow, and each worker uses its own --test-prefix.
+The xunit files of the jobs are merged into one, and the config_dir of a
+failed job is moved aside before its worker starts the next one.
+
+    $ PYTHONPATH=$GOBGP/test python3 run_scenarios.py --gobgp-image gobgp \\
+        route_server_malformed_test.py route_server_policy_test.py
+"""
+
+import argparse
+import collections
+import importlib
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+from lib.base import TEST_BASE_DIR
+from lib.scenario import boot_signature, warm_boot
+
+
+def discover(path):
+    """
+    Returns the jobs of a scenario test module, as (module, index) with
+    index None for modules without _SCENARIOS, and a tuple of the indexes
+    of the scenarios sharing a topology for modules using warm_boot().
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+    try:
+        module = importlib.import_module(name)
+    finally:
+        sys.path.pop(0)
+    scenarios = getattr(module, '_SCENARIOS', None)
+    if not scenarios:
+        return [(path, None)]
+    if getattr(module, 'warm_boot', None) is not warm_boot:
+        return [(path, i) for i in sorted(scenarios)]
+    groups = collections.OrderedDict()
+    for i in sorted(scenarios):
+        groups.setdefault(boot_signature(scenarios[i]), []).append(i)
+    return [(path, tuple(g) if len(g) > 1 else g[0]) for g in groups.values()]
+
+
+def job_key(job):
+    path, idx = job
+    name = os.path.splitext(os.path.basename(path))[0]
+    if idx is None:
+        return name
+    if isinstance(idx, tuple):
+        idx = ','.join(str(i) for i in idx)
+    return '{0}:{1}'.format(name, idx)
+
+
+def available_memory():
+    # in bytes
+    with open('/proc/meminfo') as f:
+        for line in f:
+            if line.startswith('MemAvailable:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def num_workers(jobs_per_cpu, mem_per_job):
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    n = int(cpus * jobs_per_cpu)
+    mem = available_memory()
+    if mem:
+        n = min(n, mem // mem_per_job)
+    return max(1, n)
+
+
+def load_durations(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_durations(path, durations):
+    with open(path, 'w') as f:
+        json.dump(durations, f, indent=2, sort_keys=True)
+
+
+def merge_xunit(files, out):
+    merged = ET.Element('testsuite', name='nosetests')
+    counts = {'tests': 0, 'errors': 0, 'failures': 0, 'skip': 0}
+    for f in files:
+        if not os.path.exists(f):
+            continue
+        suite = ET.parse(f).getroot()
+        for k in counts:
+            counts[k] += int(suite.get(k, 0))
+        for case in suite:
+            merged.append(case)
+    for k, v in counts.items():
+        merged.set(k, str(v))
+    ET.ElementTree(merged).write(out, encoding='UTF-8', xml_declaration=True)
+
+
+class Runner(object):
+
+    def __init__(self, jobs, args):
+        self.args = args
+        self.durations = load_durations(args.durations)
+        # unknown jobs first, as they may be the longest ones
+        default = max(self.durations.values()) if self.durations else 0
+        jobs = sorted(jobs, key=lambda j: self.durations.get(job_key(j), default + 1),
+                      reverse=True)
+        self.jobs = queue.Queue()
+        for job in jobs:
+            self.jobs.put(job)
+        self.lock = threading.Lock()
+        self.last_launch = 0
+        self.failed = []
+        self.xunit_files = []
+
+    def _wait_launch_slot(self):
+        # Spreads the container boots of simultaneously started jobs
+        with self.lock:
+            wait = self.last_launch + self.args.stagger - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            self.last_launch = time.time()
+
+    def _command(self, job, prefix, xunit):
+        path, idx = job
+        cmd = [sys.executable, path,
+               '--gobgp-image', self.args.gobgp_image,
+               '--test-prefix', prefix,
+               '--gobgp-log-level', self.args.gobgp_log_level,
+               '--backend', self.args.backend,
+               '-s', '-x', '--with-xunit', '--xunit-file={0}'.format(xunit)]
+        if isinstance(idx, tuple):
+            cmd += ['--test-indexes', ','.join(str(i) for i in idx)]
+        elif idx is not None:
+            cmd += ['--test-index', str(idx)]
+        if self.args.trace_dir:
+            cmd += ['--trace-dir', self.args.trace_dir]
+        return cmd
+
+    def _keep_artifacts(self, prefix, key):
+        # the next job of the worker would remove the config_dir
+        src = os.path.join(TEST_BASE_DIR, prefix)
+        if not os.path.isdir(src):
+            return None
+        dst = os.path.join(TEST_BASE_DIR, '{0}_failed_{1}'.format(
+            prefix, key.replace(':', '_').replace(',', '_')))
+        if os.path.exists(dst):
+            shutil.rmtree(dst)
+        os.rename(src, dst)
+        return dst
+
+    def _worker(self, n):
+        prefix = '{0}{1}'.format(self.args.prefix, n)
+        while not (self.failed and not self.args.keep_going):
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                return
+            key = job_key(job)
+            xunit = os.path.join(self.args.xunit_dir,
+                                 'nosetest_{0}.xml'.format(key.replace(':', '_')))
+            log = os.path.join(self.args.xunit_dir,
+                               'nosetest_{0}.log'.format(key.replace(':', '_')))
+            self._wait_launch_slot()
+            print('[{0}] start {1}'.format(prefix, key))
+            start = time.time()
+            with open(log, 'w') as f:
+                ret = subprocess.call(self._command(job, prefix, xunit),
+                                      stdout=f, stderr=subprocess.STDOUT)
+            elapsed = time.time() - start
+            print('[{0}] {1} {2} in {3:.0f} sec'.format(
+                prefix, 'passed' if ret == 0 else 'FAILED', key, elapsed))
+            with self.lock:
+                self.xunit_files.append(xunit)
+                if ret == 0:
+                    self.durations[key] = elapsed
+                else:
+                    self.failed.append((key, log, self._keep_artifacts(prefix, key)))
+
+    def run(self, workers):
+        print('running {0} jobs on {1} workers'.format(self.jobs.qsize(), workers))
+        threads = [threading.Thread(target=self._worker, args=(n,)) for n in range(workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        save_durations(self.args.durations, self.durations)
+        if self.args.xunit_file:
+            merge_xunit(sorted(self.xunit_files), self.args.xunit_file)
+        for key, log, artifacts in self.failed:
+            if artifacts:
+                print('FAILED: {0} (see {1} and {2})'.format(key, log, artifacts))
+            else:
+                print('FAILED: {0} (see {1})'.format(key, log))
+        return 1 if self.failed or not self.jobs.empty() else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs scenario tests in parallel')
+    parser.add_argument('modules', nargs='+', help='scenario test modules')
+    parser.add_argument('--gobgp-image', default='osrg/gobgp')
+    parser.add_argument('--gobgp-log-level', default='debug')
+    parser.add_argument('--backend', default='docker', choices=['docker', 'netns'])
+    parser.add_argument('--prefix', default='w', help='--test-prefix of the workers are <prefix><n>')
+    parser.add_argument('--jobs', type=int, default=0,
+                        help='number of workers, sized by CPUs and memory if not given')
+    parser.add_argument('--jobs-per-cpu', type=float, default=2)
+    parser.add_argument('--mem-per-job', type=int, default=1024,
+                        help='memory a job needs in MiB')
+    parser.add_argument('--stagger', type=float, default=1,
+                        help='minimum seconds between two job launches')
+    parser.add_argument('--keep-going', action='store_true',
+                        help='keep starting jobs after a failure')
+    parser.add_argument('--xunit-dir', default='.')
+    parser.add_argument('--xunit-file', default='', help='merged xunit output')
+    parser.add_argument('--trace-dir', default='', help='passed to the jobs, see lib/trace.py')
+    parser.add_argument('--durations', default='',
+                        help='file recording job durations, <xunit-dir>/scenario_durations.json by default')
+    args = parser.parse_args()
+    if not args.durations:
+        args.durations = os.path.join(args.xunit_dir, 'scenario_durations.json')
+
+    jobs = []
+    for m in args.modules:
+        jobs.extend(discover(m))
+    workers = args.jobs or num_workers(args.jobs_per_cpu, args.mem_per_job * 1024 * 1024)
+    return Runner(jobs, args).run(min(workers, len(jobs)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
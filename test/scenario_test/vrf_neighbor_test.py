@@ -65,7 +65,7 @@ class GoBGPTestBase(unittest.TestCase):
 
         ctns = [g1, g2, g3, g4, g5, g6, g7]
 
-        initial_wait_time = max(ctn.run() for ctn in ctns)
+        initial_wait_time = base.run_containers(ctns)
 
         time.sleep(initial_wait_time)
 
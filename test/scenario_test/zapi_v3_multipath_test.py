@@ -48,7 +48,7 @@ class GoBGPTestBase(unittest.TestCase):
                             log_level=parser_option.gobgp_log_level,
                             zebra=True, zapi_version=3, zebra_multipath_enabled=True)
 
-        initial_wait_time = max(ctn.run() for ctn in [g1, g2, g3])
+        initial_wait_time = base.run_containers([g1, g2, g3])
 
         time.sleep(initial_wait_time)
 
@@ -43,7 +43,7 @@ class GoBGPTestBase(unittest.TestCase):
                             log_level=parser_option.gobgp_log_level,
                             zebra=True, zapi_version=3)
 
-        initial_wait_time = max(ctn.run() for ctn in [g1, g2])
+        initial_wait_time = base.run_containers([g1, g2])
 
         time.sleep(initial_wait_time)
 
@@ -0,0 +1,105 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+import unittest
+
+from invoke import UnexpectedExit
+
+from lib.base import ExecSession, assert_several_times
+
+
+class ExecSessionTest(unittest.TestCase):
+
+    def setUp(self):
+        # a local shell stands in for "docker exec -i <container> sh"
+        self.session = ExecSession('local', ['sh'])
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_output(self):
+        self.assertEqual(self.session.run('echo foo; echo bar'), 'foo\nbar')
+        self.assertEqual(self.session.run("echo 'it'\\''s'"), "it's")
+        self.assertEqual(self.session.run('true'), '')
+
+    def test_stderr(self):
+        # only stdout is returned, as with "docker exec" and invoke.run()
+        self.assertEqual(self.session.run('echo out; echo err >&2; echo out2'), 'out\nout2')
+        self.assertEqual(self.session.run('echo -n err >&2'), '')
+        self.assertEqual(self.session.run('printf \'{"a": 1}\'; echo warning >&2'), '{"a": 1}')
+
+    def test_exit_status(self):
+        with self.assertRaises(UnexpectedExit) as cm:
+            self.session.run('echo out; echo failed >&2; exit 3')
+        self.assertEqual(cm.exception.result.exited, 3)
+        self.assertEqual(cm.exception.result.stdout, 'out')
+        self.assertEqual(cm.exception.result.stderr, 'failed')
+        with self.assertRaises(UnexpectedExit) as cm:
+            self.session.run('if')
+        self.assertNotEqual(cm.exception.result.stderr, '')
+        # neither the failure nor "exit" ended the session
+        self.assertTrue(self.session.alive())
+        self.assertEqual(self.session.run('echo ok'), 'ok')
+
+    def test_concurrent_commands(self):
+        results = {}
+
+        def _run(i):
+            results[i] = self.session.run('echo {0}'.format(i))
+        threads = [threading.Thread(target=_run, args=(i,)) for i in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, {i: str(i) for i in range(20)})
+
+
+class AssertSeveralTimesTest(unittest.TestCase):
+
+    def test_passes(self):
+        calls = []
+
+        def f():
+            calls.append(1)
+            assert len(calls) >= 3
+        assert_several_times(f, t=10, s=0.1)
+        self.assertEqual(len(calls), 3)
+
+    def test_last_assertion(self):
+        calls = []
+
+        def f():
+            calls.append(1)
+            assert False, 'call {0}'.format(len(calls))
+        with self.assertRaises(AssertionError) as cm:
+            assert_several_times(f, t=2, s=0.1)
+        self.assertEqual(str(cm.exception), 'call {0}'.format(len(calls)))
+
+    def test_other_exception(self):
+        calls = []
+
+        def f():
+            calls.append(1)
+            if len(calls) < 2:
+                assert False
+            return {}['missing']
+        self.assertRaises(KeyError, assert_several_times, f, t=10, s=0.1)
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import struct
+import unittest
+
+from lib import bgp_message as bm
+
+
+def _hex(s):
+    return bytes.fromhex(s.replace(' ', ''))
+
+
+class OpenTest(unittest.TestCase):
+
+    def test_capabilities(self):
+        msg = bm.open_message(65001, 90, '192.168.0.1', [
+            bm.cap_multiprotocol(bm.AFI_IP, bm.SAFI_UNICAST),
+            bm.cap_four_octet_as(65001),
+            bm.cap_add_path([(bm.AFI_IP, bm.SAFI_UNICAST, bm.ADD_PATH_BOTH)]),
+            bm.cap_extended_message(),
+            bm.cap_route_refresh(),
+        ])
+        self.assertEqual(msg, _hex('ff' * 16 + '0035 01'
+                                   '04 fde9 005a c0a80001 18'
+                                   '02 16'
+                                   '01 04 0001 00 01'
+                                   '41 04 0000fde9'
+                                   '45 04 0001 01 03'
+                                   '06 00'
+                                   '02 00'))
+        o = bm.decode_open(msg[bm.HEADER_LEN:])
+        self.assertEqual((o['version'], o['asn'], o['hold_time'], o['router_id']),
+                         (4, 65001, 90, '192.168.0.1'))
+        self.assertEqual(o['families'], [(bm.AFI_IP, bm.SAFI_UNICAST)])
+        self.assertEqual(o['add_path'], {(bm.AFI_IP, bm.SAFI_UNICAST): bm.ADD_PATH_BOTH})
+        self.assertEqual(o['four_octet_as'], 65001)
+        self.assertTrue(o['extended_message'])
+        self.assertTrue(o['route_refresh'])
+
+    def test_as_trans(self):
+        msg = bm.open_message(4200000000, 90, '192.168.0.1', [bm.cap_four_octet_as(4200000000)])
+        self.assertEqual(msg[bm.HEADER_LEN:], _hex('04 5ba0 005a c0a80001 08 02 06 41 04 fa56ea00'))
+        self.assertEqual(bm.decode_open(msg[bm.HEADER_LEN:])['asn'], 4200000000)
+
+
+class PathAttributesTest(unittest.TestCase):
+
+    # ORIGIN IGP, AS_PATH [65001, AS_TRANS], NEXT_HOP 10.0.0.1 and
+    # AS4_PATH [65001, 4200000000], as sent to a 2-octet AS speaker
+    AS2 = _hex('40 01 01 00'
+               '40 02 06 02 02 fde9 5ba0'
+               '40 03 04 0a000001'
+               'c0 11 0a 02 02 0000fde9 fa56ea00')
+    AS4 = _hex('40 01 01 00'
+               '40 02 0a 02 02 0000fde9 fa56ea00'
+               '40 03 04 0a000001')
+
+    def test_as4_path(self):
+        self.assertEqual(bm.path_attributes(as_path=[65001, 4200000000], next_hop='10.0.0.1',
+                                            four_octet_as=False), self.AS2)
+        self.assertEqual(bm.path_attributes(as_path=[65001, 4200000000], next_hop='10.0.0.1'),
+                         self.AS4)
+        for data, four_octet_as in ((self.AS2, False), (self.AS4, True)):
+            a = bm.decode_path_attributes(data, four_octet_as)
+            self.assertEqual(a['aspath'], [65001, 4200000000])
+            self.assertEqual(a['nexthop'], '10.0.0.1')
+            self.assertEqual(a['unknown'], {})
+
+    def test_convert_as_path(self):
+        nlri = _hex('18 0a0001')
+
+        def body(attrs):
+            return struct.pack('!HH', 0, len(attrs)) + attrs + nlri
+        self.assertEqual(bm.convert_as_path(body(self.AS2), False, True), body(self.AS4))
+        self.assertEqual(bm.convert_as_path(body(self.AS4), True, False), body(self.AS2))
+
+    def test_extended_length(self):
+        self.assertEqual(bm.attribute(bm.FLAG_OPTIONAL, 99, b'\0' * 256)[:4], _hex('90 63 0100'))
+        self.assertEqual(bm.exabgp_attribute(bm.attribute(bm.FLAG_OPTIONAL, 14, _hex('11223344'))),
+                         '0x0e 0x80 0x11223344')
+
+
+class NLRITest(unittest.TestCase):
+
+    def test_parse_prefix(self):
+        self.assertEqual(bm.parse_prefix('10.1.2.0/24'), (bm.AFI_IP, 0x0a010200, 24))
+        # host bits are cleared, as for IPv6
+        self.assertEqual(bm.parse_prefix('10.1.2.3/8'), (bm.AFI_IP, 0x0a000000, 8))
+        self.assertEqual(bm.parse_prefix('10.1.2.3'), (bm.AFI_IP, 0x0a010203, 32))
+        self.assertEqual(bm.parse_prefix('10.1.2.3/0'), (bm.AFI_IP, 0, 0))
+        self.assertEqual(bm.parse_prefix('2001:db8::1/32'), (bm.AFI_IP6, 0x20010db8 << 96, 32))
+        self.assertRaises(ValueError, bm.parse_prefix, '10.0.0.0/33')
+
+    def test_records(self):
+        prefixes, lengths = bm.prefix_range('10.0.0.0/23', 2)
+        self.assertEqual(bm.nlri_records(prefixes, lengths), [_hex('17 0a0000'), _hex('17 0a0002')])
+        self.assertEqual(bm.nlri_records([0], [0]), [_hex('00')])
+        prefixes, lengths = bm.parse_prefixes(['2001:db8:1::/48'])
+        self.assertEqual(bm.nlri_records(prefixes, lengths, bm.AFI_IP6), [_hex('30 20010db80001')])
+
+    def test_addpath(self):
+        records = bm.nlri_records([0x0a000000, 0x0a018000], [8, 17], path_ids=[1, 2])
+        data = b''.join(records)
+        self.assertEqual(data, _hex('00000001 08 0a 00000002 11 0a0180'))
+        prefixes, lengths, path_ids = bm.unpack_nlri(data, addpath=True)
+        self.assertEqual((list(prefixes), list(lengths), list(path_ids)),
+                         ([0x0a000000, 0x0a018000], [8, 17], [1, 2]))
+        self.assertEqual(bm.decode_nlri(data, addpath=True), [('10.0.0.0/8', 1), ('10.1.128.0/17', 2)])
+        self.assertRaises(ValueError, bm.unpack_nlri, _hex('00000001 18 0a00'), addpath=True)
+
+
+class UpdateTest(unittest.TestCase):
+
+    RECORD = _hex('30 20010db80001')
+
+    def test_mp_reach(self):
+        attrs = bm.path_attributes(as_path=[65001])
+        msg, = bm.updates([self.RECORD], afi=bm.AFI_IP6, attributes=attrs, next_hop='2001:db8::1')
+        mp = _hex('80 0e 1c 0002 01 10 20010db8000000000000000000000001 00 30 20010db80001')
+        self.assertEqual(msg[bm.HEADER_LEN:], struct.pack('!HH', 0, len(attrs) + len(mp)) + attrs + mp)
+        u = bm.decode_update(msg[bm.HEADER_LEN:])
+        self.assertEqual(u['mp_reach'], [('ipv6', '2001:db8::1', [('2001:db8:1::/48', None)])])
+        self.assertEqual(u['attributes']['aspath'], [65001])
+
+    def test_mp_unreach(self):
+        msg, = bm.updates([self.RECORD], afi=bm.AFI_IP6, withdraw=True)
+        self.assertEqual(msg[bm.HEADER_LEN:], _hex('0000 000d 80 0f 0a 0002 01 30 20010db80001'))
+        u = bm.decode_update(msg[bm.HEADER_LEN:])
+        self.assertEqual(u['mp_unreach'], [('ipv6', [('2001:db8:1::/48', None)])])
+        self.assertEqual(bm.end_of_rib(bm.AFI_IP6, bm.SAFI_UNICAST)[bm.HEADER_LEN:],
+                         _hex('0000 0006 80 0f 03 0002 01'))
+
+    def test_withdraw_addpath(self):
+        records = bm.nlri_records([0x0a000100], [24], path_ids=[7])
+        msg, = bm.updates(records, withdraw=True)
+        self.assertEqual(msg, _hex('ff' * 16 + '001f 02 0008 00000007 18 0a0001 0000'))
+        self.assertEqual(bm.decode_update(msg[bm.HEADER_LEN:], addpath=('ipv4',))['withdrawn'],
+                         [('10.0.1.0/24', 7)])
+
+    def _pack(self, count, max_len):
+        # ORIGIN, AS_PATH and NEXT_HOP take 20 bytes, a /24 4 bytes
+        attrs = bm.path_attributes(as_path=[65001], next_hop='192.168.10.2')
+        self.assertEqual(len(attrs), 20)
+        prefixes, lengths = bm.prefix_range('10.0.0.0/24', count)
+        msgs = bm.updates(bm.nlri_records(prefixes, lengths), attributes=attrs, max_len=max_len)
+        types = [t for t, _ in bm.iter_messages(b''.join(msgs))]
+        self.assertEqual(types, [bm.UPDATE] * len(msgs))
+        n = sum(len(bm.decode_update(m[bm.HEADER_LEN:])['nlri']) for m in msgs)
+        self.assertEqual(n, count)
+        return [len(m) for m in msgs]
+
+    def test_pack(self):
+        # (4096 - 19 - 4 - 20) // 4 = 1013 prefixes per message
+        lengths = self._pack(10000, bm.MAX_LEN)
+        self.assertEqual(lengths, [4095] * 9 + [19 + 4 + 20 + 4 * (10000 - 9 * 1013)])
+
+    def test_pack_extended(self):
+        # (65535 - 19 - 4 - 20) // 4 = 16373 prefixes per message
+        lengths = self._pack(20000, bm.EXTENDED_MAX_LEN)
+        self.assertEqual(lengths, [65535, 19 + 4 + 20 + 4 * (20000 - 16373)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,231 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import queue
+import unittest
+
+from lib import gobgp_api
+from lib.base import (
+    BGP_ATTR_TYPE_AS_PATH,
+    BGP_ATTR_TYPE_CLUSTER_LIST,
+    BGP_ATTR_TYPE_COMMUNITIES,
+    BGP_ATTR_TYPE_LOCAL_PREF,
+    BGP_ATTR_TYPE_MP_REACH_NLRI,
+    BGP_ATTR_TYPE_MULTI_EXIT_DISC,
+    BGP_ATTR_TYPE_NEXT_HOP,
+    BGP_ATTR_TYPE_ORIGIN,
+)
+
+if gobgp_api.available():
+    from lib.gobgp_api import attribute_pb2, gobgp_pb2
+
+
+@unittest.skipUnless(gobgp_api.available(), 'gRPC python stubs not generated, see gobgp_api.STUBS_COMMAND')
+class ConversionTest(unittest.TestCase):
+
+    def test_new_path_ipv4(self):
+        path = gobgp_api.new_path('10.0.1.1/24', nexthop='192.168.0.2', aspath=[65001, 65002],
+                                  med=10, local_pref=200, community='65001:1,no-export',
+                                  identifier=3)
+        self.assertEqual((path.family.afi, path.family.safi), (1, 1))
+        self.assertEqual(path.identifier, 3)
+        self.assertFalse(path.is_withdraw)
+        self.assertEqual(gobgp_api.path_to_dict(path), {
+            'nlri': {'prefix': '10.0.1.0/24'},
+            'age': 0,
+            'best': False,
+            'stale': False,
+            'id': 3,
+            'attrs': [
+                {'type': BGP_ATTR_TYPE_ORIGIN, 'value': gobgp_api.ORIGIN_INCOMPLETE},
+                {'type': BGP_ATTR_TYPE_AS_PATH,
+                 'as_paths': [{'segment_type': 2, 'num': 2, 'asns': [65001, 65002]}]},
+                {'type': BGP_ATTR_TYPE_NEXT_HOP, 'nexthop': '192.168.0.2'},
+                {'type': BGP_ATTR_TYPE_MULTI_EXIT_DISC, 'metric': 10},
+                {'type': BGP_ATTR_TYPE_LOCAL_PREF, 'value': 200},
+                {'type': BGP_ATTR_TYPE_COMMUNITIES, 'communities': [(65001 << 16) | 1, 0xffffff01]},
+            ],
+        })
+
+    def test_new_path_ipv6(self):
+        path = gobgp_api.new_path('2001:db8:1::/48', rf='ipv6', nexthop='2001:db8::2',
+                                  is_withdraw=True)
+        self.assertEqual((path.family.afi, path.family.safi), (2, 1))
+        d = gobgp_api.path_to_dict(path)
+        self.assertEqual(d['nlri'], {'prefix': '2001:db8:1::/48'})
+        self.assertTrue(d['withdrawal'])
+        self.assertEqual(d['attrs'][1], {'type': BGP_ATTR_TYPE_MP_REACH_NLRI,
+                                         'nexthop': '2001:db8::2', 'afi': 2, 'safi': 1})
+        self.assertRaises(Exception, gobgp_api.new_path, '10.0.0.0/8', rf='evpn')
+
+    def test_attribute_to_dict(self):
+        a = gobgp_api._pack(attribute_pb2.ClusterListAttribute(ids=['10.0.0.1', '10.0.0.2']))
+        self.assertEqual(gobgp_api.attribute_to_dict(a),
+                         {'type': BGP_ATTR_TYPE_CLUSTER_LIST, 'value': ['10.0.0.1', '10.0.0.2']})
+        a = gobgp_api._pack(attribute_pb2.AggregatorAttribute(address='10.0.0.1'))
+        self.assertEqual(gobgp_api.attribute_to_dict(a),
+                         {'type': None, 'name': 'gobgpapi.AggregatorAttribute'})
+
+    def test_path_to_dict(self):
+        path = gobgp_api.new_path('10.0.1.0/24')
+        path.age.seconds = 42
+        path.best = True
+        path.source_id = '192.168.0.2'
+        path.neighbor_ip = '10.0.0.2'
+        d = gobgp_api.path_to_dict(path)
+        self.assertEqual((d['age'], d['best'], d['source-id'], d['neighbor-ip']),
+                         (42, True, '192.168.0.2', '10.0.0.2'))
+        self.assertNotIn('id', d)
+        self.assertNotIn('withdrawal', d)
+        # a prefix other than IPAddressPrefix is taken from the destination
+        path.nlri.Pack(attribute_pb2.EVPNInclusiveMulticastEthernetTagRoute())
+        self.assertEqual(gobgp_api.path_to_dict(path, '10.0.0.0/8')['nlri'], {'prefix': '10.0.0.0/8'})
+
+    def test_message_to_dict(self):
+        peer = gobgp_pb2.Peer()
+        peer.state.neighbor_address = '10.0.0.2'
+        peer.state.peer_as = 65001
+        peer.state.messages.received.update = 12
+        peer.state.messages.received.total = 2 ** 40
+        peer.timers.config.hold_time = 90
+        peer.afi_safis.add().state.received = 7
+        d = gobgp_api.message_to_dict(peer)
+        # 64-bit integers stay integers, as "gobgp -j" prints them
+        self.assertEqual(d['state']['messages']['received'], {'update': 12, 'total': 2 ** 40})
+        self.assertEqual(d['state']['peer_as'], 65001)
+        self.assertEqual(d['timers']['config'], {'hold_time': 90})
+        self.assertEqual(d['afi_safis'], [{'state': {'received': 7}}])
+
+
+
+class StubStream(object):
+    """
+    MonitorTable stream yielding the responses put into it until it is
+    cancelled, or raising error.
+    """
+
+    def __init__(self):
+        self.responses = queue.Queue()
+        self.cancelled = False
+
+    def put(self, path):
+        self.responses.put(gobgp_pb2.MonitorTableResponse(path=path))
+
+    def __iter__(self):
+        while True:
+            rsp = self.responses.get()
+            if rsp is None:
+                return
+            if isinstance(rsp, Exception):
+                raise rsp
+            yield rsp
+
+    def cancel(self):
+        self.cancelled = True
+        self.responses.put(None)
+
+
+class StubStub(object):
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.requests = []
+
+    def MonitorTable(self, req):
+        self.requests.append(req)
+        return self.stream
+
+
+class StubClient(object):
+
+    def __init__(self):
+        self.stream = StubStream()
+        self.stub = StubStub(self.stream)
+
+
+def _path(prefix, neighbor_ip, nexthop, is_withdraw=False):
+    path = gobgp_api.new_path(prefix, nexthop=nexthop, is_withdraw=is_withdraw)
+    path.neighbor_ip = neighbor_ip
+    return path
+
+
+@unittest.skipUnless(gobgp_api.available(), 'gRPC python stubs not generated, see gobgp_api.STUBS_COMMAND')
+class RibMirrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = StubClient()
+        self.mirror = None
+
+    def tearDown(self):
+        if self.mirror is not None:
+            self.mirror.stop()
+
+    def _nexthops(self, prefix):
+        return sorted(p['attrs'][1]['nexthop'] for p in self.mirror.paths(prefix))
+
+    def test_adj_in(self):
+        self.mirror = gobgp_api.RibMirror(self.client, gobgp_pb2.ADJ_IN, name='10.0.0.2').start()
+        req = self.client.stub.requests[0]
+        # the current table first, then its changes
+        self.assertTrue(req.current)
+        self.assertEqual((req.table_type, req.name, req.family.afi), (gobgp_pb2.ADJ_IN, '10.0.0.2', 1))
+
+        stream = self.client.stream
+        stream.put(_path('10.0.1.0/24', '10.0.0.2', '10.0.0.2'))
+        stream.put(_path('10.0.1.0/24', '10.0.0.3', '10.0.0.3'))
+        stream.put(_path('10.0.2.0/24', '10.0.0.2', '10.0.0.2'))
+        self.mirror.wait_for_paths('10.0.1.0/24', 2, timeout=5)
+        self.mirror.wait_for_num_prefixes(2, timeout=5)
+        self.assertEqual(self._nexthops('10.0.1.0/24'), ['10.0.0.2', '10.0.0.3'])
+
+        # withdrawals remove the path of their neighbor only
+        stream.put(_path('10.0.1.0/24', '10.0.0.2', '10.0.0.2', is_withdraw=True))
+        self.mirror.wait_for_paths('10.0.1.0/24', 1, timeout=5)
+        self.assertEqual(self._nexthops('10.0.1.0/24'), ['10.0.0.3'])
+        stream.put(_path('10.0.2.0/24', '10.0.0.2', '10.0.0.2', is_withdraw=True))
+        self.mirror.wait_for_num_prefixes(1, timeout=5)
+        self.assertEqual(self.mirror.prefixes(), ['10.0.1.0/24'])
+
+    def test_global(self):
+        self.mirror = gobgp_api.RibMirror(self.client).start()
+        stream = self.client.stream
+        stream.put(_path('10.0.1.0/24', '10.0.0.2', '10.0.0.2'))
+        stream.put(_path('10.0.1.0/24', '10.0.0.3', '10.0.0.3'))
+        # the best path changed to the one of 10.0.0.3
+        self.mirror.wait_for(lambda dests: ('10.0.0.3', 0) in dests.get('10.0.1.0/24', {}), timeout=5)
+        self.assertEqual(self._nexthops('10.0.1.0/24'), ['10.0.0.3'])
+        stream.put(_path('10.0.1.0/24', '10.0.0.3', '10.0.0.3', is_withdraw=True))
+        self.mirror.wait_for_num_prefixes(0, timeout=5)
+
+    def test_timeout(self):
+        self.mirror = gobgp_api.RibMirror(self.client).start()
+        self.assertRaises(TimeoutError, self.mirror.wait_for_num_prefixes, 1, timeout=0.1)
+
+    def test_error(self):
+        class StreamError(gobgp_api.grpc.RpcError):
+            def code(self):
+                return gobgp_api.grpc.StatusCode.UNAVAILABLE
+
+        self.mirror = gobgp_api.RibMirror(self.client).start()
+        error = StreamError()
+        self.client.stream.responses.put(error)
+        with self.assertRaises(StreamError) as cm:
+            self.mirror.wait_for_num_prefixes(1, timeout=5)
+        self.assertIs(cm.exception, error)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from lib.base import (
+    BGP_ATTR_TYPE_AS_PATH,
+    BGP_ATTR_TYPE_NEXT_HOP,
+    BGP_ATTR_TYPE_MULTI_EXIT_DISC,
+)
+from lib.gobgp import RibPath
+
+
+def _path():
+    return RibPath({
+        'nlri': {'prefix': '10.0.0.0/24'},
+        'age': 10,
+        'best': True,
+        'attrs': [
+            {'type': BGP_ATTR_TYPE_NEXT_HOP, 'nexthop': '192.168.0.2'},
+            {'type': BGP_ATTR_TYPE_AS_PATH,
+             'as_paths': [{'segment_type': 2, 'num': 2, 'asns': [65001, 65002]}]},
+            {'type': BGP_ATTR_TYPE_MULTI_EXIT_DISC, 'metric': 100},
+        ],
+    })
+
+
+class RibPathTest(unittest.TestCase):
+
+    def test_derived_entries(self):
+        p = _path()
+        self.assertEqual(p['nexthop'], '192.168.0.2')
+        self.assertEqual(p['aspath'], [65001, 65002])
+        self.assertEqual(p['med'], 100)
+        self.assertIsNone(p['local-pref'])
+        self.assertIsNone(p.get('community'))
+        self.assertIn('community', p)
+        self.assertNotIn('foo', p)
+        self.assertEqual(p.get('foo', 1), 1)
+        with self.assertRaises(KeyError):
+            p['foo']
+
+    def test_looks_like_a_dict(self):
+        p = _path()
+        expected = dict(_path().items())
+        for key in RibPath._DERIVED:
+            self.assertIn(key, expected)
+        self.assertEqual(len(p), len(expected))
+        self.assertEqual(sorted(p), sorted(expected))
+        self.assertEqual(set(p.keys()), set(expected))
+        self.assertEqual(dict(p), expected)
+        self.assertEqual(p, expected)
+        self.assertEqual(_path(), _path())
+        self.assertFalse(_path() != _path())
+        self.assertEqual(repr(_path()), repr(expected))
+        c = _path().copy()
+        self.assertIsInstance(c, RibPath)
+        self.assertEqual(c, expected)
+
+    def test_not_equal(self):
+        p = _path()
+        q = _path()
+        q['best'] = False
+        self.assertNotEqual(p, q)
+        self.assertNotEqual(p, dict(dict.items(_path())))
+        self.assertNotEqual(p, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
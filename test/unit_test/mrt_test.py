@@ -0,0 +1,193 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import unittest
+
+from lib import bgp_message as bm
+from lib import mrt
+
+
+def record(timestamp, typ, subtype, body):
+    return struct.pack('!IHHI', timestamp, typ, subtype, len(body)) + body
+
+
+def peer_index_table(peers):
+    # peers are (bgp id, address, asn), 4-octet AS ones with asn > 65535
+    body = socket.inet_aton('192.168.0.1') + struct.pack('!H', 4) + b'view' + struct.pack('!H', len(peers))
+    for bgp_id, address, asn in peers:
+        v6 = ':' in address
+        four = asn > 0xffff
+        body += bytes([(1 if v6 else 0) | (2 if four else 0)]) + socket.inet_aton(bgp_id)
+        body += socket.inet_pton(socket.AF_INET6 if v6 else socket.AF_INET, address)
+        body += struct.pack('!I' if four else '!H', asn)
+    return record(1000, mrt.TABLE_DUMP_V2, mrt.PEER_INDEX_TABLE, body)
+
+
+def rib(subtype, seq, prefix, entries):
+    # entries are (peer index, originated, path identifier or None, attributes)
+    afi, value, length = bm.parse_prefix(prefix)
+    body = struct.pack('!I', seq) + bm.nlri_records([value], [length], afi)[0]
+    body += struct.pack('!H', len(entries))
+    for peer_index, originated, path_id, attrs in entries:
+        body += struct.pack('!HI', peer_index, originated)
+        if path_id is not None:
+            body += struct.pack('!I', path_id)
+        body += struct.pack('!H', len(attrs)) + attrs
+    return record(1000, mrt.TABLE_DUMP_V2, subtype, body)
+
+
+def bgp4mp(timestamp, subtype, peer_ip, local_ip, msg, peer_as=65001, local_as=65000,
+           microseconds=None):
+    four = subtype in (mrt.BGP4MP_MESSAGE_AS4, mrt.BGP4MP_MESSAGE_AS4_ADDPATH)
+    v6 = ':' in peer_ip
+    family = socket.AF_INET6 if v6 else socket.AF_INET
+    body = struct.pack('!IIHH' if four else '!HHHH', peer_as, local_as, 0,
+                       bm.AFI_IP6 if v6 else bm.AFI_IP)
+    body += socket.inet_pton(family, peer_ip) + socket.inet_pton(family, local_ip) + msg
+    if microseconds is None:
+        return record(timestamp, mrt.BGP4MP, subtype, body)
+    return record(timestamp, mrt.BGP4MP_ET, subtype, struct.pack('!I', microseconds) + body)
+
+
+class MRTTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _write(self, *records):
+        path = os.path.join(self.dir, 'dump.mrt')
+        with open(path, 'wb') as f:
+            f.write(b''.join(records))
+        return path
+
+
+class TableDumpV2Test(MRTTest):
+
+    PEERS = [('192.168.0.2', '10.0.0.2', 65001),
+             ('192.168.0.3', '2001:db8::3', 4200000000)]
+    ATTRS = bm.path_attributes(as_path=[65001], next_hop='10.0.0.2')
+    # as gobgpd writes it, the whole MP_REACH_NLRI attribute
+    ATTRS6 = bm.path_attributes(as_path=[4200000000]) + bm.mp_reach_nlri(
+        bm.AFI_IP6, bm.SAFI_UNICAST, '2001:db8::3')
+    # as RFC 6396 says, the next hop length and address only
+    ATTRS6_RFC = bm.path_attributes(as_path=[4200000000]) + bm.attribute(
+        bm.FLAG_OPTIONAL, bm.ATTR_MP_REACH_NLRI,
+        bytes([32]) + socket.inet_pton(socket.AF_INET6, '2001:db8::3') +
+        socket.inet_pton(socket.AF_INET6, 'fe80::3'))
+
+    def _dump(self):
+        return [
+            peer_index_table(self.PEERS),
+            rib(mrt.RIB_IPV4_UNICAST, 0, '10.0.1.0/24', [(0, 100, None, self.ATTRS)]),
+            rib(mrt.RIB_IPV6_UNICAST, 1, '2001:db8:1::/48',
+                [(1, 101, None, self.ATTRS6), (1, 102, None, self.ATTRS6_RFC)]),
+            rib(mrt.RIB_IPV4_UNICAST_ADDPATH, 2, '10.0.2.0/23',
+                [(0, 103, 1, self.ATTRS), (0, 104, 2, self.ATTRS)]),
+            rib(mrt.RIB_IPV6_UNICAST_ADDPATH, 3, '2001:db8:2::/47', [(1, 105, 7, self.ATTRS6)]),
+        ]
+
+    def test_peer_index_table(self):
+        with mrt.MRTReader(self._write(*self._dump())) as r:
+            list(r.paths())
+            self.assertEqual(r.peers, [mrt.Peer(*p) for p in self.PEERS])
+
+    def test_paths(self):
+        with mrt.MRTReader(self._write(*self._dump())) as r:
+            paths = [(p.rf, p.prefix, p.peer_index, p.originated, p.path_id) for p in r.paths()]
+        self.assertEqual(paths, [
+            ('ipv4', '10.0.1.0/24', 0, 100, None),
+            ('ipv6', '2001:db8:1::/48', 1, 101, None),
+            ('ipv6', '2001:db8:1::/48', 1, 102, None),
+            ('ipv4', '10.0.2.0/23', 0, 103, 1),
+            ('ipv4', '10.0.2.0/23', 0, 104, 2),
+            ('ipv6', '2001:db8:2::/47', 1, 105, 7),
+        ])
+
+    def test_family(self):
+        with mrt.MRTReader(self._write(*self._dump())) as r:
+            self.assertEqual([p.prefix for p in r.paths('ipv4')], ['10.0.1.0/24'] + ['10.0.2.0/23'] * 2)
+            self.assertEqual([p.path_id for p in r.paths('ipv6')], [None, None, 7])
+
+    def test_decode(self):
+        with mrt.MRTReader(self._write(*self._dump())) as r:
+            paths = list(r.paths())
+            attrs = paths[0].decode()
+            self.assertEqual((attrs['aspath'], attrs['nexthop']), ([65001], '10.0.0.2'))
+            for p in paths[1:3]:
+                attrs = p.decode()
+                self.assertEqual((attrs['aspath'], attrs['nexthop']), ([4200000000], '2001:db8::3'))
+                self.assertEqual(attrs['unknown'], {})
+
+    def test_dumps(self):
+        dump = self._dump()
+        path = self._write(*(dump + dump))
+        with mrt.MRTReader(path) as r:
+            offsets = r.dumps()
+            self.assertEqual(offsets, [0, sum(len(d) for d in dump)])
+            self.assertEqual(len(list(r.paths(start=offsets[-1]))), 6)
+
+    def test_truncated(self):
+        # the last record, being written, is skipped
+        dump = self._dump()
+        with mrt.MRTReader(self._write(*dump, dump[1][:-3])) as r:
+            self.assertEqual(len(list(r.paths())), 6)
+
+
+class BGP4MPTest(MRTTest):
+
+    def test_messages(self):
+        update = bm.updates(bm.nlri_records([0x0a000100], [24]),
+                            attributes=bm.path_attributes(as_path=[65001], next_hop='10.0.0.2'))[0]
+        update_addpath = bm.updates(bm.nlri_records([0x0a000100], [24], path_ids=[3]), withdraw=True)[0]
+        path = self._write(
+            bgp4mp(1000, mrt.BGP4MP_MESSAGE, '10.0.0.2', '10.0.0.1', update),
+            bgp4mp(1001, mrt.BGP4MP_MESSAGE_AS4, '2001:db8::2', '2001:db8::1', update,
+                   peer_as=4200000000, microseconds=250000),
+            bgp4mp(1002, mrt.BGP4MP_MESSAGE_AS4_ADDPATH, '10.0.0.2', '10.0.0.1', update_addpath),
+            # a state change, skipped
+            record(1003, mrt.BGP4MP, 0, struct.pack('!HHHH', 65001, 65000, 0, 1) + b'\0' * 12),
+            bgp4mp(1004, mrt.BGP4MP_MESSAGE_ADDPATH, '10.0.0.2', '10.0.0.1', bm.keepalive()),
+        )
+        with mrt.MRTReader(path) as r:
+            msgs = list(r.messages())
+            self.assertEqual([(m.time, m.peer_as, m.local_as, m.peer_ip, m.local_ip,
+                               m.four_octet_as, m.addpath) for m in msgs], [
+                (1000.0, 65001, 65000, '10.0.0.2', '10.0.0.1', False, False),
+                (1001.25, 4200000000, 65000, '2001:db8::2', '2001:db8::1', True, False),
+                (1002.0, 65001, 65000, '10.0.0.2', '10.0.0.1', True, True),
+                (1004.0, 65001, 65000, '10.0.0.2', '10.0.0.1', False, True),
+            ])
+            self.assertEqual(bytes(msgs[0].data), update)
+            self.assertEqual(bytes(msgs[3].data), bm.keepalive())
+            u = bm.decode_update(msgs[2].data[bm.HEADER_LEN:], addpath=('ipv4',))
+            self.assertEqual(u['withdrawn'], [('10.0.1.0/24', 3)])
+
+    def test_empty(self):
+        with mrt.MRTReader(self._write()) as r:
+            self.assertEqual(list(r.messages()), [])
+            self.assertEqual(r.dumps(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
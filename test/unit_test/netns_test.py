@@ -0,0 +1,116 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+
+from lib import netns
+
+
+class MgmtAddressesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.mgmt = netns._MgmtAddresses(self.dir)
+        # stands in for the init of a running container
+        self.init = subprocess.Popen(netns.INIT)
+
+    def tearDown(self):
+        self.init.kill()
+        self.init.wait()
+        shutil.rmtree(self.dir)
+
+    def _dead_pid(self):
+        p = subprocess.Popen(['true'])
+        p.wait()
+        return p.pid
+
+    def test_lease_release(self):
+        a1 = self.mgmt.lease('c1', self.init.pid)
+        a2 = self.mgmt.lease('c2', self.init.pid)
+        self.assertEqual(a1, '10.233.0.2/16')
+        self.assertEqual(a2, '10.233.0.3/16')
+        self.mgmt.release('c1')
+        self.assertEqual(self.mgmt.lease('c3', self.init.pid), a1)
+
+    def test_stale_lease(self):
+        # left by a crashed run, whose init is gone
+        a1 = self.mgmt.lease('c1', self._dead_pid())
+        self.assertEqual(self.mgmt.lease('c2', self.init.pid), a1)
+        self.assertEqual(self.mgmt.lease('c3', self.init.pid), '10.233.0.3/16')
+        # c1 no longer holds it
+        self.mgmt.release('c1')
+        self.assertEqual(self.mgmt.lease('c4', self.init.pid), '10.233.0.4/16')
+
+
+class NetnsContainerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.ctn = netns.NetnsContainer('q1', self.dir)
+        self.ctn.workdir = '/root'
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_boot_argv(self):
+        argv = self.ctn._boot_argv('/rootfs', [('/tmp/q1', '/root/shared_volume')])
+        self.assertEqual(argv[:-1], ['unshare', '--pid', '--mount', '--net', '--uts',
+                                     '--ipc', '--fork', '--propagation', 'private',
+                                     'sh', '-c'])
+        merged = os.path.join(self.dir, 'ctn', 'q1', 'merged')
+        script = argv[-1].split('\n')
+        self.assertIn('mount --bind /tmp/q1 {0}/root/shared_volume'.format(merged), script)
+        self.assertEqual(script[-1], "exec chroot {0} sh -c 'cd /root || true; "
+                         "exec sleep 2147483647'".format(merged))
+
+    def test_image_command(self):
+        # the config of osrg/quagga
+        config = {'Entrypoint': None,
+                  'Cmd': ['/usr/bin/supervisord', '-c', '/etc/supervisor/supervisord.conf'],
+                  'Env': ['PATH=/usr/sbin:/usr/bin:/sbin:/bin']}
+        self.assertEqual(netns.image_command(config),
+                         ['/usr/bin/supervisord', '-c', '/etc/supervisor/supervisord.conf'])
+        config['Entrypoint'] = ['/docker-entrypoint.sh']
+        self.assertEqual(netns.image_command(config)[:2],
+                         ['/docker-entrypoint.sh', '/usr/bin/supervisord'])
+        self.assertEqual(netns.image_command({'Cmd': None}), [])
+
+        # start() runs it in the namespaces of the init
+        init = subprocess.Popen(netns.INIT)
+        try:
+            while not netns._is_init(init.pid):
+                time.sleep(0.01)
+            os.makedirs(self.ctn.dir)
+            with open(os.path.join(self.ctn.dir, 'pid'), 'w') as f:
+                f.write(str(init.pid))
+            self.ctn.env = config['Env']
+            self.assertEqual(self.ctn.argv(netns.image_command(config)),
+                             ['nsenter', '-t', str(init.pid), '-m', '-u', '-i', '-n', '-p',
+                              '-r', '-w', 'env', '-i', 'PATH=/usr/sbin:/usr/bin:/sbin:/bin',
+                              '/docker-entrypoint.sh', '/usr/bin/supervisord', '-c',
+                              '/etc/supervisor/supervisord.conf'])
+        finally:
+            init.kill()
+            init.wait()
+
+
+if __name__ == '__main__':
+    unittest.main()
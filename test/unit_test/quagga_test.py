@@ -0,0 +1,130 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from lib.base import (
+    BGP_ATTR_TYPE_MULTI_EXIT_DISC,
+    BGP_ATTR_TYPE_LOCAL_PREF,
+)
+from lib.quagga import QuaggaBGPContainer
+
+
+HEADER = '''BGP table version is 0, local router ID is 192.168.0.2
+Status codes: s suppressed, d damped, h history, * valid, > best, = multipath,
+              i internal, r RIB-failure, S Stale, R Removed
+Origin codes: i - IGP, e - EGP, ? - incomplete
+
+'''
+
+# "show bgp ipv4 unicast" with multipath
+IPV4_SUMMARY = HEADER + '''   Network          Next Hop            Metric LocPrf Weight Path
+*> 10.0.0.0/24      192.168.0.1              0             0 65000 i
+*=                  192.168.0.5                   200      0 65002 65003 ?
+*>i10.10.0.0/16     192.168.0.6            100    150      0 i
+*> 192.168.100.0/24 0.0.0.0                  0         32768 i
+
+Total number of prefixes 3
+'''
+
+# "show bgp ipv6 unicast" with multipath
+IPV6_SUMMARY = HEADER + '''   Network          Next Hop            Metric LocPrf Weight Path
+*> 2001:db8:1::/64  2001:db8:ffff::1
+                                             0             0 65001 i
+*=                  2001:db8:ffff::5
+                                                           0 65002 65003 i
+*>i2001:db8:1111:2222::/64
+                    2001:db8:ffff::100
+                                             0    100      0 i
+*                   ::ffff:192.168.0.10
+                                                           0 65005 i
+*> 2001:db8:2::/48  ::                       0         32768 ?
+
+Total number of prefixes 3
+'''
+
+# "show bgp ipv4 unicast 10.0.0.0/24"
+IPV4_ENTRY = '''BGP routing table entry for 10.0.0.0/24
+Paths: (2 available, best #1, table Default-IP-Routing-Table)
+  Advertised to non peer-group peers:
+  192.168.0.5
+  65000
+    192.168.0.1 from 192.168.0.1 (192.168.0.1)
+      Origin IGP, metric 0, localpref 100, valid, external, best
+      Last update: Mon Jan  8 10:00:00 2018
+
+  65002 65003
+    192.168.0.5 from 192.168.0.5 (192.168.0.5)
+      Origin incomplete, localpref 200, valid, external, multipath
+      Last update: Mon Jan  8 10:00:01 2018
+'''
+
+
+def _med(metric):
+    return {'type': BGP_ATTR_TYPE_MULTI_EXIT_DISC, 'metric': metric}
+
+
+def _local_pref(value):
+    return {'type': BGP_ATTR_TYPE_LOCAL_PREF, 'value': value}
+
+
+class QuaggaRibParserTest(unittest.TestCase):
+
+    def setUp(self):
+        # the parsers do not need a running container
+        self.q = QuaggaBGPContainer.__new__(QuaggaBGPContainer)
+
+    def test_ipv4_summary(self):
+        rib = self.q._parse_rib_summary(IPV4_SUMMARY)
+        self.assertEqual(rib, [
+            {'prefix': '10.0.0.0/24', 'nexthop': '192.168.0.1', 'aspath': [65000],
+             'attrs': [_med(0), _local_pref(100)], 'ibgp': False, 'best': True},
+            {'prefix': '10.0.0.0/24', 'nexthop': '192.168.0.5', 'aspath': [65002, 65003],
+             'attrs': [_local_pref(200)], 'ibgp': False, 'best': False},
+            {'prefix': '10.10.0.0/16', 'nexthop': '192.168.0.6', 'aspath': [],
+             'attrs': [_med(100), _local_pref(150)], 'ibgp': True, 'best': True},
+            {'prefix': '192.168.100.0/24', 'nexthop': '0.0.0.0', 'aspath': [],
+             'attrs': [_med(0), _local_pref(100)], 'ibgp': False, 'best': True},
+        ])
+
+    def test_ipv6_summary(self):
+        rib = self.q._parse_rib_summary(IPV6_SUMMARY)
+        self.assertEqual(rib, [
+            {'prefix': '2001:db8:1::/64', 'nexthop': '2001:db8:ffff::1', 'aspath': [65001],
+             'attrs': [_med(0), _local_pref(100)], 'ibgp': False, 'best': True},
+            {'prefix': '2001:db8:1::/64', 'nexthop': '2001:db8:ffff::5', 'aspath': [65002, 65003],
+             'attrs': [_local_pref(100)], 'ibgp': False, 'best': False},
+            {'prefix': '2001:db8:1111:2222::/64', 'nexthop': '2001:db8:ffff::100', 'aspath': [],
+             'attrs': [_med(0), _local_pref(100)], 'ibgp': True, 'best': True},
+            {'prefix': '2001:db8:1111:2222::/64', 'nexthop': '::ffff:192.168.0.10', 'aspath': [65005],
+             'attrs': [_local_pref(100)], 'ibgp': False, 'best': False},
+            {'prefix': '2001:db8:2::/48', 'nexthop': '::', 'aspath': [],
+             'attrs': [_med(0), _local_pref(100)], 'ibgp': False, 'best': True},
+        ])
+
+    def test_summary_and_entry_agree(self):
+        summary = [p for p in self.q._parse_rib_summary(IPV4_SUMMARY)
+                   if p['prefix'] == '10.0.0.0/24']
+        entry = self.q._parse_rib_entry('10.0.0.0/24', [l.strip() for l in IPV4_ENTRY.split('\n')])
+        self.assertEqual(summary, entry)
+
+    def test_unknown_format(self):
+        with self.assertRaises(Exception):
+            self.q._parse_rib_summary('% BGP instance not found\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
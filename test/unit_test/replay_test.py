@@ -0,0 +1,132 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib import bgp_message as bm
+from lib import mrt
+from lib.replay import MRTReplay, SpeakerTarget
+
+from mrt_test import bgp4mp
+
+
+class StubTarget(object):
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.calls = []
+        self.msgs = []
+
+    def open(self):
+        self.calls.append('open')
+
+    def send(self, msgs):
+        self.calls.append('send')
+        if self.fail_at is not None and len(self.msgs) + len(msgs) > self.fail_at:
+            raise Exception('target failed')
+        self.msgs.extend(msgs)
+        return len(msgs), 0
+
+    def close(self):
+        self.calls.append('close')
+
+
+class StubSpeaker(object):
+
+    def __init__(self, session):
+        self.session = session
+        self.sent = []
+
+    def negotiated(self, peer):
+        return self.session
+
+    def send_messages(self, msgs, peer):
+        self.sent.extend(msgs)
+        return len(msgs)
+
+
+def _update(prefix, as_path=(65001,), four_octet_as=True):
+    afi, value, length = bm.parse_prefix(prefix)
+    attrs = bm.path_attributes(as_path=list(as_path), next_hop='10.0.0.2', four_octet_as=four_octet_as)
+    return bm.updates(bm.nlri_records([value], [length]), attributes=attrs)[0]
+
+
+class MRTReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'updates.mrt')
+        with open(self.path, 'wb') as f:
+            f.write(bgp4mp(1000, mrt.BGP4MP_MESSAGE_AS4, '10.0.0.2', '10.0.0.1', _update('10.0.1.0/24')))
+            f.write(bgp4mp(1000, mrt.BGP4MP_MESSAGE_AS4, '10.0.0.2', '10.0.0.1', bm.keepalive()))
+            f.write(bgp4mp(1000, mrt.BGP4MP_MESSAGE_AS4, '10.0.0.3', '10.0.0.1', _update('10.0.2.0/24'),
+                           microseconds=100000))
+            f.write(bgp4mp(1000, mrt.BGP4MP_MESSAGE_AS4, '10.0.0.2', '10.0.0.1', _update('10.0.3.0/24'),
+                           microseconds=200000))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _prefixes(self, msgs):
+        return [bm.decode_update(bytes(m.data)[bm.HEADER_LEN:])['nlri'][0][0] for m in msgs]
+
+    def test_run(self):
+        target = StubTarget()
+        stats = MRTReplay(self.path, speed=None).run(target)
+        self.assertEqual(target.calls, ['open', 'send', 'close'])
+        self.assertEqual(self._prefixes(target.msgs), ['10.0.1.0/24', '10.0.2.0/24', '10.0.3.0/24'])
+        self.assertEqual((stats['updates'], stats['sent'], stats['dropped']), (3, 3, 0))
+        self.assertAlmostEqual(stats['original_rate'], 3 / 0.2)
+
+    def test_pace(self):
+        target = StubTarget()
+        stats = MRTReplay(self.path, speed=2).run(target)
+        # the UPDATEs 0.1 sec apart are sent 0.05 sec apart
+        self.assertEqual(target.calls, ['open', 'send', 'send', 'send', 'close'])
+        self.assertGreaterEqual(stats['elapsed'], 0.1)
+
+    def test_peer_and_limit(self):
+        target = StubTarget()
+        MRTReplay(self.path, speed=None, peer_ip='10.0.0.2').run(target)
+        self.assertEqual(self._prefixes(target.msgs), ['10.0.1.0/24', '10.0.3.0/24'])
+        target = StubTarget()
+        stats = MRTReplay(self.path, speed=None).run(target, limit=2)
+        self.assertEqual(self._prefixes(target.msgs), ['10.0.1.0/24', '10.0.2.0/24'])
+        self.assertEqual(stats['sent'], 2)
+
+    def test_failure(self):
+        target = StubTarget(fail_at=1)
+        with self.assertRaises(Exception):
+            MRTReplay(self.path, speed=10).run(target)
+        self.assertEqual(target.calls, ['open', 'send', 'send', 'close'])
+
+    def test_speaker_target(self):
+        # a 2-octet AS session, which AS_PATH is re-encoded for
+        speaker = StubSpeaker({'add_path': False, 'max_len': bm.MAX_LEN, 'four_octet_as': False})
+        stats = MRTReplay(self.path, speed=None).run(SpeakerTarget(speaker, 'g1'))
+        self.assertEqual(stats['sent'], 3)
+        self.assertEqual(speaker.sent[0], _update('10.0.1.0/24', four_octet_as=False))
+        # add-path sessions do not take these UPDATEs
+        speaker = StubSpeaker({'add_path': True, 'max_len': bm.MAX_LEN, 'four_octet_as': True})
+        stats = MRTReplay(self.path, speed=None).run(SpeakerTarget(speaker, 'g1'))
+        self.assertEqual((stats['sent'], stats['dropped']), (0, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
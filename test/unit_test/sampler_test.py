@@ -0,0 +1,182 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib import sampler
+from lib.sampler import ResourceSampler
+
+
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+
+
+class FakeContainer(object):
+
+    def __init__(self, name, pid, daemon=None, config_dir=None):
+        self.name = name
+        self.pid = pid
+        self.DAEMON = daemon
+        if config_dir:
+            self.config_dir = config_dir
+
+    def get_pid(self):
+        return self.pid
+
+
+class SamplerTest(unittest.TestCase):
+    """
+    Runs the sampler against fixture /proc and cgroup trees.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.orig = (sampler.PROC, sampler.CGROUP)
+        sampler.PROC = os.path.join(self.dir, 'proc')
+        sampler.CGROUP = os.path.join(self.dir, 'cgroup')
+
+    def tearDown(self):
+        sampler.PROC, sampler.CGROUP = self.orig
+        shutil.rmtree(self.dir)
+
+    def _write(self, path, data):
+        path = os.path.join(self.dir, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(data)
+
+    def process(self, pid, comm='gobgpd', cmdline=None, ns=1, start=100,
+                ticks=0, rss_kb=1024, threads=4, fds=3,
+                cgroup='0::/docker/ctn'):
+        fields = ['0'] * 49
+        fields[0] = 'S'
+        fields[11] = str(ticks)
+        fields[12] = '0'
+        fields[19] = str(start)
+        # the comm of stat can hold spaces and parentheses
+        self._write('proc/{0}/stat'.format(pid),
+                    '{0} ({1} (x)) {2}\n'.format(pid, comm, ' '.join(fields)))
+        self._write('proc/{0}/comm'.format(pid), comm + '\n')
+        self._write('proc/{0}/cmdline'.format(pid),
+                    '\0'.join(cmdline or [comm]) + '\0')
+        self._write('proc/{0}/status'.format(pid),
+                    'Name:\t{0}\nVmRSS:\t{1} kB\nThreads:\t{2}\n'.format(comm, rss_kb, threads))
+        self._write('proc/{0}/cgroup'.format(pid), cgroup + '\n')
+        os.makedirs(os.path.join(self.dir, 'proc/{0}/fd'.format(pid)), exist_ok=True)
+        for i in range(fds):
+            self._write('proc/{0}/fd/{1}'.format(pid, i), '')
+        os.makedirs(os.path.join(self.dir, 'proc/{0}/ns'.format(pid)), exist_ok=True)
+        os.symlink('pid:[{0}]'.format(ns),
+                   os.path.join(self.dir, 'proc/{0}/ns/pid'.format(pid)))
+
+    def test_read_usage(self):
+        self.process(100, ticks=3 * CLK_TCK, rss_kb=2048, threads=7, fds=5)
+        usage = sampler.read_usage(100)
+        self.assertEqual(usage, {'cpu_time': 3.0, 'rss': 2048 * 1024,
+                                 'threads': 7, 'fds': 5})
+
+    def test_cgroup_memory(self):
+        self.process(100, cgroup='0::/docker/ctn')
+        self.assertEqual(sampler.cgroup_memory(100), None)
+        self._write('cgroup/docker/ctn/memory.current', '4096\n')
+        self.assertEqual(sampler.cgroup_memory(100), 4096)
+
+    def test_cgroup_memory_v1(self):
+        self.process(100, cgroup='5:cpu,cpuacct:/docker/ctn\n4:memory:/docker/ctn')
+        self._write('cgroup/memory/docker/ctn/memory.usage_in_bytes', '8192\n')
+        self.assertEqual(sampler.cgroup_memory(100), 8192)
+
+    def test_find_process(self):
+        self.process(1, comm='sh')
+        self.process(100, start=200)
+        self.process(101, start=150)
+        # older, but in another container
+        self.process(102, start=50, ns=2)
+        self.process(103, comm='python3', cmdline=['python3', '/usr/bin/exabgp', 'conf'])
+        self.assertEqual(sampler.find_process(1, 'gobgpd'), 101)
+        self.assertEqual(sampler.find_process(1, 'exabgp'), 103)
+        self.assertEqual(sampler.find_process(1, 'zebra'), -1)
+        self.assertEqual(sampler.find_process(2, 'gobgpd'), -1)
+
+    def test_sample(self):
+        self.process(1, comm='sh')
+        self.process(100, ticks=0, rss_kb=1024)
+        self._write('cgroup/docker/ctn/memory.current', '1000')
+        g1 = FakeContainer('g1', 1, daemon='gobgpd', config_dir=self.dir)
+        s = ResourceSampler([g1], interval=1)
+        series = s._series['g1']
+        series.open()
+        # 1/2, 1 then 1/4 of a CPU over four one second periods
+        for t, ticks, rss_kb, mem in [(0, 0, 1024, 1000),
+                                      (1, CLK_TCK // 2, 4096, 3000),
+                                      (2, CLK_TCK * 3 // 2, 2048, 2000),
+                                      (3, CLK_TCK * 7 // 4, 2048, 2000)]:
+            shutil.rmtree(os.path.join(self.dir, 'proc/100'))
+            self.process(100, ticks=ticks, rss_kb=rss_kb)
+            self._write('cgroup/docker/ctn/memory.current', str(mem))
+            series.sample(t, 1)
+        series.close()
+
+        self.assertEqual(series.pid, 100)
+        cpu = [v for _, v in s.series(g1, 'cpu')]
+        self.assertEqual(len(cpu), 4)
+        self.assertEqual(cpu[0], 0.0)
+        self.assertAlmostEqual(cpu[1], 50.0, delta=1)
+        self.assertAlmostEqual(cpu[2], 100.0, delta=1)
+        self.assertAlmostEqual(cpu[3], 25.0, delta=1)
+        self.assertEqual(s.peak(g1, 'rss'), 4096 * 1024)
+        self.assertEqual(s.peak(g1, 'cgroup_mem'), 3000)
+        # the median of the samples at t >= 1.5
+        self.assertEqual(s.steady(g1, 'rss'), 2048 * 1024)
+        self.assertAlmostEqual(s.steady(g1, 'cpu'), 62.5, delta=1)
+        self.assertAlmostEqual(s.steady(g1, 'cpu', since=0), 37.5, delta=1)
+        self.assertEqual(s.series(g1, 'goroutines'), [])
+        self.assertRaises(Exception, s.peak, g1, 'goroutines')
+
+        with open(os.path.join(self.dir, 'resource_usage.csv')) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], ','.join(sampler.FIELDS))
+        self.assertEqual(lines[1], '0,0.0,1048576,4,3,,1000')
+        self.assertEqual(len(lines), 5)
+
+    def test_restarted_daemon(self):
+        self.process(1, comm='sh')
+        self.process(100, ticks=CLK_TCK)
+        g1 = FakeContainer('g1', 1, daemon='gobgpd')
+        s = ResourceSampler([g1], out_name=None)
+        series = s._series['g1']
+        series.sample(0, 1)
+        shutil.rmtree(os.path.join(self.dir, 'proc/100'))
+        self.process(200, ticks=CLK_TCK * 5)
+        series.sample(1, 1)
+        # the CPU time of the new process is not compared to the old one
+        self.assertEqual(series.pid, 200)
+        self.assertEqual([v for _, v in s.series(g1, 'cpu')], [0.0, 0.0])
+
+    def test_start_stop(self):
+        self.process(1, comm='sh', rss_kb=512)
+        g1 = FakeContainer('g1', 1)
+        with ResourceSampler([g1], interval=0.01, out_name=None) as s:
+            pass
+        self.assertEqual(s.peak(g1, 'rss'), 512 * 1024)
+        self.assertTrue(s.report(g1).startswith('cpu peak 0%'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from lib.scenario import boot_signature, order_by_boot, warm_boot
+
+
+class Env(object):
+    pass
+
+
+class ScenarioTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+        def reset(env):
+            self.calls.append('reset')
+            if getattr(env, 'broken', False):
+                raise Exception('broken')
+
+        @warm_boot('shared', reset=reset)
+        def boot(env):
+            self.calls.append('boot')
+
+        class Owner(object):
+            pass
+        Owner.boot = staticmethod(boot)
+
+        class Reuser(object):
+            topology = 'shared'
+
+            @staticmethod
+            def boot(env):
+                Owner.boot(env)
+
+        class Alone(object):
+            @staticmethod
+            def boot(env):
+                pass
+
+        self.Owner = Owner
+        self.Reuser = Reuser
+        self.Alone = Alone
+
+    def test_warm_boot(self):
+        env = Env()
+        self.Owner.boot(env)
+        self.Reuser.boot(env)
+        self.assertEqual(self.calls, ['boot', 'reset'])
+        self.assertEqual(env.warm_boot, 'shared')
+
+    def test_warm_boot_reset_failure(self):
+        env = Env()
+        self.Owner.boot(env)
+        env.broken = True
+        self.Owner.boot(env)
+        self.assertEqual(self.calls, ['boot', 'reset', 'boot'])
+        self.assertEqual(env.warm_boot, 'shared')
+
+    def test_boot_signature(self):
+        self.assertEqual(boot_signature(self.Owner), 'shared')
+        self.assertEqual(boot_signature(self.Reuser), 'shared')
+        self.assertEqual(boot_signature(self.Alone), 'Alone')
+
+    def test_order_by_boot(self):
+        scenarios = [self.Owner, self.Alone, self.Reuser]
+        self.assertEqual(order_by_boot(scenarios),
+                         [self.Owner, self.Reuser, self.Alone])
+
+
+if __name__ == '__main__':
+    unittest.main()
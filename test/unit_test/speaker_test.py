@@ -0,0 +1,187 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import struct
+import time
+import unittest
+
+from lib import bgp_message as bm
+from lib import speaker
+from lib.base import (
+    BGP_FSM_ESTABLISHED,
+    WaitEvent,
+)
+from lib.speaker import BGPSpeaker, event_loop
+
+
+LOOPBACK = ('lo', '127.0.0.1/8', 'lo')
+
+
+def _wait(f, timeout=5):
+    deadline = time.time() + timeout
+    while not f():
+        if time.time() > deadline:
+            raise Exception('timeout')
+        time.sleep(0.01)
+
+
+def _speaker(name, asn, router_id):
+    # a speaker attached to the loopback, without the config directory
+    # BGPContainer creates
+    s = BGPSpeaker.__new__(BGPSpeaker)
+    s.name = name
+    s.asn = asn
+    s.router_id = router_id
+    s.peers = {}
+    s.routes = {}
+    s.policies = {}
+    s.ip_addrs = [LOOPBACK]
+    s.ip6_addrs = []
+    s.is_running = False
+    s.event = WaitEvent()
+    s._sessions = {}
+    return s
+
+
+class Listener(object):
+    """
+    The BGP peer of a speaker, accepting its sessions on the loopback and
+    keeping the UPDATEs it receives.
+    """
+
+    def __init__(self, asn=65000, router_id='192.168.0.1'):
+        self.asn = asn
+        self.router_id = router_id
+        self.ip_addrs = [LOOPBACK]
+        self.ip6_addrs = []
+        self.connections = 0
+        self.updates = []
+        self.writer = None
+        self.server = self._call(asyncio.start_server(self._handle, '127.0.0.1', 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, event_loop()).result()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self.writer = writer
+        writer.write(bm.open_message(self.asn, 90, self.router_id, [
+            bm.cap_multiprotocol(bm.AFI_IP, bm.SAFI_UNICAST),
+            bm.cap_four_octet_as(self.asn)]))
+        try:
+            while True:
+                header = await reader.readexactly(bm.HEADER_LEN)
+                length, typ = struct.unpack('!HB', header[16:])
+                body = await reader.readexactly(length - bm.HEADER_LEN)
+                if typ == bm.OPEN:
+                    writer.write(bm.keepalive())
+                elif typ == bm.UPDATE:
+                    self.updates.append(bm.decode_update(body))
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def send(self, msg):
+        async def _f():
+            self.writer.write(msg)
+        self._call(_f())
+
+    def prefixes(self):
+        announced = set()
+        for u in self.updates:
+            for prefix, _ in u['withdrawn']:
+                announced.discard(prefix)
+            for prefix, _ in u['nlri']:
+                announced.add(prefix)
+        return announced
+
+    def close(self):
+        self.server.close()
+        self._call(self.server.wait_closed())
+
+
+class BGPSpeakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.listener = Listener()
+        self.orig = (speaker.BGP_PORT, speaker.CONNECT_RETRY)
+        speaker.BGP_PORT = self.listener.port
+        speaker.CONNECT_RETRY = 0.01
+        self.s1 = _speaker('s1', 65001, '192.168.0.2')
+        self.s1.add_peer(self.listener)
+        self.s1.run()
+        _wait(lambda: self.s1.get_neighbor_state(self.listener) == BGP_FSM_ESTABLISHED)
+
+    def tearDown(self):
+        self.s1.stop()
+        self.listener.close()
+        speaker.BGP_PORT, speaker.CONNECT_RETRY = self.orig
+
+    def test_negotiated(self):
+        n = self.s1.negotiated(self.listener)
+        self.assertTrue(n['four_octet_as'])
+        self.assertEqual(n['add_path'], set())
+        self.assertEqual(n['max_len'], bm.MAX_LEN)
+
+    def test_announce_withdraw(self):
+        self.s1.add_routes(['10.0.{0}.0/24'.format(i) for i in range(100)])
+        _wait(lambda: len(self.listener.prefixes()) == 100)
+        u = self.listener.updates[0]
+        self.assertEqual(u['attributes']['aspath'], [65001])
+        self.assertEqual(u['attributes']['nexthop'], '127.0.0.1')
+        self.s1.del_routes(['10.0.{0}.0/24'.format(i) for i in range(50)])
+        _wait(lambda: len(self.listener.prefixes()) == 50)
+        self.assertIn('10.0.99.0/24', self.listener.prefixes())
+
+    def test_receive(self):
+        records = bm.nlri_records(*zip(*[bm.parse_prefix(p)[1:] for p in
+                                         ['10.1.0.0/16', '10.2.0.0/16']]))
+        attrs = bm.path_attributes(as_path=[65000, 65100], next_hop='127.0.0.1', med=10)
+        for msg in bm.updates(records, attributes=attrs):
+            self.listener.send(msg)
+        _wait(lambda: self.s1.count_adj_rib_in(self.listener) == 2)
+        rib = self.s1.get_adj_rib_in(self.listener, prefix='10.1.0.0/16')
+        self.assertEqual(len(rib), 1)
+        self.assertEqual(rib[0]['aspath'], [65000, 65100])
+        self.assertEqual(rib[0]['med'], 10)
+
+    def test_malformed_update(self):
+        # an MP_REACH_NLRI too short for its AFI and SAFI, which the decoder
+        # fails on with struct.error
+        self.listener.send(bm.message(bm.UPDATE, struct.pack('!HH', 0, 6) + b'\x80\x0e\x03\x00\x09\x01'))
+        _wait(lambda: self.listener.connections == 2)
+        session = self.s1._session(self.listener)
+        self.assertIsInstance(session.error, struct.error)
+        # the session is back up
+        _wait(lambda: self.s1.get_neighbor_state(self.listener) == BGP_FSM_ESTABLISHED)
+        self.s1.add_routes(['10.0.0.0/24'])
+        _wait(lambda: self.listener.prefixes() == {'10.0.0.0/24'})
+
+    def test_peer_reset(self):
+        self.s1.add_routes(['10.0.0.0/24'])
+        _wait(lambda: self.listener.prefixes() == {'10.0.0.0/24'})
+        self.listener.send(bm.notification(6, 4))
+        _wait(lambda: self.listener.connections == 2)
+        # the routes are announced again on the new session
+        _wait(lambda: len(self.listener.updates) == 2)
+        self.assertIsInstance(self.s1._session(self.listener).error, ValueError)
+
+
+if __name__ == '__main__':
+    unittest.main()
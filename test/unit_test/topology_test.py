@@ -0,0 +1,127 @@
+# Copyright (C) 2015 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import threading
+import unittest
+
+from lib import topology
+
+
+TOPOLOGY = os.path.join(os.path.dirname(__file__), '..', 'scenario_test',
+                        'topologies', 'route_server.yaml')
+
+
+class FakeRouter(object):
+    """
+    Records the calls topology makes to a container, without Docker.
+    """
+
+    calls = []
+    lock = threading.Lock()
+
+    def __init__(self, name, asn, router_id, **kwargs):
+        self.name = name
+        self.asn = asn
+        self.router_id = router_id
+        self.kwargs = kwargs
+        self.peers = {}
+        self.routes = []
+
+    def _record(self, *call):
+        with self.lock:
+            self.calls.append((self.name,) + call)
+
+    def run(self):
+        self._record('run')
+        return 0
+
+    def create_config(self):
+        self._record('create_config', sorted(p.name for p in self.peers))
+
+    def reload_config(self):
+        self._record('reload_config')
+
+    def add_peer(self, peer, reload_config=True, **options):
+        self.peers[peer] = options
+        self._record('add_peer', peer.name, reload_config)
+
+    def add_route(self, route, **kwargs):
+        self.routes.append(route)
+        self._record('add_route', route)
+
+
+class FakeBootRouter(FakeRouter):
+
+    def run(self, boot=True):
+        self._record('run', boot)
+        return 0
+
+    def boot(self):
+        self._record('boot')
+        return 0
+
+
+class TopologyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.router_types = topology.ROUTER_TYPES
+        topology.ROUTER_TYPES = {'gobgp': FakeBootRouter, 'quagga': FakeRouter,
+                                 'exabgp': FakeBootRouter}
+        FakeRouter.calls = []
+
+    def tearDown(self):
+        topology.ROUTER_TYPES = self.router_types
+
+    def _calls(self, name):
+        return [c[1:] for c in FakeRouter.calls if c[0] == name]
+
+    def test_route_server(self):
+        topo = topology.load_topology(TOPOLOGY, defaults={'gobgp': {'ctn_image_name': 'gobgp'}})
+        topo.start()
+
+        g1 = topo['g1']
+        self.assertEqual(g1.kwargs, {'ctn_image_name': 'gobgp'})
+        self.assertEqual(sorted(p.name for p in g1.peers), ['q1', 'q2', 'q3'])
+        self.assertTrue(all(o['is_rs_client'] for o in g1.peers.values()))
+        # rendered once, with all its peers, before the daemon boots
+        self.assertEqual(self._calls('g1'), [
+            ('run', False),
+            ('add_peer', 'q1', False),
+            ('add_peer', 'q2', False),
+            ('add_peer', 'q3', False),
+            ('create_config', ['q1', 'q2', 'q3']),
+            ('boot',),
+        ])
+        for i in range(1, 4):
+            name = 'q{0}'.format(i)
+            self.assertEqual(self._calls(name), [
+                ('run',),
+                ('add_peer', 'g1', False),
+                ('create_config', ['g1']),
+                ('reload_config',),
+                ('add_route', '10.0.{0}.0/24'.format(i)),
+            ])
+            self.assertEqual(topo[name].peers[g1], {'passwd': 'passwd'})
+
+    def test_unknown_peer(self):
+        spec = {'routers': {'g1': {'type': 'gobgp', 'asn': 65000, 'router-id': '192.168.0.1'}},
+                'peers': {'g1': {'q1': {}}}}
+        self.assertRaises(ValueError, topology.Topology, spec)
+
+
+if __name__ == '__main__':
+    unittest.main()